@@ -0,0 +1,49 @@
+from data_access.clients import acreate_client, create_client
+from data_access.errors import (
+    BadRequest,
+    CircuitOpen,
+    Conflict,
+    DataAccessError,
+    DeadlineExceeded,
+    NotFound,
+    Unavailable,
+    error_message,
+    map_error,
+)
+from data_access.handlers import (
+    install_deadline,
+    install_error_handlers,
+    supabase_errors,
+    to_http_exception,
+)
+from data_access.resilience import CircuitBreaker, Policy, deadline, remaining
+from data_access.snapshot import Snapshot, SnapshotFile, build_snapshot, write_snapshot
+from data_access.transport import AsyncResilientTransport, ResilientTransport
+
+__all__ = [
+    "AsyncResilientTransport",
+    "BadRequest",
+    "CircuitBreaker",
+    "CircuitOpen",
+    "Conflict",
+    "DataAccessError",
+    "DeadlineExceeded",
+    "NotFound",
+    "Policy",
+    "ResilientTransport",
+    "Snapshot",
+    "SnapshotFile",
+    "Unavailable",
+    "acreate_client",
+    "build_snapshot",
+    "create_client",
+    "deadline",
+    "error_message",
+    "install_deadline",
+    "install_error_handlers",
+    "map_error",
+    "remaining",
+    "supabase_errors",
+    "to_http_exception",
+    "write_snapshot",
+]
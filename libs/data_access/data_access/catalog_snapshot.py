@@ -0,0 +1,137 @@
+import argparse
+import asyncio
+import logging
+import os
+import time
+
+from data_access.clients import acreate_client
+from data_access.snapshot import write_snapshot
+
+"""
+Catalog snapshot builder
+
+One builder process reads the catalog tables from Supabase and writes them
+to a snapshot file; every recipe and menu worker maps that file instead of
+loading and indexing the tables itself:
+
+    python -m data_access.catalog_snapshot /snapshots/catalog.snap --interval 30
+"""
+
+logger = logging.getLogger(__name__)
+
+CATALOG_TABLES = ("Recipe", "Restaurant", "Location", "Menu")
+PAGE_SIZE = 1000
+
+
+def item_names(items) -> set:
+    """
+    Names of a list of `{"name": ...}` items, e.g. a recipe's ingredients.
+    """
+    return {item["name"] for item in items or [] if "name" in item}
+
+
+def ingredient_names(items) -> set:
+    """
+    Names of a menu's main ingredients, lowercased with whitespace collapsed
+    the way the menu service compares them.
+    """
+    return {" ".join(name.lower().split()) for name in item_names(items)}
+
+
+# Set columns precomputed for each table
+CATALOG_SETS = {
+    "Recipe": {
+        "ingredients": lambda recipe: item_names(recipe.get("ingredients")),
+        "tools": lambda recipe: item_names(recipe.get("tools")),
+    },
+    "Menu": {
+        "main_ingredients": lambda menu: ingredient_names(menu.get("main_ingredients")),
+    },
+}
+
+
+def changed_at(row: dict):
+    """
+    When a row was last inserted or edited: its `updated_at`, or its
+    `created_at` for tables without one.
+    """
+    return row.get("updated_at") or row.get("created_at")
+
+
+def watermarks(tables: dict) -> dict:
+    """
+    The newest change of each table, from which readers poll for rows
+    inserted or edited after the snapshot was built.
+    """
+    return {
+        name: max(stamps)
+        for name, rows in tables.items()
+        if (stamps := [stamp for row in rows if (stamp := changed_at(row))])
+    }
+
+
+def snapshot_meta(tables: dict, built_at: float) -> dict:
+    """
+    `built_at` is the wall-clock time the build started reading: every write
+    committed before it is in the snapshot.
+    """
+    return {"built_at": built_at, "watermarks": watermarks(tables)}
+
+
+async def fetch_table(supabase, table: str) -> list:
+    rows = []
+    while True:
+        page = (
+            await supabase.table(table)
+            .select("*")
+            .order("id")
+            .range(len(rows), len(rows) + PAGE_SIZE - 1)
+            .execute()
+        ).data
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+
+
+async def build_catalog_snapshot(supabase, path: str, tables=CATALOG_TABLES) -> dict:
+    built_at = time.time()
+    rows = await asyncio.gather(*(fetch_table(supabase, table) for table in tables))
+    tables = dict(zip(tables, rows))
+    meta = snapshot_meta(tables, built_at)
+    await asyncio.to_thread(write_snapshot, path, tables, meta, CATALOG_SETS)
+    return {table: len(rows) for table, rows in tables.items()}
+
+
+async def run(path: str, interval: float, once: bool = False):
+    supabase = await acreate_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_KEY"])
+    while True:
+        started = time.monotonic()
+        try:
+            counts = await build_catalog_snapshot(supabase, path)
+            logger.info(
+                "Wrote %s in %.2fs: %s",
+                path,
+                time.monotonic() - started,
+                ", ".join(f"{count} {table}" for table, count in counts.items()),
+            )
+        except Exception:
+            logger.exception("Catalog snapshot build failed")
+        if once:
+            return
+        await asyncio.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build the catalog snapshot the recipe and menu services map."
+    )
+    parser.add_argument("path", help="snapshot file the services map")
+    parser.add_argument("--interval", type=float, default=30.0, help="seconds between builds")
+    parser.add_argument("--once", action="store_true", help="build once and exit")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    asyncio.run(run(args.path, args.interval, args.once))
+
+
+if __name__ == "__main__":
+    main()
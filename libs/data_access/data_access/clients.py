@@ -0,0 +1,37 @@
+from typing import Optional
+
+import httpx
+from supabase import AsyncClient, AsyncClientOptions, Client, ClientOptions
+from supabase import acreate_client as _acreate_client
+from supabase import create_client as _create_client
+
+from data_access.resilience import Policy
+from data_access.transport import AsyncResilientTransport, ResilientTransport
+
+"""
+Supabase clients
+"""
+
+
+def create_client(
+    url: str, key: str, transport: Optional[ResilientTransport] = None
+) -> Client:
+    """
+    A synchronous Supabase client whose PostgREST, auth and storage calls all
+    share one pooled HTTP/2 connection and go through `transport`, by default
+    one configured from the SUPABASE_* environment variables.
+    """
+    transport = transport or ResilientTransport(Policy.from_env())
+    http_client = httpx.Client(transport=transport, http2=True, follow_redirects=True)
+    return _create_client(url, key, options=ClientOptions(httpx_client=http_client))
+
+
+async def acreate_client(
+    url: str, key: str, transport: Optional[AsyncResilientTransport] = None
+) -> AsyncClient:
+    """
+    The asynchronous counterpart of `create_client`.
+    """
+    transport = transport or AsyncResilientTransport(Policy.from_env())
+    http_client = httpx.AsyncClient(transport=transport, http2=True, follow_redirects=True)
+    return await _acreate_client(url, key, options=AsyncClientOptions(httpx_client=http_client))
@@ -0,0 +1,94 @@
+import httpx
+
+"""
+Error mapping
+"""
+
+
+class DataAccessError(Exception):
+    """
+    A Supabase call failed. `status_code` is the HTTP status a service
+    should answer with, or None to let the caller decide.
+    """
+
+    status_code = None
+
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.message = message
+
+
+class BadRequest(DataAccessError):
+    pass
+
+
+class NotFound(DataAccessError):
+    status_code = 404
+
+
+class Conflict(DataAccessError):
+    status_code = 409
+
+
+class Unavailable(DataAccessError):
+    status_code = 503
+
+
+class CircuitOpen(Unavailable):
+    pass
+
+
+class DeadlineExceeded(DataAccessError):
+    status_code = 504
+
+
+# PostgREST and Postgres error codes
+_NOT_FOUND_CODES = {"PGRST116"}
+_CONFLICT_CODES = {"23505", "23503"}
+_NOT_FOUND_MESSAGES = ("no rows", "multiple (or no) rows returned")
+_UNAVAILABLE_STATUSES = {0, 502, 503, 504}
+
+
+def error_message(error: Exception) -> str:
+    """
+    The human readable message of a PostgREST, auth, storage or transport
+    error.
+    """
+    if error.args and isinstance(error.args[0], dict):
+        return error.args[0].get("message") or str(error)
+    return getattr(error, "message", None) or str(error)
+
+
+def map_error(error: Exception) -> DataAccessError:
+    """
+    Classify an exception raised by a Supabase call. The PostgREST, auth and
+    storage clients each raise their own exception types; they are told apart
+    by their `code` and `status` attributes so this module does not depend
+    on their internals.
+    """
+    if isinstance(error, DataAccessError):
+        return error
+
+    message = error_message(error)
+    if isinstance(error, httpx.TimeoutException):
+        return DeadlineExceeded(message)
+    if isinstance(error, httpx.TransportError):
+        return Unavailable(message)
+
+    code = str(getattr(error, "code", None) or "")
+    try:
+        status = int(getattr(error, "status", None))
+    except (TypeError, ValueError):
+        status = None
+
+    if (
+        code in _NOT_FOUND_CODES
+        or status == 404
+        or any(text in message for text in _NOT_FOUND_MESSAGES)
+    ):
+        return NotFound(message)
+    if code in _CONFLICT_CODES or status == 409:
+        return Conflict(message)
+    if status in _UNAVAILABLE_STATUSES:
+        return Unavailable(message)
+    return BadRequest(message)
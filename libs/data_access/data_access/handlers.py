@@ -0,0 +1,88 @@
+from contextlib import contextmanager
+from typing import Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+from postgrest.exceptions import APIError
+from storage3.utils import StorageException
+from supabase_auth.errors import AuthError
+
+from data_access.errors import DataAccessError, NotFound, error_message, map_error
+from data_access.resilience import deadline
+
+"""
+FastAPI error handling
+"""
+
+
+def to_http_exception(
+    error: Exception,
+    prefix: str = "Supabase error",
+    status_code: int = 400,
+    not_found: Optional[str] = None,
+) -> HTTPException:
+    """
+    The HTTPException to answer a failed Supabase call with. Errors that do
+    not map to a status of their own, e.g. a rejected query, get
+    `status_code`; a missing row gets 404 with `not_found` as the detail.
+    """
+    mapped = map_error(error)
+    if isinstance(mapped, NotFound) and not_found is not None:
+        return HTTPException(status_code=404, detail=not_found)
+    return HTTPException(
+        status_code=mapped.status_code or status_code,
+        detail=f"{prefix}: {error_message(mapped)}",
+    )
+
+
+@contextmanager
+def supabase_errors(
+    prefix: str = "Supabase error",
+    status_code: int = 400,
+    not_found: Optional[str] = None,
+):
+    """
+    Turn any exception raised inside into an HTTPException, see
+    `to_http_exception`. HTTPExceptions raised inside pass through.
+    """
+    try:
+        yield
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise to_http_exception(e, prefix, status_code, not_found) from e
+
+
+def install_error_handlers(app: FastAPI, prefix: str = "Supabase error"):
+    """
+    Answer Supabase errors that escape an endpoint with the mapped status
+    instead of a 500.
+    """
+
+    async def handle(request: Request, error: Exception):
+        exception = to_http_exception(error, prefix)
+        return JSONResponse({"detail": exception.detail}, status_code=exception.status_code)
+
+    for error_type in (DataAccessError, APIError, AuthError, StorageException):
+        app.add_exception_handler(error_type, handle)
+
+
+"""
+Request deadlines
+"""
+
+
+def install_deadline(app: FastAPI, seconds: Optional[float]):
+    """
+    Give the Supabase calls of every request `seconds` in all, retries and
+    backoff included, so a slow backend fails the request with a 504 instead
+    of holding it for the sum of every attempt's timeout. None installs no
+    deadline.
+    """
+    if seconds is None:
+        return
+
+    @app.middleware("http")
+    async def request_deadline(request: Request, call_next):
+        with deadline(seconds):
+            return await call_next(request)
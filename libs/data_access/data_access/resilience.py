@@ -0,0 +1,164 @@
+import contextvars
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Optional
+
+from data_access.errors import DeadlineExceeded
+
+"""
+Retry, deadline and circuit breaker policy
+"""
+
+# Methods that can be sent twice without changing anything
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+# Statuses worth retrying an idempotent read on
+RETRY_STATUSES = {429, 502, 503, 504}
+
+
+@dataclass(frozen=True)
+class Policy:
+    """
+    How every Supabase call is made.
+
+    Each attempt gets at most `timeout` seconds. Idempotent reads are tried
+    up to `retries` more times on transport errors and retryable statuses,
+    waiting a jittered exponential backoff in between. With `hedge_after`
+    set, a read still unanswered after that many seconds is sent a second
+    time and the first response wins. After `failure_threshold` consecutive
+    failures an API's circuit opens for `reset_after` seconds.
+    """
+
+    timeout: float = 10.0
+    retries: int = 2
+    backoff: float = 0.1
+    max_backoff: float = 2.0
+    hedge_after: Optional[float] = None
+    failure_threshold: int = 5
+    reset_after: float = 30.0
+
+    @classmethod
+    def from_env(cls, prefix: str = "SUPABASE_") -> "Policy":
+        def setting(name, convert, default):
+            value = os.getenv(prefix + name)
+            return convert(value) if value not in (None, "") else default
+
+        return cls(
+            timeout=setting("TIMEOUT_SECONDS", float, cls.timeout),
+            retries=setting("RETRIES", int, cls.retries),
+            backoff=setting("BACKOFF_SECONDS", float, cls.backoff),
+            max_backoff=setting("MAX_BACKOFF_SECONDS", float, cls.max_backoff),
+            hedge_after=setting("HEDGE_AFTER_SECONDS", float, cls.hedge_after),
+            failure_threshold=setting("BREAKER_FAILURES", int, cls.failure_threshold),
+            reset_after=setting("BREAKER_RESET_SECONDS", float, cls.reset_after),
+        )
+
+    def backoff_delay(self, attempt: int) -> float:
+        """
+        "Full jitter": a uniform wait up to the exponential backoff of the
+        `attempt`-th retry, so retrying clients do not synchronise.
+        """
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+
+"""
+Deadlines
+"""
+
+_deadline = contextvars.ContextVar("deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds: Optional[float]):
+    """
+    Every Supabase call made inside must finish within `seconds` from now,
+    retries and backoff included. Nested deadlines keep the earliest one;
+    `deadline(None)` lifts any deadline, e.g. for work that outlives the
+    request that started it.
+    """
+    if seconds is None:
+        at = None
+    else:
+        at = time.monotonic() + seconds
+        current = _deadline.get()
+        if current is not None:
+            at = min(at, current)
+    token = _deadline.set(at)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """
+    Seconds left before the current deadline, or None without one.
+    """
+    at = _deadline.get()
+    return None if at is None else at - time.monotonic()
+
+
+def attempt_timeout(policy: Policy) -> float:
+    """
+    The timeout of the next attempt: the policy's, cut short by the current
+    deadline. Raises DeadlineExceeded once the deadline has passed.
+    """
+    left = remaining()
+    if left is None:
+        return policy.timeout
+    if left <= 0:
+        raise DeadlineExceeded("Deadline exceeded before the call was made")
+    return min(policy.timeout, left)
+
+
+"""
+Circuit breaker
+"""
+
+
+class CircuitBreaker:
+    """
+    Counts consecutive failures of one API. Once `failure_threshold` is
+    reached the circuit opens and calls fail fast; every `reset_after`
+    seconds a single probe call is let through, which closes the circuit
+    on success and opens it again on failure.
+    """
+
+    def __init__(self, failure_threshold: int, reset_after: float):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self._probed_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            return "half_open" if self._probed_at is not None else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            # A probe that never reported back does not hold the circuit forever
+            if time.monotonic() - (self._probed_at or self.opened_at) >= self.reset_after:
+                self._probed_at = time.monotonic()
+                return True
+            return False
+
+    def record(self, success: bool):
+        with self._lock:
+            if success:
+                self.failures = 0
+                self.opened_at = None
+            else:
+                self.failures += 1
+                if self._probed_at is not None or self.failures >= self.failure_threshold:
+                    self.opened_at = time.monotonic()
+            self._probed_at = None
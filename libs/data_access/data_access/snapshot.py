@@ -0,0 +1,403 @@
+import bisect
+import json
+import mmap
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+"""
+Catalog snapshots
+
+A snapshot is one read-only file holding whole tables, laid out so every
+worker process can map it and read it in place:
+
+    magic | header length | JSON header | padding | 64-byte aligned arrays
+
+Every string (text values, JSON encoded nested values, set members) is
+interned once in a shared pool. Columns are flat numpy arrays: int64,
+float64 and bool values with an optional null mask, or int32 ids into the
+string pool with -1 for null. Set columns hold each row's sorted, distinct
+member ids in CSR form (an offsets array and a values array), so filters
+such as "every ingredient of the recipe is in the pantry" run vectorised
+over all rows. Rows are sorted by `id` so a row is found by binary search.
+"""
+
+MAGIC = b"WTESNAP1"
+_ALIGNMENT = 64
+_NULL = -1
+
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def _kind(values: list) -> str:
+    present = [value for value in values if value is not None]
+    if present and all(isinstance(value, bool) for value in present):
+        return "bool"
+    if all(isinstance(value, int) and not isinstance(value, bool) for value in present):
+        return "int" if present else "str"
+    if all(
+        isinstance(value, (int, float)) and not isinstance(value, bool) for value in present
+    ):
+        return "float"
+    if all(isinstance(value, str) for value in present):
+        return "str"
+    return "json"
+
+
+class _Writer:
+    def __init__(self):
+        self.strings = {}
+        self.arrays = []
+        self.size = 0
+
+    def intern(self, text: str) -> int:
+        string_id = self.strings.get(text)
+        if string_id is None:
+            string_id = self.strings[text] = len(self.strings)
+        return string_id
+
+    def array(self, values: np.ndarray) -> list:
+        values = np.ascontiguousarray(values)
+        offset = _align(self.size)
+        self.arrays.append((offset, values))
+        self.size = offset + values.nbytes
+        return [offset, values.dtype.str, len(values)]
+
+    def column(self, values: list) -> dict:
+        kind = _kind(values)
+        nulls = np.array([value is None for value in values], dtype=bool)
+        column = {"kind": kind}
+        if kind in ("str", "json"):
+            encode = (lambda value: value) if kind == "str" else _dump_json
+            ids = [_NULL if value is None else self.intern(encode(value)) for value in values]
+            column["values"] = self.array(np.array(ids, dtype=np.int32))
+            return column
+
+        dtype = {"int": np.int64, "float": np.float64, "bool": bool}[kind]
+        column["values"] = self.array(
+            np.array([0 if value is None else value for value in values], dtype=dtype)
+        )
+        if nulls.any():
+            column["nulls"] = self.array(nulls)
+        return column
+
+    def set_column(self, members: List[Iterable[str]]) -> dict:
+        offsets = [0]
+        values = []
+        for row_members in members:
+            ids = sorted({self.intern(member) for member in row_members})
+            values.extend(ids)
+            offsets.append(len(values))
+        return {
+            "offsets": self.array(np.array(offsets, dtype=np.int64)),
+            "values": self.array(np.array(values, dtype=np.int32)),
+        }
+
+    def string_pool(self) -> dict:
+        encoded = [text.encode("utf-8") for text in self.strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(text) for text in encoded], out=offsets[1:])
+        order = sorted(range(len(encoded)), key=encoded.__getitem__)
+        return {
+            "offsets": self.array(offsets),
+            "data": self.array(np.frombuffer(b"".join(encoded), dtype=np.uint8)),
+            "order": self.array(np.array(order, dtype=np.int32)),
+        }
+
+
+def _dump_json(value) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def build_snapshot(
+    tables: Dict[str, List[dict]],
+    meta: Optional[dict] = None,
+    sets: Optional[Dict[str, Dict[str, Callable[[dict], Iterable[str]]]]] = None,
+) -> bytes:
+    """
+    Encode `tables` (table name to rows) as a snapshot. `sets` maps a table
+    name to the set columns to precompute for it, each a function from a
+    row to its members, e.g. the names of a recipe's ingredients.
+    """
+    writer = _Writer()
+    header = {"meta": meta or {}, "tables": {}}
+    for name, rows in tables.items():
+        if all(isinstance(row.get("id"), int) for row in rows):
+            rows = sorted(rows, key=lambda row: row["id"])
+        columns = list(dict.fromkeys(column for row in rows for column in row))
+        header["tables"][name] = {
+            "rows": len(rows),
+            "columns": {
+                column: writer.column([row.get(column) for row in rows]) for column in columns
+            },
+            "sets": {
+                set_name: writer.set_column([members(row) for row in rows])
+                for set_name, members in (sets or {}).get(name, {}).items()
+            },
+        }
+    header["strings"] = writer.string_pool()
+
+    encoded = json.dumps(header).encode("utf-8")
+    data_start = _align(len(MAGIC) + 8 + len(encoded))
+    buffer = bytearray(data_start + writer.size)
+    buffer[: len(MAGIC)] = MAGIC
+    buffer[len(MAGIC) : len(MAGIC) + 8] = len(encoded).to_bytes(8, "little")
+    buffer[len(MAGIC) + 8 : len(MAGIC) + 8 + len(encoded)] = encoded
+    for offset, values in writer.arrays:
+        start = data_start + offset
+        buffer[start : start + values.nbytes] = values.tobytes()
+    return bytes(buffer)
+
+
+def write_snapshot(path: str, *args, **kwargs):
+    """
+    Build a snapshot and atomically replace the file at `path` with it.
+    Readers that already mapped the previous file keep reading it.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(build_snapshot(*args, **kwargs))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+class Snapshot:
+    """
+    A snapshot read in place from `buffer`, usually a read-only memory map.
+    Arrays handed out are zero-copy, read-only views of the buffer.
+    """
+
+    def __init__(self, buffer):
+        view = memoryview(buffer)
+        if bytes(view[: len(MAGIC)]) != MAGIC:
+            raise ValueError("Not a catalog snapshot")
+        header_length = int.from_bytes(view[len(MAGIC) : len(MAGIC) + 8], "little")
+        header = json.loads(bytes(view[len(MAGIC) + 8 : len(MAGIC) + 8 + header_length]))
+        self._buffer = buffer
+        self._view = view
+        self._data_start = _align(len(MAGIC) + 8 + header_length)
+        self.meta = header["meta"]
+        self._string_offsets = self.scalars(header["strings"]["offsets"])
+        self._string_data = self.scalars(header["strings"]["data"])
+        self._string_order = self.scalars(header["strings"]["order"])
+        self._tables = {
+            name: SnapshotTable(self, name, table) for name, table in header["tables"].items()
+        }
+
+    @classmethod
+    def open(cls, path: str) -> "Snapshot":
+        with open(path, "rb") as f:
+            # The mapping outlives the file object and survives the file being replaced
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    @classmethod
+    def from_rows(cls, *args, **kwargs) -> "Snapshot":
+        """
+        A snapshot built in this process, for when no builder has written one.
+        """
+        return cls(build_snapshot(*args, **kwargs))
+
+    def array(self, reference) -> np.ndarray:
+        offset, dtype, count = reference
+        return np.frombuffer(
+            self._buffer, dtype=np.dtype(dtype), count=count, offset=self._data_start + offset
+        )
+
+    def scalars(self, reference) -> memoryview:
+        """
+        The same values as `array`, as a typed memoryview: indexing it one
+        value at a time returns Python objects far faster than numpy does.
+        """
+        offset, dtype, count = reference
+        dtype = np.dtype(dtype)
+        start = self._data_start + offset
+        return self._view[start : start + dtype.itemsize * count].cast(dtype.char)
+
+    @property
+    def tables(self) -> List[str]:
+        return list(self._tables)
+
+    def table(self, name: str) -> "SnapshotTable":
+        return self._tables[name]
+
+    def string(self, string_id: int) -> str:
+        return str(
+            self._string_data[self._string_offsets[string_id] : self._string_offsets[string_id + 1]],
+            "utf-8",
+        )
+
+    def string_id(self, text: str) -> Optional[int]:
+        """
+        The id of an interned string, or None, by binary search over the
+        strings in byte order.
+        """
+        target = text.encode("utf-8")
+        low, high = 0, len(self._string_order)
+        while low < high:
+            middle = (low + high) // 2
+            string_id = self._string_order[middle]
+            start, end = self._string_offsets[string_id], self._string_offsets[string_id + 1]
+            candidate = self._string_data[start:end].tobytes()
+            if candidate == target:
+                return string_id
+            if candidate < target:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def string_ids(self, texts: Iterable[str]) -> np.ndarray:
+        """
+        Sorted ids of those of `texts` that are interned.
+        """
+        ids = {self.string_id(text) for text in texts}
+        ids.discard(None)
+        return np.array(sorted(ids), dtype=np.int32)
+
+
+class SnapshotTable:
+    def __init__(self, snapshot: Snapshot, name: str, table: dict):
+        self.snapshot = snapshot
+        self.name = name
+        self._length = table["rows"]
+        self._kinds = {column: spec["kind"] for column, spec in table["columns"].items()}
+        self._values = {
+            column: snapshot.array(spec["values"]) for column, spec in table["columns"].items()
+        }
+        self._getters = {
+            column: self._getter(spec["kind"], spec) for column, spec in table["columns"].items()
+        }
+        self._sets = {
+            name: (snapshot.array(spec["offsets"]), snapshot.array(spec["values"]))
+            for name, spec in table["sets"].items()
+        }
+        self._sorted_ids = (
+            snapshot.scalars(table["columns"]["id"]["values"])
+            if self._kinds.get("id") == "int"
+            else None
+        )
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._kinds)
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        The raw values of a column: numbers, or string ids for text and JSON.
+        Empty for a column the table does not have, e.g. of an empty table.
+        """
+        values = self._values.get(name)
+        return values if values is not None else np.empty(0, dtype=np.int64)
+
+    def position(self, row_id) -> Optional[int]:
+        if self._sorted_ids is None or not isinstance(row_id, int):
+            return None
+        position = bisect.bisect_left(self._sorted_ids, row_id)
+        if position < self._length and self._sorted_ids[position] == row_id:
+            return position
+        return None
+
+    def _getter(self, kind: str, spec: dict):
+        """
+        A function from a row position to the column's Python value.
+        """
+        values = self.snapshot.scalars(spec["values"])
+        if kind in ("str", "json"):
+            string = self.snapshot.string
+            if kind == "str":
+                return lambda position: None if (i := values[position]) == _NULL else string(i)
+            return lambda position: (
+                None if (i := values[position]) == _NULL else json.loads(string(i))
+            )
+        if "nulls" in spec:
+            nulls = self.snapshot.scalars(spec["nulls"])
+            return lambda position: None if nulls[position] else values[position]
+        return values.__getitem__
+
+    def value(self, column: str, position: int):
+        return self._getters[column](position)
+
+    def row(self, position: int) -> dict:
+        return {column: get(position) for column, get in self._getters.items()}
+
+    def rows(self, positions: Optional[Iterable[int]] = None) -> List[dict]:
+        if positions is None:
+            positions = range(self._length)
+        return [self.row(int(position)) for position in positions]
+
+    def set_ids(self, name: str, position: int) -> np.ndarray:
+        offsets, values = self._sets[name]
+        return values[offsets[position] : offsets[position + 1]]
+
+    def set_members(self, name: str, position: int) -> frozenset:
+        return frozenset(self.snapshot.string(int(i)) for i in self.set_ids(name, position))
+
+    def set_values(self, name: str) -> np.ndarray:
+        """
+        Member ids of every row, concatenated.
+        """
+        return self._sets[name][1]
+
+    def rows_with_any(self, name: str, ids: np.ndarray) -> np.ndarray:
+        """
+        Per row, whether any of its members is one of `ids`.
+        """
+        return self._count_in(name, ids) > 0
+
+    def rows_within(self, name: str, ids: np.ndarray) -> np.ndarray:
+        """
+        Per row, whether all of its members are among `ids`.
+        """
+        offsets, _ = self._sets[name]
+        return self._count_in(name, ids) == np.diff(offsets)
+
+    def _count_in(self, name: str, ids: np.ndarray) -> np.ndarray:
+        offsets, values = self._sets[name]
+        cumulative = np.concatenate(([0], np.cumsum(np.isin(values, ids))))
+        return cumulative[offsets[1:]] - cumulative[offsets[:-1]]
+
+
+class SnapshotFile:
+    """
+    The latest snapshot at `path`. The file is checked for a replacement at
+    most every `check_interval` seconds; a new file is mapped and swapped in
+    atomically, and the previous mapping is released once no reader holds
+    it any more.
+    """
+
+    def __init__(self, path: str, check_interval: float = 1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._stat = None
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def current(self) -> Optional[Snapshot]:
+        """
+        The latest snapshot, or None until a builder has written one.
+        """
+        if time.monotonic() - self._checked_at < self.check_interval:
+            return self._snapshot
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                return self._snapshot
+            key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if key != self._stat:
+                self._snapshot = Snapshot.open(self.path)
+                self._stat = key
+            return self._snapshot
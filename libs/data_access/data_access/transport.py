@@ -0,0 +1,231 @@
+import asyncio
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Optional
+
+import httpx
+
+from data_access.errors import CircuitOpen, DeadlineExceeded, Unavailable
+from data_access.resilience import (
+    IDEMPOTENT_METHODS,
+    RETRY_STATUSES,
+    CircuitBreaker,
+    Policy,
+    attempt_timeout,
+)
+
+"""
+Resilient transports
+"""
+
+DEFAULT_LIMITS = httpx.Limits(
+    max_connections=100, max_keepalive_connections=20, keepalive_expiry=30.0
+)
+
+
+class _Resilience:
+    """
+    What the sync and async transports share: one circuit breaker per API
+    (PostgREST, auth, storage, ...) of each host, and call counters.
+    """
+
+    def __init__(self, policy: Optional[Policy]):
+        self.policy = policy or Policy()
+        self.counts = Counter()
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, request: httpx.Request) -> CircuitBreaker:
+        api = request.url.path.strip("/").split("/", 1)[0]
+        key = f"{request.url.host}:{request.url.port or ''}/{api}"
+        with self._lock:
+            if key not in self._breakers:
+                self._breakers[key] = CircuitBreaker(
+                    self.policy.failure_threshold, self.policy.reset_after
+                )
+            return self._breakers[key]
+
+    def prepare(self, request: httpx.Request, breaker: CircuitBreaker) -> float:
+        """
+        Check the circuit and the deadline before an attempt, and cap the
+        attempt's connect, read, write and pool timeouts.
+        """
+        timeout = attempt_timeout(self.policy)
+        if not breaker.allow():
+            self.counts["rejected"] += 1
+            raise CircuitOpen(f"{request.url.host}/{request.url.path.split('/')[1]} is unavailable")
+        request.extensions["timeout"] = httpx.Timeout(timeout).as_dict()
+        self.counts["attempts"] += 1
+        return timeout
+
+    def can_retry(self, attempt: int, attempts: int) -> Optional[float]:
+        """
+        The backoff before the next attempt, or None if there is none: out
+        of attempts, or the backoff would outlast the deadline.
+        """
+        if attempt + 1 >= attempts:
+            return None
+        delay = self.policy.backoff_delay(attempt)
+        try:
+            if attempt_timeout(self.policy) <= delay:
+                return None
+        except DeadlineExceeded:
+            return None
+        self.counts["retries"] += 1
+        return delay
+
+    def metrics(self) -> dict:
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {
+            **{key: self.counts[key] for key in ("attempts", "retries", "hedged", "rejected")},
+            "circuits": {key: breaker.state for key, breaker in breakers.items()},
+        }
+
+
+class ResilientTransport(_Resilience, httpx.BaseTransport):
+    """
+    An httpx transport for synchronous clients that applies a Policy to
+    every request sent through the wrapped transport, by default a pooled
+    HTTP/2 keep-alive transport.
+    """
+
+    def __init__(
+        self,
+        policy: Optional[Policy] = None,
+        transport: Optional[httpx.BaseTransport] = None,
+        hedge_workers: int = 8,
+    ):
+        _Resilience.__init__(self, policy)
+        self._transport = transport or httpx.HTTPTransport(http2=True, limits=DEFAULT_LIMITS)
+        # Sending threads share one executor; it only starts threads once a read is hedged
+        self._hedges = ThreadPoolExecutor(hedge_workers, "hedge")
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        breaker = self.breaker(request)
+        idempotent = request.method in IDEMPOTENT_METHODS
+        attempts = 1 + (self.policy.retries if idempotent else 0)
+        for attempt in range(attempts):
+            self.prepare(request, breaker)
+            try:
+                response = self._send(request, idempotent)
+            except httpx.TransportError as e:
+                breaker.record(False)
+                delay = self.can_retry(attempt, attempts) if idempotent else None
+                if delay is None:
+                    raise _unavailable(request, e) from e
+                time.sleep(delay)
+                continue
+
+            breaker.record(response.status_code < 500)
+            if idempotent and response.status_code in RETRY_STATUSES:
+                delay = self.can_retry(attempt, attempts)
+                if delay is not None:
+                    response.close()
+                    time.sleep(delay)
+                    continue
+            return response
+
+    def _send(self, request: httpx.Request, idempotent: bool) -> httpx.Response:
+        if not idempotent or self.policy.hedge_after is None:
+            return self._transport.handle_request(request)
+
+        first = self._hedges.submit(self._transport.handle_request, request)
+        done, _ = wait([first], timeout=self.policy.hedge_after)
+        if done:
+            return first.result()
+
+        self.counts["hedged"] += 1
+        second = self._hedges.submit(self._transport.handle_request, request)
+        pending = {first, second}
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = done.pop()
+            if winner.exception() is None or not pending:
+                break
+        for loser in pending:
+            loser.add_done_callback(_close_response)
+        return winner.result()
+
+    def close(self):
+        self._hedges.shutdown(wait=False)
+        self._transport.close()
+
+
+class AsyncResilientTransport(_Resilience, httpx.AsyncBaseTransport):
+    """
+    An httpx transport for asynchronous clients that applies a Policy to
+    every request sent through the wrapped transport, by default a pooled
+    HTTP/2 keep-alive transport.
+    """
+
+    def __init__(
+        self,
+        policy: Optional[Policy] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        _Resilience.__init__(self, policy)
+        self._transport = transport or httpx.AsyncHTTPTransport(
+            http2=True, limits=DEFAULT_LIMITS
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        breaker = self.breaker(request)
+        idempotent = request.method in IDEMPOTENT_METHODS
+        attempts = 1 + (self.policy.retries if idempotent else 0)
+        for attempt in range(attempts):
+            timeout = self.prepare(request, breaker)
+            try:
+                response = await asyncio.wait_for(self._send(request, idempotent), timeout)
+            except (httpx.TransportError, asyncio.TimeoutError) as e:
+                breaker.record(False)
+                delay = self.can_retry(attempt, attempts) if idempotent else None
+                if delay is None:
+                    raise _unavailable(request, e) from e
+                await asyncio.sleep(delay)
+                continue
+
+            breaker.record(response.status_code < 500)
+            if idempotent and response.status_code in RETRY_STATUSES:
+                delay = self.can_retry(attempt, attempts)
+                if delay is not None:
+                    await response.aclose()
+                    await asyncio.sleep(delay)
+                    continue
+            return response
+
+    async def _send(self, request: httpx.Request, idempotent: bool) -> httpx.Response:
+        if not idempotent or self.policy.hedge_after is None:
+            return await self._transport.handle_async_request(request)
+
+        first = asyncio.create_task(self._transport.handle_async_request(request))
+        pending = {first}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=self.policy.hedge_after)
+            if not done:
+                self.counts["hedged"] += 1
+                pending.add(asyncio.create_task(self._transport.handle_async_request(request)))
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = done.pop()
+                if winner.exception() is None or not pending:
+                    return winner.result()
+        finally:
+            for loser in pending:
+                loser.cancel()
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+def _unavailable(request: httpx.Request, error: Exception) -> Exception:
+    if isinstance(error, (httpx.TimeoutException, asyncio.TimeoutError)):
+        return DeadlineExceeded(f"{request.method} {request.url.path} timed out")
+    return Unavailable(f"{request.method} {request.url.path} failed: {error}")
+
+
+def _close_response(future):
+    if future.exception() is None:
+        future.result().close()
@@ -0,0 +1,114 @@
+import os
+import sys
+
+import httpx
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from postgrest.exceptions import APIError
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from data_access import (
+    BadRequest,
+    Conflict,
+    DeadlineExceeded,
+    NotFound,
+    Policy,
+    ResilientTransport,
+    Unavailable,
+    install_deadline,
+    install_error_handlers,
+    map_error,
+    remaining,
+    supabase_errors,
+)
+
+
+def api_error(code, message="boom"):
+    return APIError({"code": code, "message": message, "details": None, "hint": None})
+
+
+class StatusError(Exception):
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+@pytest.mark.parametrize(
+    "error, expected",
+    [
+        (api_error("PGRST116", "JSON object requested, multiple (or no) rows returned"), NotFound),
+        (api_error("23505", "duplicate key value"), Conflict),
+        (api_error("42703", "column does not exist"), BadRequest),
+        (StatusError("Object not found", "404"), NotFound),
+        (StatusError("Bad gateway", 502), Unavailable),
+        (httpx.ReadTimeout("timed out"), DeadlineExceeded),
+        (httpx.ConnectError("refused"), Unavailable),
+    ],
+)
+def test_map_error(error, expected):
+    assert type(map_error(error)) is expected
+
+
+def test_supabase_errors_maps_to_http_exceptions():
+    with pytest.raises(HTTPException) as raised:
+        with supabase_errors(not_found="Recipe not found"):
+            raise api_error("PGRST116")
+    assert raised.value.status_code == 404
+    assert raised.value.detail == "Recipe not found"
+
+    with pytest.raises(HTTPException) as raised:
+        with supabase_errors():
+            raise api_error("42703", "column does not exist")
+    assert raised.value.status_code == 400
+    assert raised.value.detail == "Supabase error: column does not exist"
+
+    with pytest.raises(HTTPException) as raised:
+        with supabase_errors():
+            raise HTTPException(status_code=403, detail="Forbidden")
+    assert raised.value.status_code == 403
+
+
+def test_install_error_handlers():
+    app = FastAPI()
+    install_error_handlers(app)
+
+    @app.get("/conflict")
+    def conflict():
+        raise api_error("23505", "duplicate key value")
+
+    response = TestClient(app).get("/conflict")
+    assert response.status_code == 409
+    assert response.json() == {"detail": "Supabase error: duplicate key value"}
+
+
+def test_install_deadline():
+    app = FastAPI()
+    install_error_handlers(app)
+    install_deadline(app, 5.0)
+    ok = httpx.MockTransport(lambda request: httpx.Response(200))
+    client = httpx.Client(transport=ResilientTransport(Policy(), ok))
+
+    @app.get("/remaining")
+    def sync_remaining():
+        return remaining()
+
+    @app.get("/async/remaining")
+    async def async_remaining():
+        return remaining()
+
+    @app.get("/expired")
+    def expired():
+        client.get("http://db/rest/v1/Menu")
+
+    for path in ("/remaining", "/async/remaining"):
+        assert 0 < TestClient(app).get(path).json() <= 5.0
+    assert remaining() is None
+
+    app = FastAPI()
+    install_error_handlers(app)
+    install_deadline(app, 0.0)
+    app.get("/expired")(expired)
+    assert TestClient(app).get("/expired").status_code == 504
@@ -0,0 +1,161 @@
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from data_access import (
+    AsyncResilientTransport,
+    CircuitBreaker,
+    CircuitOpen,
+    DeadlineExceeded,
+    Policy,
+    ResilientTransport,
+    Unavailable,
+    deadline,
+)
+
+FAST = dict(backoff=0.001, max_backoff=0.001)
+
+
+def flaky(statuses):
+    """
+    A mock transport answering with each of `statuses` in turn; an exception
+    in place of a status is raised instead.
+    """
+    calls = []
+
+    def handler(request):
+        calls.append(request.method)
+        status = statuses[min(len(calls), len(statuses)) - 1]
+        if isinstance(status, Exception):
+            raise status
+        return httpx.Response(status, json={"attempt": len(calls)})
+
+    return httpx.MockTransport(handler), calls
+
+
+def test_retries_idempotent_reads():
+    mock, calls = flaky([503, httpx.ConnectError("refused"), 200])
+    client = httpx.Client(transport=ResilientTransport(Policy(**FAST), mock))
+
+    response = client.get("http://db/rest/v1/Menu")
+
+    assert response.status_code == 200
+    assert len(calls) == 3
+
+
+def test_does_not_retry_writes():
+    mock, calls = flaky([503, 200])
+    client = httpx.Client(transport=ResilientTransport(Policy(**FAST), mock))
+
+    assert client.post("http://db/rest/v1/Menu", json={}).status_code == 503
+    assert calls == ["POST"]
+
+
+def test_gives_up_after_retries():
+    mock, calls = flaky([httpx.ConnectError("refused")])
+    client = httpx.Client(transport=ResilientTransport(Policy(retries=1, **FAST), mock))
+
+    with pytest.raises(Unavailable):
+        client.get("http://db/rest/v1/Menu")
+    assert len(calls) == 2
+
+
+def test_circuit_opens_per_api():
+    mock, calls = flaky([500])
+    transport = ResilientTransport(Policy(retries=0, failure_threshold=2, reset_after=60), mock)
+    client = httpx.Client(transport=transport)
+
+    client.get("http://db/rest/v1/Menu")
+    client.get("http://db/rest/v1/Menu")
+    with pytest.raises(CircuitOpen):
+        client.get("http://db/rest/v1/Menu")
+
+    assert len(calls) == 2
+    assert client.get("http://db/storage/v1/object/images").status_code == 500
+    assert transport.metrics()["circuits"] == {"db:/rest": "open", "db:/storage": "closed"}
+
+
+def test_circuit_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_after=0.01)
+    breaker.record(False)
+    assert not breaker.allow()
+
+    time.sleep(0.02)
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+
+    breaker.record(True)
+    assert breaker.state == "closed"
+
+
+def test_deadline_exceeded():
+    mock, calls = flaky([200])
+    client = httpx.Client(transport=ResilientTransport(Policy(), mock))
+
+    with deadline(0):
+        with pytest.raises(DeadlineExceeded):
+            client.get("http://db/rest/v1/Menu")
+    assert calls == []
+
+
+def test_hedged_read():
+    delays = [0.5, 0.0]
+
+    def handler(request):
+        time.sleep(delays.pop(0))
+        return httpx.Response(200)
+
+    transport = ResilientTransport(Policy(hedge_after=0.02), httpx.MockTransport(handler))
+    started = time.monotonic()
+    httpx.Client(transport=transport).get("http://db/rest/v1/Menu")
+
+    assert time.monotonic() - started < 0.4
+    assert transport.metrics()["hedged"] == 1
+    transport.close()
+
+
+def test_async_timeout_and_retry():
+    attempts = []
+
+    async def handler(request):
+        attempts.append(request.extensions["timeout"]["read"])
+        if len(attempts) == 1:
+            await asyncio.sleep(1)
+        return httpx.Response(200)
+
+    async def main():
+        transport = AsyncResilientTransport(Policy(timeout=0.05, **FAST), httpx.MockTransport(handler))
+        async with httpx.AsyncClient(transport=transport) as client:
+            response = await client.get("http://db/rest/v1/Menu")
+        return response, transport.metrics()
+
+    response, metrics = asyncio.run(main())
+    assert response.status_code == 200
+    assert attempts == [0.05, 0.05]
+    assert metrics["retries"] == 1
+
+
+def test_async_hedged_read():
+    delays = [0.5, 0.0]
+
+    async def handler(request):
+        await asyncio.sleep(delays.pop(0))
+        return httpx.Response(200)
+
+    async def main():
+        transport = AsyncResilientTransport(Policy(hedge_after=0.02), httpx.MockTransport(handler))
+        async with httpx.AsyncClient(transport=transport) as client:
+            started = time.monotonic()
+            await client.get("http://db/rest/v1/Menu")
+            return time.monotonic() - started, transport.metrics()
+
+    elapsed, metrics = asyncio.run(main())
+    assert elapsed < 0.4
+    assert metrics["hedged"] == 1
@@ -0,0 +1,51 @@
+"""
+Compare the per-row `calculate_distance` loop with the vectorized
+`calculate_distances` batch API.
+
+Usage: python benchmarks/bench_distance.py [restaurant counts...]
+"""
+
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from models import Location
+from utils import calculate_distance, calculate_distances
+
+
+def bench(count: int, repeat: int = 5):
+    rng = np.random.default_rng(0)
+    # Restaurants scattered around KAIST, as Location rows would arrive from Supabase
+    rows = [
+        {"latitude": lat, "longitude": lon, "inside_kaist": False}
+        for lat, lon in zip(
+            rng.normal(36.37, 0.05, count), rng.normal(127.36, 0.05, count)
+        )
+    ]
+    origin = Location(latitude=36.3721, longitude=127.3604)
+
+    def per_row():
+        return [calculate_distance(origin, Location(**row)) for row in rows]
+
+    latitudes = np.fromiter((row["latitude"] for row in rows), dtype=np.float64)
+    longitudes = np.fromiter((row["longitude"] for row in rows), dtype=np.float64)
+
+    def batch():
+        return calculate_distances(origin, latitudes, longitudes)
+
+    max_error = float(np.max(np.abs(np.asarray(per_row()) - batch())))
+    loop_time = min(timeit.repeat(per_row, number=1, repeat=repeat))
+    batch_time = min(timeit.repeat(batch, number=1, repeat=repeat))
+    print(
+        f"{count:>8} restaurants  loop {loop_time * 1000:9.2f} ms  "
+        f"batch {batch_time * 1000:7.3f} ms  speedup {loop_time / batch_time:7.1f}x  "
+        f"max error {max_error:.2e} m"
+    )
+
+
+if __name__ == "__main__":
+    for count in [int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 100_000]:
+        bench(count)
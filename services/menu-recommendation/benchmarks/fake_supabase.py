@@ -0,0 +1,450 @@
+"""
+Local stand-in for the Supabase project the menu service talks to, for
+load testing without a live backend. It serves the parts of the PostgREST
+table API, the auth admin user lookup and the storage object API that
+`main.py` uses, keeps every table in memory, and sleeps a configurable time
+on every call.
+
+Usage: python benchmarks/fake_supabase.py [--port 54321] [--latency SECONDS]
+           [--latency KIND=SECONDS ...] [--restaurants N] [--menus N]
+           [--ratings N] [--users N]
+
+KIND is one of select, insert, upsert, update, delete, auth, upload, remove.
+Call counts are served at GET /__fake/stats and reset by POST /__fake/reset.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+CALL_KINDS = ["select", "insert", "upsert", "update", "delete", "auth", "upload", "remove"]
+
+INGREDIENTS = [
+    "pork", "pork belly", "beef", "ground beef", "chicken", "fried chicken",
+    "duck", "lamb", "shrimp", "squid", "salmon", "tuna", "tofu", "egg",
+    "rice", "fried rice", "noodles", "kimchi", "cabbage", "mushroom",
+    "onion", "green onion", "garlic", "potato", "sweet potato", "cheese",
+    "milk", "peanut", "soy sauce", "gochujang", "seaweed", "spinach",
+]
+
+# Every column of the tables the service reads, filled with null when not inserted
+COLUMNS = {
+    "Location": ["id", "latitude", "longitude", "inside_kaist", "created_at", "updated_at"],
+    "Restaurant": [
+        "id", "name", "address", "telephone", "image_url", "location", "created_at",
+        "updated_at",
+    ],
+    "Menu": [
+        "id", "name", "description", "main_ingredients", "price", "image_url",
+        "restaurant", "created_at", "updated_at",
+    ],
+    "Rating": ["id", "rating_value", "comment_text", "menu", "recipe", "created_at"],
+    "Profile": ["id", "user", "current_location", "dietary_preferences", "dietary_restrictions"],
+}
+
+
+def user_id(index: int) -> str:
+    """
+    Auth user id of the `index`-th seeded user.
+    """
+    return str(uuid.UUID(int=index + 1))
+
+
+class FakeSupabase:
+    """
+    In-memory tables, storage objects and users, with a count of every call
+    by kind and table.
+    """
+
+    def __init__(self, latency: Optional[Dict[str, float]] = None):
+        self.latency = {kind: 0.0 for kind in CALL_KINDS}
+        self.latency.update(latency or {})
+        self.tables: Dict[str, List[dict]] = {}
+        self.objects: Dict[str, int] = {}
+        self.users: Dict[str, dict] = {}
+        self.calls = Counter()
+        self._ids = defaultdict(lambda: itertools.count(1))
+        self._clock = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    async def call(self, kind: str, target: str):
+        self.calls[f"{kind} {target}"] += 1
+        if self.latency[kind]:
+            await asyncio.sleep(self.latency[kind])
+
+    def insert(self, table: str, row: dict) -> dict:
+        row = {**dict.fromkeys(COLUMNS.get(table, [])), **row}
+        if row.get("id") is None:
+            row["id"] = next(self._ids[table])
+        if "created_at" in COLUMNS.get(table, ["created_at"]) and row.get("created_at") is None:
+            row["created_at"] = self.tick()
+        self.touch(table, row)
+        self.tables.setdefault(table, []).append(row)
+        return row
+
+    def tick(self) -> str:
+        # Strictly increasing, so the catalog's watermarks never skip a row
+        self._clock += timedelta(microseconds=1)
+        return self._clock.isoformat()
+
+    def touch(self, table: str, row: dict):
+        """
+        Stamp `updated_at` like the migration's trigger does.
+        """
+        if "updated_at" in COLUMNS.get(table, []):
+            row["updated_at"] = self.tick()
+
+    def add_user(self, uid: str):
+        self.users[uid] = {
+            "id": uid,
+            "aud": "authenticated",
+            "role": "authenticated",
+            "app_metadata": {},
+            "user_metadata": {},
+            "created_at": self._clock.isoformat(),
+        }
+
+    def seed(
+        self,
+        restaurants: int = 200,
+        menus: int = 10,
+        ratings: int = 5,
+        users: int = 50,
+        seed: int = 0,
+    ):
+        """
+        Synthetic restaurants around KAIST, each with `menus` menus of two or
+        three main ingredients and `ratings` ratings per menu, and `users`
+        users with a profile, dietary preferences and a current location.
+        """
+        rng = random.Random(seed)
+
+        def location():
+            return self.insert(
+                "Location",
+                {
+                    "latitude": rng.gauss(36.372, 0.01),
+                    "longitude": rng.gauss(127.360, 0.01),
+                    "inside_kaist": rng.random() < 0.4,
+                },
+            )
+
+        for r in range(restaurants):
+            restaurant = self.insert(
+                "Restaurant",
+                {
+                    "name": f"Restaurant {r}",
+                    "address": f"{r} Daehak-ro, Yuseong-gu, Daejeon",
+                    "telephone": f"042-{r:04d}",
+                    "image_url": None,
+                    "location": location()["id"],
+                },
+            )
+            for m in range(menus):
+                menu = self.insert(
+                    "Menu",
+                    {
+                        "name": f"Menu {r}-{m}",
+                        "description": "A synthetic menu",
+                        "main_ingredients": [
+                            {"name": name, "description": ""}
+                            for name in rng.sample(INGREDIENTS, rng.randint(2, 3))
+                        ],
+                        "price": float(rng.randrange(5000, 20000, 500)),
+                        "image_url": None,
+                        "restaurant": restaurant["id"],
+                    },
+                )
+                for _ in range(ratings):
+                    self.insert(
+                        "Rating",
+                        {
+                            "menu": menu["id"],
+                            "recipe": None,
+                            "rating_value": rng.randint(1, 5),
+                            "comment_text": "",
+                        },
+                    )
+
+        for u in range(users):
+            uid = user_id(u)
+            self.add_user(uid)
+            self.insert(
+                "Profile",
+                {
+                    "user": uid,
+                    "current_location": location()["id"],
+                    "dietary_preferences": [
+                        {"name": name, "description": ""}
+                        for name in rng.sample(INGREDIENTS, 4)
+                    ],
+                    "dietary_restrictions": [],
+                },
+            )
+
+
+"""
+PostgREST filters
+"""
+
+
+def _coerce(text: str, like):
+    """
+    A filter value as the type of the column value it is compared with.
+    """
+    if isinstance(like, bool):
+        return text == "true"
+    if isinstance(like, (int, float)):
+        try:
+            return float(text) if "." in text else int(text)
+        except ValueError:
+            return text
+    return text
+
+
+def _split_list(text: str) -> List[str]:
+    values, current, quoted, escaped = [], "", False, False
+    for char in text.strip("()"):
+        if escaped:
+            current += char
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == '"':
+            quoted = not quoted
+        elif char == "," and not quoted:
+            values.append(current)
+            current = ""
+        else:
+            current += char
+    values.append(current)
+    return values
+
+
+def _predicate(column: str, expression: str):
+    negate = expression.startswith("not.")
+    if negate:
+        expression = expression[len("not."):]
+    operator, _, operand = expression.partition(".")
+    # An in list is split once, and coerced once per column value type
+    items = _split_list(operand) if operator == "in" else None
+    item_sets = {}
+
+    def matches(row: dict) -> bool:
+        value = row.get(column)
+        if operator == "is":
+            result = value is None if operand == "null" else value == (operand == "true")
+        elif value is None:
+            result = False
+        elif operator == "in":
+            kind = type(value)
+            if kind not in item_sets:
+                item_sets[kind] = {_coerce(item, value) for item in items}
+            result = value in item_sets[kind]
+        else:
+            other = _coerce(operand, value)
+            result = {
+                "eq": lambda: value == other,
+                "neq": lambda: value != other,
+                "gt": lambda: value > other,
+                "gte": lambda: value >= other,
+                "lt": lambda: value < other,
+                "lte": lambda: value <= other,
+            }[operator]()
+        return result != negate
+
+    return matches
+
+
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "columns", "on_conflict"}
+ID_COLUMNS = {"id", "menu", "restaurant", "location", "current_location", "recipe"}
+
+
+def _filtered(rows: List[dict], request: Request) -> List[dict]:
+    predicates = [
+        _predicate(column, expression)
+        for column, expression in request.query_params.multi_items()
+        if column not in RESERVED_PARAMS
+    ]
+    return [row for row in rows if all(predicate(row) for predicate in predicates)]
+
+
+def _project(rows: List[dict], select: str) -> List[dict]:
+    columns = [column.strip() for column in select.split(",")]
+    if "*" in columns:
+        return [dict(row) for row in rows]
+    return [{column: row.get(column) for column in columns} for row in rows]
+
+
+def _coerce_ids(row: dict) -> dict:
+    """
+    Numeric strings in id columns become integers, as Postgres would cast them.
+    """
+    return {
+        key: int(value)
+        if key in ID_COLUMNS and isinstance(value, str) and value.isdigit()
+        else value
+        for key, value in row.items()
+    }
+
+
+def _error(status_code: int, message: str) -> JSONResponse:
+    return JSONResponse(
+        {"code": str(status_code), "message": message, "details": None, "hint": None},
+        status_code=status_code,
+    )
+
+
+def create_app(backend: FakeSupabase) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/rest/v1/{table}")
+    async def select_rows(table: str, request: Request):
+        await backend.call("select", table)
+        if table not in backend.tables:
+            return _error(404, f'relation "public.{table}" does not exist')
+        rows = _filtered(backend.tables[table], request)
+        for item in reversed(request.query_params.get("order", "").split(",")):
+            if item:
+                column, _, direction = item.partition(".")
+                rows = sorted(
+                    rows,
+                    key=lambda row: (row.get(column) is None, row.get(column)),
+                    reverse=direction.startswith("desc"),
+                )
+        offset = int(request.query_params.get("offset", 0))
+        limit = request.query_params.get("limit")
+        rows = rows[offset:offset + int(limit) if limit is not None else None]
+        return _project(rows, request.query_params.get("select", "*"))
+
+    @app.post("/rest/v1/{table}", status_code=201)
+    async def insert_rows(table: str, request: Request):
+        body = await request.json()
+        rows = body if isinstance(body, list) else [body]
+        upsert = "resolution=merge-duplicates" in request.headers.get("prefer", "")
+        await backend.call("upsert" if upsert else "insert", table)
+
+        stored = backend.tables.setdefault(table, [])
+        result = []
+        for row in map(_coerce_ids, rows):
+            existing = next(
+                (item for item in stored if upsert and "id" in row and item["id"] == row["id"]),
+                None,
+            )
+            if existing is not None:
+                existing.update(row)
+                backend.touch(table, existing)
+                result.append(dict(existing))
+            else:
+                result.append(dict(backend.insert(table, row)))
+        return result
+
+    @app.patch("/rest/v1/{table}")
+    async def update_rows(table: str, request: Request):
+        await backend.call("update", table)
+        changes = _coerce_ids(await request.json())
+        rows = _filtered(backend.tables.get(table, []), request)
+        for row in rows:
+            row.update(changes)
+            backend.touch(table, row)
+        return [dict(row) for row in rows]
+
+    @app.delete("/rest/v1/{table}")
+    async def delete_rows(table: str, request: Request):
+        await backend.call("delete", table)
+        rows = _filtered(backend.tables.get(table, []), request)
+        deleted = {id(row) for row in rows}
+        backend.tables[table] = [
+            row for row in backend.tables.get(table, []) if id(row) not in deleted
+        ]
+        return [dict(row) for row in rows]
+
+    @app.get("/auth/v1/admin/users/{uid}")
+    async def get_user(uid: str):
+        await backend.call("auth", "users")
+        if uid not in backend.users:
+            return JSONResponse({"code": 404, "msg": "User not found"}, status_code=404)
+        return backend.users[uid]
+
+    @app.post("/storage/v1/object/{bucket}/{path:path}")
+    async def upload_object(bucket: str, path: str, request: Request):
+        await backend.call("upload", bucket)
+        key = f"{bucket}/{path}"
+        if key in backend.objects and request.headers.get("x-upsert") != "true":
+            return JSONResponse(
+                {"statusCode": "409", "error": "Duplicate", "message": "The resource already exists"},
+                status_code=400,
+            )
+        backend.objects[key] = len(await request.body())
+        return {"Key": key, "Id": str(uuid.uuid4())}
+
+    @app.delete("/storage/v1/object/{bucket}")
+    async def remove_objects(bucket: str, request: Request):
+        await backend.call("remove", bucket)
+        removed = []
+        for path in (await request.json())["prefixes"]:
+            if backend.objects.pop(f"{bucket}/{path}", None) is not None:
+                removed.append({"name": path, "bucket_id": bucket})
+        return removed
+
+    @app.get("/__fake/stats")
+    async def stats():
+        return {
+            "calls": dict(backend.calls),
+            "total": sum(backend.calls.values()),
+            "rows": {table: len(rows) for table, rows in backend.tables.items()},
+            "objects": len(backend.objects),
+        }
+
+    @app.post("/__fake/reset", status_code=204)
+    async def reset():
+        backend.calls.clear()
+        return Response(status_code=204)
+
+    return app
+
+
+def parse_latency(values: List[str]) -> Dict[str, float]:
+    """
+    `SECONDS` sets every kind of call, `KIND=SECONDS` one kind.
+    """
+    latency = {}
+    for value in values:
+        kind, _, seconds = value.rpartition("=")
+        if kind and kind not in CALL_KINDS:
+            raise argparse.ArgumentTypeError(f"unknown call kind {kind!r}")
+        for name in [kind] if kind else CALL_KINDS:
+            latency[name] = float(seconds)
+    return latency
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--latency", action="append", default=[])
+    parser.add_argument("--restaurants", type=int, default=200)
+    parser.add_argument("--menus", type=int, default=10)
+    parser.add_argument("--ratings", type=int, default=5)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    backend = FakeSupabase(parse_latency(args.latency))
+    backend.seed(args.restaurants, args.menus, args.ratings, args.users, args.seed)
+    print(json.dumps({"latency": backend.latency, "rows": {t: len(r) for t, r in backend.tables.items()}}))
+    uvicorn.run(create_app(backend), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
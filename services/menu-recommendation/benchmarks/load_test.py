@@ -0,0 +1,521 @@
+"""
+Load test the menu service against the local fake Supabase backend.
+
+Starts `fake_supabase.py` with seeded synthetic data and the service itself
+under uvicorn, drives every endpoint at each concurrency, and reports
+throughput, p50/p95/p99 latency and backend calls per request. A run can be
+saved as a baseline and later runs compared against it; the exit status is
+1 when any scenario regressed by more than the tolerance.
+
+Usage: python benchmarks/load_test.py [--concurrency 1 8 32] [--requests 200]
+           [--latency SECONDS] [--scenarios NAME ...]
+           [--save-baseline PATH] [--baseline PATH] [--tolerance 0.15]
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+import numpy as np
+from PIL import Image
+
+sys.path.append(os.path.dirname(__file__))
+from fake_supabase import INGREDIENTS, user_id
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(BENCHMARKS, "../src")
+# Not a real key; the fake backend does not check it
+FAKE_KEY = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.fake"
+ADMIN_TOKEN = "load-test"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def png_bytes(size: int = 640) -> bytes:
+    output = io.BytesIO()
+    Image.new("RGB", (size, size), (200, 120, 40)).save(output, "PNG")
+    return output.getvalue()
+
+
+"""
+Scenarios
+"""
+
+
+@dataclass
+class Context:
+    """
+    What the scenarios need to know about the seeded data.
+    """
+
+    restaurants: int
+    menus: int
+    users: int
+    image: bytes
+    rng: random.Random
+
+    def restaurant_id(self) -> int:
+        return self.rng.randint(1, self.restaurants)
+
+    def menu_id(self) -> int:
+        return self.rng.randint(1, self.restaurants * self.menus)
+
+    def user(self) -> dict:
+        return {"x-user-uuid": user_id(self.rng.randrange(self.users))}
+
+    def group(self, size: int) -> dict:
+        members = self.rng.sample(range(self.users), min(size, self.users))
+        return {"users": [user_id(member) for member in members]}
+
+    def new_menu(self, name: str) -> dict:
+        return {
+            "name": name,
+            "description": "Created by the load test",
+            "main_ingredients": [
+                {"name": ingredient, "description": ""}
+                for ingredient in self.rng.sample(INGREDIENTS, 2)
+            ],
+            "price": float(self.rng.randrange(5000, 20000, 500)),
+            "image": None,
+        }
+
+
+Request = Callable[[httpx.AsyncClient, Context, int], Awaitable[httpx.Response]]
+
+
+@dataclass
+class Scenario:
+    name: str
+    request: Request
+    # Creates whatever a destructive scenario consumes, one per request
+    prepare: Optional[Callable[[httpx.AsyncClient, Context, int], Awaitable[list]]] = None
+
+
+async def _bulk_menus(client, ctx, count, prefix) -> List[int]:
+    ids = []
+    for start in range(0, count, 500):
+        response = await client.post(
+            f"/restaurant/{ctx.restaurant_id()}/menus/bulk",
+            json={
+                "menus": [
+                    ctx.new_menu(f"{prefix} {i}")
+                    for i in range(start, min(start + 500, count))
+                ]
+            },
+        )
+        response.raise_for_status()
+        ids += [result["menu"]["id"] for result in response.json()["results"] if result["created"]]
+    return ids
+
+
+async def _prepare_menus(client, ctx, count):
+    return await _bulk_menus(client, ctx, count, f"Disposable {time.time_ns()}")
+
+
+async def _prepare_menu_batches(client, ctx, count):
+    ids = await _bulk_menus(client, ctx, count * 5, f"Disposable {time.time_ns()}")
+    return [ids[i:i + 5] for i in range(0, len(ids), 5)]
+
+
+async def _prepare_restaurants(client, ctx, count):
+    ids = []
+    for i in range(count):
+        response = await client.post("/restaurant", json=_new_restaurant(ctx, f"Disposable {time.time_ns()} {i}"))
+        response.raise_for_status()
+        ids.append(response.json()["id"])
+    return ids
+
+
+def _new_restaurant(ctx, name):
+    return {
+        "name": name,
+        "address": "291 Daehak-ro, Yuseong-gu, Daejeon",
+        "telephone": "042-350-2114",
+        "location": {
+            "latitude": 36.372 + ctx.rng.uniform(-0.01, 0.01),
+            "longitude": 127.360 + ctx.rng.uniform(-0.01, 0.01),
+            "inside_kaist": False,
+        },
+        "image": None,
+    }
+
+
+def _data_url(image: bytes) -> str:
+    return "data:image/png;base64," + base64.b64encode(image).decode()
+
+
+SCENARIOS = [
+    Scenario("list_restaurants", lambda c, ctx, i: c.get("/restaurant", params={"limit": 50})),
+    Scenario("get_restaurant", lambda c, ctx, i: c.get(f"/restaurant/{ctx.restaurant_id()}")),
+    Scenario(
+        "match_restaurants",
+        lambda c, ctx, i: c.get(
+            "/restaurant/matches",
+            params={"restrictions": ctx.rng.sample(INGREDIENTS, 2), "limit": 20},
+            headers=ctx.user(),
+        ),
+    ),
+    Scenario(
+        "match_restaurants_group",
+        lambda c, ctx, i: c.post(
+            "/restaurant/matches/group",
+            params={"restrictions": ctx.rng.sample(INGREDIENTS, 2), "limit": 20},
+            json=ctx.group(4),
+        ),
+    ),
+    Scenario("list_menus", lambda c, ctx, i: c.get("/menu", params={"limit": 50, "sort": "price"})),
+    Scenario(
+        "restaurant_menus",
+        lambda c, ctx, i: c.get(f"/restaurant/{ctx.restaurant_id()}/menu", headers=ctx.user()),
+    ),
+    Scenario("get_menu", lambda c, ctx, i: c.get(f"/menu/{ctx.menu_id()}")),
+    Scenario("menu_rating", lambda c, ctx, i: c.get(f"/menu/{ctx.menu_id()}/rating")),
+    Scenario(
+        "rate_menu",
+        lambda c, ctx, i: c.post(
+            f"/menu/{ctx.menu_id()}/rate",
+            json={"rating_value": ctx.rng.randint(1, 5), "comment_text": "load test"},
+        ),
+    ),
+    Scenario(
+        "create_restaurant",
+        lambda c, ctx, i: c.post(
+            "/restaurant", json=_new_restaurant(ctx, f"Load test {time.time_ns()} {i}")
+        ),
+    ),
+    Scenario(
+        "create_menu",
+        lambda c, ctx, i: c.post(
+            f"/restaurant/{ctx.restaurant_id()}/menu",
+            json=ctx.new_menu(f"Load test {time.time_ns()} {i}"),
+        ),
+    ),
+    Scenario(
+        "create_menu_with_image",
+        lambda c, ctx, i: c.post(
+            f"/restaurant/{ctx.restaurant_id()}/menu",
+            json={**ctx.new_menu(f"Load test {time.time_ns()} {i}"), "image": _data_url(ctx.image)},
+        ),
+    ),
+    Scenario(
+        "bulk_create_menus",
+        lambda c, ctx, i: c.post(
+            f"/restaurant/{ctx.restaurant_id()}/menus/bulk",
+            json={"menus": [ctx.new_menu(f"Load test {time.time_ns()} {i}-{j}") for j in range(10)]},
+        ),
+    ),
+    Scenario(
+        "sync_menus",
+        lambda c, ctx, restaurant_id: c.put(
+            f"/restaurant/{restaurant_id}/menus/sync",
+            json={"menus": [ctx.new_menu(f"Synced {j}") for j in range(10)]},
+        ),
+        # Syncing deletes every other menu, so never sync a seeded restaurant
+        prepare=_prepare_restaurants,
+    ),
+    Scenario(
+        "upload_menu_image",
+        lambda c, ctx, i: c.put(
+            f"/menu/{ctx.menu_id()}/image",
+            files={"image": ("menu.png", ctx.image, "image/png")},
+        ),
+    ),
+    Scenario(
+        "upload_restaurant_image",
+        lambda c, ctx, i: c.put(
+            f"/restaurant/{ctx.restaurant_id()}/image",
+            files={"image": ("restaurant.png", ctx.image, "image/png")},
+        ),
+    ),
+    Scenario(
+        "delete_menu",
+        lambda c, ctx, menu_id: c.delete(f"/menu/{menu_id}"),
+        prepare=_prepare_menus,
+    ),
+    Scenario(
+        "delete_menus_batch",
+        lambda c, ctx, menu_ids: c.delete("/menu", params={"ids": ",".join(map(str, menu_ids))}),
+        prepare=_prepare_menu_batches,
+    ),
+    Scenario(
+        "delete_restaurant",
+        lambda c, ctx, restaurant_id: c.delete(f"/restaurant/{restaurant_id}"),
+        prepare=_prepare_restaurants,
+    ),
+    Scenario(
+        "reconcile_ratings",
+        lambda c, ctx, i: c.post(
+            "/menu/ratings/reconcile", headers={"x-admin-token": ADMIN_TOKEN}
+        ),
+    ),
+    Scenario("invalidate_user_context", lambda c, ctx, i: c.delete(f"/user/{ctx.user()['x-user-uuid']}/context")),
+    Scenario("user_context_metrics", lambda c, ctx, i: c.get("/user/context/metrics")),
+    Scenario("cleanup_metrics", lambda c, ctx, i: c.get("/cleanup/metrics")),
+    Scenario("cache_metrics", lambda c, ctx, i: c.get("/cache/metrics")),
+    Scenario("root", lambda c, ctx, i: c.get("/")),
+]
+
+
+"""
+Running
+"""
+
+
+class Servers:
+    """
+    The fake backend and the service, each in its own process.
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.backend_url = f"http://127.0.0.1:{free_port()}"
+        self.service_url = f"http://127.0.0.1:{free_port()}"
+        self.processes = []
+
+    async def __aenter__(self):
+        backend_port = self.backend_url.rsplit(":", 1)[1]
+        self.processes.append(
+            subprocess.Popen(
+                [
+                    sys.executable, os.path.join(BENCHMARKS, "fake_supabase.py"),
+                    "--port", backend_port,
+                    "--latency", str(self.args.latency),
+                    "--restaurants", str(self.args.restaurants),
+                    "--menus", str(self.args.menus),
+                    "--ratings", str(self.args.ratings),
+                    "--users", str(self.args.users),
+                ],
+                stdout=subprocess.DEVNULL,
+            )
+        )
+        await self._wait(f"{self.backend_url}/__fake/stats")
+
+        env = {
+            **os.environ,
+            "SUPABASE_URL": self.backend_url,
+            "SUPABASE_KEY": FAKE_KEY,
+            "ADMIN_TOKEN": ADMIN_TOKEN,
+            # Keep background polling out of the measured backend calls
+            "CATALOG_REFRESH_SECONDS": "3600",
+            "CATALOG_RELOAD_SECONDS": "3600",
+            "CATALOG_MAX_STALENESS_SECONDS": "3600",
+            # A route over its query budget fails, and shows up as errors
+            "QUERY_BUDGET_MODE": "raise",
+        }
+        self.processes.append(
+            subprocess.Popen(
+                [
+                    sys.executable, "-m", "uvicorn", "main:app",
+                    "--port", self.service_url.rsplit(":", 1)[1],
+                    "--log-level", "warning",
+                    "--no-access-log",
+                ],
+                cwd=SRC,
+                env=env,
+            )
+        )
+        await self._wait(f"{self.service_url}/")
+        return self
+
+    async def __aexit__(self, *exc):
+        for process in reversed(self.processes):
+            process.terminate()
+            process.wait(timeout=10)
+
+    async def _wait(self, url, timeout: float = 30):
+        deadline = time.monotonic() + timeout
+        async with httpx.AsyncClient() as client:
+            while True:
+                try:
+                    (await client.get(url)).raise_for_status()
+                    return
+                except httpx.HTTPError:
+                    if time.monotonic() > deadline or any(p.poll() is not None for p in self.processes):
+                        raise RuntimeError(f"{url} did not come up")
+                    await asyncio.sleep(0.1)
+
+
+async def settle(client: httpx.AsyncClient):
+    """
+    Wait for deferred cleanup to finish, so it is counted against the
+    scenario that caused it.
+    """
+    for _ in range(200):
+        if (await client.get("/cleanup/metrics")).json()["pending"] == 0:
+            return
+        await asyncio.sleep(0.05)
+
+
+async def run_scenario(
+    scenario: Scenario,
+    concurrency: int,
+    requests: int,
+    client: httpx.AsyncClient,
+    backend: httpx.AsyncClient,
+    ctx: Context,
+) -> dict:
+    work = await scenario.prepare(client, ctx, requests) if scenario.prepare else list(range(requests))
+    await settle(client)
+    await backend.post("/__fake/reset")
+
+    latencies = []
+    errors = 0
+    queue = iter(work)
+
+    async def worker():
+        nonlocal errors
+        for item in queue:
+            started = time.perf_counter()
+            try:
+                response = await scenario.request(client, ctx, item)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    await settle(client)
+    calls = (await backend.get("/__fake/stats")).json()
+    # The settle polls above only hit the service, so every backend call is the scenario's
+    p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "backend_calls": calls["total"] / max(len(latencies), 1),
+        "backend_calls_by_kind": {
+            kind: count / max(len(latencies), 1) for kind, count in sorted(calls["calls"].items())
+        },
+    }
+
+
+async def run(args) -> dict:
+    scenarios = [s for s in SCENARIOS if not args.scenarios or s.name in args.scenarios]
+    ctx = Context(args.restaurants, args.menus, args.users, png_bytes(), random.Random(0))
+    results = {}
+    async with Servers(args) as servers:
+        limits = httpx.Limits(max_connections=max(args.concurrency) + 1)
+        async with (
+            httpx.AsyncClient(base_url=servers.service_url, limits=limits, timeout=60) as client,
+            httpx.AsyncClient(base_url=servers.backend_url) as backend,
+        ):
+            # Load the catalog before anything is measured
+            (await client.get("/restaurant", params={"limit": 1})).raise_for_status()
+            for scenario in scenarios:
+                for concurrency in args.concurrency:
+                    result = await run_scenario(
+                        scenario, concurrency, args.requests, client, backend, ctx
+                    )
+                    results.setdefault(scenario.name, {})[str(concurrency)] = result
+                    print(format_row(scenario.name, concurrency, result), flush=True)
+    return results
+
+
+"""
+Reporting
+"""
+
+
+HEADER = (
+    f"{'scenario':<26}{'conc':>5}{'req/s':>10}{'p50 ms':>9}{'p95 ms':>9}"
+    f"{'p99 ms':>9}{'calls/req':>11}{'errors':>8}"
+)
+
+
+def format_row(name, concurrency, result, note="") -> str:
+    return (
+        f"{name:<26}{concurrency:>5}{result['throughput']:>10.1f}{result['p50_ms']:>9.1f}"
+        f"{result['p95_ms']:>9.1f}{result['p99_ms']:>9.1f}{result['backend_calls']:>11.2f}"
+        f"{result['errors']:>8}{note}"
+    )
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """
+    Print every scenario against the baseline and return the regressions:
+    throughput or p95 latency worse by more than `tolerance`, or more
+    backend calls per request.
+    """
+    print(f"\nAgainst baseline ({baseline['config']})")
+    print(f"{'scenario':<26}{'conc':>5}{'req/s':>10}{'p95 ms':>10}{'calls/req':>12}")
+    regressions = []
+    for name, by_concurrency in results.items():
+        for concurrency, result in by_concurrency.items():
+            before = baseline["results"].get(name, {}).get(concurrency)
+            if before is None:
+                continue
+            throughput = result["throughput"] / before["throughput"] - 1
+            p95 = result["p95_ms"] / before["p95_ms"] - 1
+            calls = result["backend_calls"] - before["backend_calls"]
+            print(f"{name:<26}{concurrency:>5}{throughput:>+10.0%}{p95:>+10.0%}{calls:>+12.2f}")
+            if throughput < -tolerance:
+                regressions.append(f"{name} at {concurrency}: throughput {throughput:+.0%}")
+            if p95 > tolerance:
+                regressions.append(f"{name} at {concurrency}: p95 latency {p95:+.0%}")
+            if calls > 0.01:
+                regressions.append(f"{name} at {concurrency}: {calls:+.2f} backend calls per request")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.005, help="seconds per backend call")
+    parser.add_argument("--restaurants", type=int, default=200)
+    parser.add_argument("--menus", type=int, default=10)
+    parser.add_argument("--ratings", type=int, default=5)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--scenarios", nargs="+", choices=[s.name for s in SCENARIOS])
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--baseline", metavar="PATH")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+
+    config = {
+        key: getattr(args, key)
+        for key in ["requests", "latency", "restaurants", "menus", "ratings", "users"]
+    }
+    print(HEADER)
+    results = asyncio.run(run(args))
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump({"config": config, "results": results}, f, indent=2)
+        print(f"\nSaved baseline to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["config"] != config:
+            print(f"\nWarning: baseline was run with {baseline['config']}, this run with {config}")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,581 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+from data_access.catalog_snapshot import CATALOG_SETS, changed_at, snapshot_meta
+from data_access import Snapshot, SnapshotFile
+from supabase import AsyncClient
+
+from ingredients import IngredientIndex, normalize_ingredient
+from models import Location, Restaurant
+from ratings import RatingAggregates
+from spatial import RestaurantGrid
+from utils import fetch_all_rows
+
+"""
+Catalog snapshot
+"""
+
+logger = logging.getLogger(__name__)
+
+TABLES = ("Restaurant", "Location", "Menu")
+
+
+class Catalog:
+    """
+    Snapshot of the Restaurant, Location and Menu tables together with the
+    menu rating aggregates.
+
+    The tables are read from a columnar `Snapshot`: the file a builder
+    process maps into every worker when `snapshot_file` is set, otherwise
+    one built in this process from a full load. On top of it sits an
+    overlay of the rows this service wrote or removed since the snapshot was
+    built, and of other writers' changes: inserts and edits are picked up by
+    polling rows whose `updated_at` is past the newest one seen, deletes by
+    comparing the Restaurant and Menu ids with the catalog's.
+    """
+
+    def __init__(self, ratings: RatingAggregates, snapshot_file: Optional[SnapshotFile] = None):
+        self.ratings = ratings
+        self.snapshot_file = snapshot_file
+        self.loaded = False
+        self.refreshed_at = 0.0
+        self.reloaded_at = 0.0
+        self._snapshot = None
+        self._menus_by_restaurant = None
+        # Rows newer than the snapshot by table and id, None for a removed row
+        self._overlay = {table: {} for table in TABLES}
+        self._overlay_menus = {}
+        self._written_at = {}
+        self._watermarks = {}
+        self._coordinates = None
+        self._grid = None
+        self._ingredients = None
+        self._version = 0
+        self._lock = threading.RLock()
+        self._refresh_lock = asyncio.Lock()
+
+    def age(self) -> float:
+        return time.monotonic() - self.refreshed_at
+
+    @property
+    def version(self) -> tuple:
+        """
+        Changes whenever anything a response is rendered from changes: the
+        catalog rows or the rating aggregates.
+        """
+        return (self._version, self.ratings.version)
+
+    """
+    Loading and refreshing
+    """
+
+    async def load(self, supabase: AsyncClient):
+        """
+        Swap in the builder's latest snapshot, or without one build a snapshot
+        from a full load, and rebuild the rating aggregates.
+        """
+        snapshot = self.snapshot_file.current() if self.snapshot_file else None
+        if snapshot is not None:
+            await self.ratings.rebuild(supabase)
+            with self._lock:
+                self._swap(snapshot)
+            await self.refresh(supabase)
+            self.reloaded_at = self.refreshed_at
+            return
+
+        built_at = time.time()
+        restaurants, menus, _ = await asyncio.gather(
+            fetch_all_rows(
+                lambda: supabase.table("Restaurant").select("*").order("id")
+            ),
+            fetch_all_rows(lambda: supabase.table("Menu").select("*").order("id")),
+            self.ratings.rebuild(supabase),
+        )
+        locations = await self._fetch_locations(
+            supabase, [restaurant["location"] for restaurant in restaurants]
+        )
+        tables = {"Restaurant": restaurants, "Location": locations, "Menu": menus}
+        snapshot = await asyncio.to_thread(
+            Snapshot.from_rows, tables, snapshot_meta(tables, built_at), CATALOG_SETS
+        )
+        with self._lock:
+            self._swap(snapshot)
+            self.refreshed_at = self.reloaded_at = time.monotonic()
+
+    async def refresh(self, supabase: AsyncClient):
+        """
+        Swap in a newer snapshot if the builder wrote one, then fetch the
+        rows inserted or edited since and drop the ones deleted since.
+        """
+        snapshot = self.snapshot_file.current() if self.snapshot_file else None
+        if snapshot is not None and snapshot is not self._snapshot:
+            with self._lock:
+                self._swap(snapshot)
+
+        started = time.time()
+        restaurants, locations, menus, restaurant_ids, menu_ids = await asyncio.gather(
+            self._fetch_since(supabase, "Restaurant"),
+            self._fetch_since(supabase, "Location"),
+            self._fetch_since(supabase, "Menu"),
+            self._fetch_ids(supabase, "Restaurant"),
+            self._fetch_ids(supabase, "Menu"),
+        )
+        fetched = {location["id"] for location in locations}
+        with self._lock:
+            unknown = [
+                restaurant["location"]
+                for restaurant in restaurants
+                if restaurant["location"] not in fetched
+                and not self._exists("Location", restaurant["location"])
+            ]
+        locations += await self._fetch_locations(supabase, unknown)
+        with self._lock:
+            self._apply(restaurants, locations, menus)
+            self._drop_deleted("Restaurant", restaurant_ids, started)
+            self._drop_deleted("Menu", menu_ids, started)
+            self.refreshed_at = time.monotonic()
+
+    async def ensure_fresh(
+        self, supabase: AsyncClient, max_staleness: float
+    ) -> "Catalog":
+        # Concurrent requests on a stale snapshot share a single refresh
+        if not self.loaded or self.age() > max_staleness:
+            async with self._refresh_lock:
+                if not self.loaded:
+                    await self.load(supabase)
+                elif self.age() > max_staleness:
+                    await self.refresh(supabase)
+        return self
+
+    async def _fetch_since(self, supabase, table):
+        watermark = self._watermarks.get(table)
+
+        def build_query():
+            query = supabase.table(table).select("*")
+            if watermark is not None:
+                query = query.gt("updated_at", watermark)
+            return query.order("id")
+
+        return await fetch_all_rows(build_query)
+
+    async def _fetch_ids(self, supabase, table) -> set:
+        rows = await fetch_all_rows(lambda: supabase.table(table).select("id").order("id"))
+        return {row["id"] for row in rows}
+
+    async def _fetch_locations(self, supabase, location_ids, chunk_size: int = 500) -> list:
+        location_ids = list(set(location_ids))
+        responses = await asyncio.gather(
+            *(
+                supabase.table("Location")
+                .select("*")
+                .in_("id", location_ids[start:start + chunk_size])
+                .execute()
+                for start in range(0, len(location_ids), chunk_size)
+            )
+        )
+        return [row for response in responses for row in response.data]
+
+    def _swap(self, snapshot: Snapshot):
+        """
+        Replace the snapshot, keeping only the overlay rows written after it
+        was built; older ones are in it already.
+        """
+        built_at = snapshot.meta.get("built_at", 0.0)
+        for key, written_at in list(self._written_at.items()):
+            if written_at < built_at:
+                table, row_id = key
+                del self._written_at[key]
+                row = self._overlay[table].pop(row_id, None)
+                if table == "Menu" and row is not None:
+                    self._overlay_menus.get(row["restaurant"], {}).pop(row_id, None)
+
+        self._snapshot = snapshot
+        self._menus_by_restaurant = None
+        self._watermarks = dict(snapshot.meta.get("watermarks", {}))
+        for table in TABLES:
+            self._advance_watermark(table, self._overlay[table].values())
+        self._coordinates = None
+        self._version += 1
+        self.loaded = True
+
+    def _advance_watermark(self, table, rows):
+        stamps = [stamp for row in rows if row and (stamp := changed_at(row))]
+        if stamps:
+            self._watermarks[table] = max(
+                stamps + [self._watermarks.get(table, stamps[0])]
+            )
+
+    def _apply(self, restaurants, locations, menus):
+        if not (restaurants or locations or menus):
+            return
+        self._version += 1
+        for location in locations:
+            self._put("Location", location)
+        for restaurant in restaurants:
+            self._put("Restaurant", restaurant)
+        for menu in menus:
+            self._put_menu(menu)
+        self._advance_watermark("Restaurant", restaurants)
+        self._advance_watermark("Location", locations)
+        self._advance_watermark("Menu", menus)
+        self._coordinates = None
+
+    def _drop_deleted(self, table, ids: set, started: float):
+        """
+        Remove the rows other writers deleted: the catalog's rows missing from
+        `ids`, read at `started`, except those this service wrote since.
+        """
+        deleted = [
+            row_id
+            for row_id in self._ids(table) - ids
+            if self._written_at.get((table, row_id), 0.0) < started
+        ]
+        for row_id in deleted:
+            if table == "Restaurant":
+                self._remove_restaurant(row_id)
+            else:
+                self._remove_menu(row_id)
+        if deleted:
+            self._version += 1
+
+    def _put(self, table, row):
+        self._overlay[table][row["id"]] = row
+        self._written_at[(table, row["id"])] = time.time()
+
+    def _remove(self, table, row_id):
+        self._overlay[table][row_id] = None
+        self._written_at[(table, row_id)] = time.time()
+
+    def _put_menu(self, menu):
+        self._put("Menu", menu)
+        self._overlay_menus.setdefault(menu["restaurant"], {})[menu["id"]] = None
+
+    """
+    Writes made by this service
+    """
+
+    def put_restaurant(self, restaurant: dict, location: dict):
+        with self._lock:
+            self._put("Location", location)
+            self._put("Restaurant", restaurant)
+            self._coordinates = None
+            self._version += 1
+
+    def remove_restaurant(self, restaurant_id):
+        with self._lock:
+            if self._remove_restaurant(restaurant_id):
+                self._version += 1
+
+    def put_menu(self, menu: dict):
+        with self._lock:
+            self._put_menu(menu)
+            self._version += 1
+
+    def remove_menu(self, menu_id):
+        with self._lock:
+            if self._remove_menu(menu_id):
+                self._version += 1
+
+    def _remove_restaurant(self, restaurant_id) -> bool:
+        restaurant = self._row("Restaurant", restaurant_id)
+        if restaurant is None:
+            return False
+        self._remove("Restaurant", restaurant_id)
+        self._remove("Location", restaurant["location"])
+        for menu in self._menus_of(restaurant_id):
+            self._remove("Menu", menu["id"])
+        self._overlay_menus.pop(restaurant_id, None)
+        self._coordinates = None
+        return True
+
+    def _remove_menu(self, menu_id) -> bool:
+        menu = self._row("Menu", menu_id)
+        if menu is None:
+            return False
+        self._remove("Menu", menu_id)
+        self._overlay_menus.get(menu["restaurant"], {}).pop(menu_id, None)
+        return True
+
+    """
+    Reads
+    """
+
+    def _row(self, table, row_id):
+        """
+        The overlay row or a row decoded from the snapshot, None if missing.
+        """
+        overlay = self._overlay[table]
+        if row_id in overlay:
+            return overlay[row_id]
+        if self._snapshot is None:
+            return None
+        rows = self._snapshot.table(table)
+        position = rows.position(row_id)
+        return rows.row(position) if position is not None else None
+
+    def _rows(self, table):
+        overlay = self._overlay[table]
+        if self._snapshot is not None:
+            rows = self._snapshot.table(table)
+            for position, row_id in enumerate(rows.column("id").tolist()):
+                if row_id not in overlay:
+                    yield rows.row(position)
+        for row in overlay.values():
+            if row is not None:
+                yield row
+
+    def _exists(self, table, row_id) -> bool:
+        overlay = self._overlay[table]
+        if row_id in overlay:
+            return overlay[row_id] is not None
+        return (
+            self._snapshot is not None
+            and self._snapshot.table(table).position(row_id) is not None
+        )
+
+    def _ids(self, table) -> set:
+        overlay = self._overlay[table]
+        ids = set(self._snapshot.table(table).column("id").tolist()) if self._snapshot else set()
+        ids.update(overlay)
+        return {row_id for row_id in ids if overlay.get(row_id, True) is not None}
+
+    def _menus_of(self, restaurant_id):
+        """
+        The restaurant's Menu rows, from the snapshot and the overlay.
+        """
+        menus = []
+        overlay = self._overlay["Menu"]
+        if self._snapshot is not None and isinstance(restaurant_id, int):
+            table = self._snapshot.table("Menu")
+            if self._menus_by_restaurant is None:
+                restaurants = table.column("restaurant")
+                order = np.argsort(restaurants, kind="stable")
+                self._menus_by_restaurant = (restaurants[order], order)
+            restaurants, order = self._menus_by_restaurant
+            start = np.searchsorted(restaurants, restaurant_id, side="left")
+            end = np.searchsorted(restaurants, restaurant_id, side="right")
+            menu_ids = table.column("id")
+            for position in order[start:end].tolist():
+                if int(menu_ids[position]) not in overlay:
+                    menus.append(table.row(position))
+        for menu_id in self._overlay_menus.get(restaurant_id, {}):
+            menu = overlay.get(menu_id)
+            if menu is not None and menu["restaurant"] == restaurant_id:
+                menus.append(menu)
+        return menus
+
+    def restaurant_row(self, restaurant_id):
+        """
+        A copy of the Restaurant row, or None. Path parameters arrive as strings.
+        """
+        with self._lock:
+            restaurant = self._row("Restaurant", _as_id(restaurant_id))
+            return dict(restaurant) if restaurant is not None else None
+
+    def location_row(self, location_id):
+        with self._lock:
+            location = self._row("Location", location_id)
+            return dict(location) if location is not None else None
+
+    def location(self, location_id) -> Location:
+        return Location(**self.location_row(location_id))
+
+    def restaurant(self, restaurant_id) -> Restaurant:
+        restaurant = self.restaurant_row(restaurant_id)
+        if restaurant is None:
+            return None
+        restaurant["location"] = self.location(restaurant["location"])
+        return Restaurant(**restaurant)
+
+    def _located_restaurants(self):
+        return [
+            restaurant
+            for restaurant in self._rows("Restaurant")
+            if self._exists("Location", restaurant["location"])
+        ]
+
+    def restaurant_rows(self):
+        """
+        Copies of the Restaurant rows whose Location is known.
+        """
+        with self._lock:
+            return [dict(restaurant) for restaurant in self._located_restaurants()]
+
+    def restaurants(self):
+        with self._lock:
+            restaurant_ids = [restaurant["id"] for restaurant in self._located_restaurants()]
+        return [self.restaurant(restaurant_id) for restaurant_id in restaurant_ids]
+
+    def menu_row(self, menu_id):
+        with self._lock:
+            menu = self._row("Menu", _as_id(menu_id))
+            return dict(menu) if menu is not None else None
+
+    def menu_rows(self, restaurant_id=None):
+        with self._lock:
+            if restaurant_id is None:
+                restaurant_ids = self._ids("Restaurant")
+                return [
+                    dict(menu)
+                    for menu in self._rows("Menu")
+                    if menu["restaurant"] in restaurant_ids
+                ]
+            restaurant_id = _as_id(restaurant_id)
+            if not self._exists("Restaurant", restaurant_id):
+                return []
+            return [dict(menu) for menu in self._menus_of(restaurant_id)]
+
+    def match_menus(self, restaurant_ids, price_min, price_max, restricted, preferred):
+        """
+        Ids of the menus of `restaurant_ids` priced within range whose main
+        ingredients include none of the `restricted` names and at least one
+        `preferred` name, by restaurant. Snapshot menus are filtered on their
+        columns and ingredient sets without being decoded.
+        """
+        matches = {}
+        with self._lock:
+            overlay = self._overlay["Menu"]
+            if self._snapshot is not None and len(self._snapshot.table("Menu")):
+                menus = self._snapshot.table("Menu")
+                prices = menus.column("price")
+                restaurants = menus.column("restaurant")
+                menu_ids = menus.column("id")
+                keep = (
+                    (prices >= price_min)
+                    & (prices <= price_max)
+                    & np.isin(restaurants, list(restaurant_ids))
+                    & ~np.isin(menu_ids, list(overlay))
+                    & ~menus.rows_with_any(
+                        "main_ingredients", self._snapshot.string_ids(restricted)
+                    )
+                    & menus.rows_with_any(
+                        "main_ingredients", self._snapshot.string_ids(preferred)
+                    )
+                )
+                for position in np.flatnonzero(keep).tolist():
+                    matches.setdefault(int(restaurants[position]), []).append(
+                        int(menu_ids[position])
+                    )
+
+            for menu in overlay.values():
+                if (
+                    menu is None
+                    or menu["restaurant"] not in restaurant_ids
+                    or not price_min <= menu["price"] <= price_max
+                ):
+                    continue
+                main_ingredients = set(
+                    normalize_ingredient(ingredient["name"])
+                    for ingredient in menu["main_ingredients"] or []
+                )
+                if main_ingredients.isdisjoint(restricted) and not main_ingredients.isdisjoint(
+                    preferred
+                ):
+                    matches.setdefault(menu["restaurant"], []).append(menu["id"])
+        return matches
+
+    def coordinates(self):
+        """
+        Restaurant ids with their latitude, longitude and inside_kaist as
+        arrays, rebuilt only after the set of restaurants changes.
+        """
+        with self._lock:
+            if self._coordinates is None:
+                restaurants = [
+                    (restaurant["id"], self._row("Location", restaurant["location"]))
+                    for restaurant in self._located_restaurants()
+                ]
+                self._coordinates = (
+                    np.array([restaurant_id for restaurant_id, _ in restaurants], dtype=np.int64),
+                    np.array([row["latitude"] for _, row in restaurants], dtype=np.float64),
+                    np.array([row["longitude"] for _, row in restaurants], dtype=np.float64),
+                    np.array([bool(row["inside_kaist"]) for _, row in restaurants], dtype=bool),
+                )
+            return self._coordinates
+
+    def spatial_index(self) -> RestaurantGrid:
+        """
+        Grid over the `coordinates()` arrays, rebuilt together with them.
+        """
+        with self._lock:
+            coordinates = self.coordinates()
+            if self._grid is None or self._grid.coordinates is not coordinates:
+                self._grid = RestaurantGrid(coordinates)
+            return self._grid
+
+    def ingredient_index(self) -> IngredientIndex:
+        """
+        Similarity index over every main ingredient name in the catalog,
+        rebuilt only after the set of names changes. The snapshot's names
+        are read from its precomputed ingredient sets.
+        """
+        with self._lock:
+            if self._ingredients is not None and self._ingredients[0] == self._version:
+                return self._ingredients[2]
+            version = self._version
+            names = set()
+            if self._snapshot is not None:
+                menus = self._snapshot.table("Menu")
+                names.update(
+                    self._snapshot.string(int(string_id))
+                    for string_id in np.unique(menus.set_values("main_ingredients"))
+                )
+            names.update(
+                normalize_ingredient(ingredient["name"])
+                for menu in self._overlay["Menu"].values()
+                if menu is not None
+                for ingredient in menu["main_ingredients"] or []
+            )
+            names = frozenset(names)
+            if self._ingredients is not None and self._ingredients[1] == names:
+                self._ingredients = (version, names, self._ingredients[2])
+                return self._ingredients[2]
+
+        index = IngredientIndex(names)
+        with self._lock:
+            if version == self._version:
+                self._ingredients = (version, names, index)
+        return index
+
+
+def _as_id(value):
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    return value
+
+
+async def run_refresh(
+    catalog: Catalog,
+    supabase: AsyncClient,
+    interval: float,
+    reload_interval: float,
+    stop: asyncio.Event,
+):
+    """
+    Load the catalog, then poll for new rows every `interval` seconds and
+    reload it in full every `reload_interval` seconds, until `stop` is set.
+    The ingredient index is rebuilt after each pass that changed it.
+    """
+    while True:
+        try:
+            async with catalog._refresh_lock:
+                if (
+                    not catalog.loaded
+                    or time.monotonic() - catalog.reloaded_at >= reload_interval
+                ):
+                    await catalog.load(supabase)
+                else:
+                    await catalog.refresh(supabase)
+            # Rebuild the ingredient index here rather than on a request
+            await asyncio.to_thread(catalog.ingredient_index)
+        except Exception:
+            logger.exception("Catalog refresh failed")
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+            return
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+from data_access import deadline
+
+"""
+Deferred cleanup
+"""
+
+logger = logging.getLogger(__name__)
+
+
+class CleanupQueue:
+    """
+    Background queue for the work a delete leaves behind once its primary row
+    is gone: dependent rows and storage objects. Each job is retried with
+    exponential backoff up to `max_attempts` times before it is given up on.
+    """
+
+    def __init__(self, max_attempts: int = 5, backoff: float = 0.5):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.completed = 0
+        self.retried = 0
+        self.failed = 0
+        self._queue = None
+        self._worker = None
+        self._retries = set()
+
+    def enqueue(self, name: str, job: Callable[[], Awaitable]):
+        """
+        Schedule `job()` on the running event loop, starting the worker if
+        needed. `job` is called again on every retry.
+        """
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            # The worker outlives the request that starts it, and so its deadline
+            with deadline(None):
+                self._worker = asyncio.create_task(self._run())
+        self._queue.put_nowait((name, job, 1))
+
+    async def drain(self):
+        """
+        Wait until every queued job, including the ones waiting to be
+        retried, has succeeded or been given up on.
+        """
+        if self._queue is None:
+            return
+        while True:
+            await self._queue.join()
+            if not self._retries:
+                return
+            await asyncio.gather(*list(self._retries))
+
+    async def stop(self):
+        """
+        Finish the queued jobs, then stop the worker.
+        """
+        if self._worker is None:
+            return
+        await self.drain()
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+    async def _run(self):
+        while True:
+            name, job, attempt = await self._queue.get()
+            try:
+                await job()
+                self.completed += 1
+            except Exception as e:
+                if attempt < self.max_attempts:
+                    self.retried += 1
+                    retry = asyncio.create_task(self._retry(name, job, attempt))
+                    self._retries.add(retry)
+                    retry.add_done_callback(self._retries.discard)
+                else:
+                    self.failed += 1
+                    logger.error(
+                        "Cleanup %s failed after %d attempts: %s", name, attempt, e, exc_info=e
+                    )
+            finally:
+                self._queue.task_done()
+
+    async def _retry(self, name, job, attempt):
+        await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+        self._queue.put_nowait((name, job, attempt + 1))
+
+    def metrics(self) -> dict:
+        return {
+            "pending": (self._queue.qsize() if self._queue is not None else 0)
+            + len(self._retries),
+            "completed": self.completed,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
@@ -0,0 +1,113 @@
+import asyncio
+import io
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+from PIL import Image, ImageOps
+
+"""
+Image variants
+"""
+
+# Longest side of each resized variant, smallest first
+VARIANT_SIZES = {"thumbnail": 160, "small": 480, "medium": 1024}
+VARIANT_FORMATS = {"webp": ("WEBP", "image/webp"), "jpg": ("JPEG", "image/jpeg")}
+
+_ORIGINAL = re.compile(r"^(?P<key>.+)-original\.(?P<extension>[0-9a-z+]+)$")
+
+
+def original_name(key: str, extension: str) -> str:
+    return f"{key}-original.{extension}"
+
+
+def variant_name(key: str, variant: str, extension: str) -> str:
+    return f"{key}-{variant}.{extension}"
+
+
+def variant_names(original: str) -> List[str]:
+    """
+    File names of the variants stored next to an original, or none for
+    images uploaded before variants existed.
+    """
+    match = _ORIGINAL.match(original)
+    if match is None:
+        return []
+    return [
+        variant_name(match["key"], variant, extension)
+        for variant in VARIANT_SIZES
+        for extension in VARIANT_FORMATS
+    ]
+
+
+def variant_urls(image_url: Optional[str]) -> Optional[List[dict]]:
+    """
+    `{name, format, max_size, url}` of every variant of a stored image,
+    derived from the public url of its original.
+    """
+    if image_url is None:
+        return None
+    base, _, original = image_url.rpartition("/")
+    original, query_mark, query = original.partition("?")
+    match = _ORIGINAL.match(original)
+    if match is None:
+        return None
+    return [
+        {
+            "name": variant,
+            "format": extension,
+            "max_size": size,
+            "url": f"{base}/{variant_name(match['key'], variant, extension)}{query_mark}{query}",
+        }
+        for variant, size in VARIANT_SIZES.items()
+        for extension in VARIANT_FORMATS
+    ]
+
+
+def render_variants(data: bytes) -> List[tuple]:
+    """
+    Decode an image once and encode every variant as `(variant, extension,
+    mime_type, bytes)`. Images are never upscaled. Runs in the process pool.
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    rendered = []
+    for variant, size in VARIANT_SIZES.items():
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.Resampling.LANCZOS)
+        for extension, (image_format, mime_type) in VARIANT_FORMATS.items():
+            output = io.BytesIO()
+            if image_format == "JPEG":
+                resized.convert("RGB").save(
+                    output, image_format, quality=82, optimize=True, progressive=True
+                )
+            else:
+                if resized.mode not in ("RGB", "RGBA"):
+                    resized = resized.convert("RGBA")
+                resized.save(output, image_format, quality=80, method=4)
+            rendered.append((variant, extension, mime_type, output.getvalue()))
+    return rendered
+
+
+class ImagePipeline:
+    """
+    Renders image variants on a process pool, so decoding and resizing never
+    block the event loop. The pool is started on first use.
+    """
+
+    def __init__(self, max_workers: int = None):
+        self.max_workers = max_workers
+        self._executor = None
+
+    async def render(self, data: bytes) -> List[tuple]:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, render_variants, data)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
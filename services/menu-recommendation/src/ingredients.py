@@ -0,0 +1,122 @@
+import math
+import threading
+from collections import Counter, defaultdict
+from typing import FrozenSet, Iterable
+
+"""
+Ingredient similarity index
+"""
+
+NGRAM_SIZE = 3
+
+
+def normalize_ingredient(name: str) -> str:
+    return " ".join(name.lower().split())
+
+
+def char_ngrams(text: str) -> Counter:
+    padded = f" {text} "
+    return Counter(
+        padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1)
+    )
+
+
+def word_spans(name: str):
+    """
+    Every contiguous run of words in `name`, so "pork" can match the start
+    of "pork belly kimchi" as closely as it matches "pork".
+    """
+    words = name.split()
+    for start in range(len(words)):
+        for end in range(start + 1, len(words) + 1):
+            yield " ".join(words[start:end])
+
+
+class IngredientIndex:
+    """
+    Character n-gram TF-IDF vectors of every word span of a fixed set of
+    ingredient names, with an inverted index from n-gram to span. Built once
+    per catalog change; queries for the same term are memoized.
+    """
+
+    def __init__(self, names: Iterable[str]):
+        self.names = sorted({normalize_ingredient(name) for name in names})
+        spans = [
+            (name_index, span)
+            for name_index, name in enumerate(self.names)
+            for span in set(word_spans(name))
+        ]
+        span_ngrams = [char_ngrams(span) for _, span in spans]
+
+        document_frequency = Counter(
+            ngram for ngrams in span_ngrams for ngram in ngrams
+        )
+        self._documents = len(spans)
+        self._idf = {
+            ngram: self._inverse_frequency(frequency)
+            for ngram, frequency in document_frequency.items()
+        }
+
+        self._span_names = [name_index for name_index, _ in spans]
+        self._postings = defaultdict(list)
+        for span_index, ngrams in enumerate(span_ngrams):
+            for ngram, weight in self._vector(ngrams).items():
+                self._postings[ngram].append((span_index, weight))
+
+        self._matches = {}
+        self._lock = threading.Lock()
+
+    def _inverse_frequency(self, frequency: int) -> float:
+        return math.log((1 + self._documents) / (1 + frequency)) + 1
+
+    def _vector(self, ngrams: Counter) -> dict:
+        vector = {
+            ngram: count * self._idf.get(ngram, self._inverse_frequency(0))
+            for ngram, count in ngrams.items()
+        }
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        return {ngram: weight / norm for ngram, weight in vector.items()}
+
+    def similarities(self, term: str) -> dict:
+        """
+        Cosine similarity of `term` to each indexed name that shares an
+        n-gram with it, taking the best matching word span of the name.
+        """
+        term = normalize_ingredient(term)
+        if not term:
+            return {}
+        scores = defaultdict(float)
+        for ngram, weight in self._vector(char_ngrams(term)).items():
+            for span_index, span_weight in self._postings.get(ngram, ()):
+                scores[span_index] += weight * span_weight
+
+        best = {}
+        for span_index, score in scores.items():
+            name = self.names[self._span_names[span_index]]
+            best[name] = max(best.get(name, 0.0), score)
+        return best
+
+    def matching(self, term: str, threshold: float) -> FrozenSet[str]:
+        """
+        Indexed names at least `threshold` similar to `term`, plus the term
+        itself so names added after the build still match exactly.
+        """
+        key = (normalize_ingredient(term), threshold)
+        with self._lock:
+            if key in self._matches:
+                return self._matches[key]
+
+        matches = frozenset(
+            [key[0]]
+            + [
+                name
+                for name, score in self.similarities(term).items()
+                if score >= threshold
+            ]
+        )
+        with self._lock:
+            self._matches[key] = matches
+        return matches
+
+    def expand(self, terms: Iterable[str], threshold: float) -> FrozenSet[str]:
+        return frozenset().union(*(self.matching(term, threshold) for term in terms))
@@ -1,17 +1,45 @@
 import os
+import json
 
-import base64
+import asyncio
+import secrets
 import uuid
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
-from supabase import create_client, Client
-from fastapi import FastAPI, HTTPException, Query, Header
+from data_access import (
+    AsyncResilientTransport,
+    Policy,
+    SnapshotFile,
+    acreate_client,
+    deadline,
+    error_message,
+    install_deadline,
+    install_error_handlers,
+)
+from supabase import AsyncClient
+from fastapi import FastAPI, HTTPException, Query, Header, Depends, Request, UploadFile
 
 from typing import (
     Annotated,
+    List,
+    Literal,
+    Optional,
+    Union,
 )
 
-from utils import calculate_distance
+from utils import calculate_distance, decode_image, image_extension
+from images import ImagePipeline, original_name, variant_name, variant_names
+from planner import plan_group_matches, plan_matches
+from ranking import composite_score, group_distances, group_score, top_k
+from ratings import RatingAggregates
+from catalog import Catalog, run_refresh
+from cleanup import CleanupQueue
+from users import UserContext, UserContextCache
+from menu_sync import DesiredMenu, image_digest_from_url, plan_menu_sync
+from response_cache import ResponseCache
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursor, paginate
+from tracing import TracedClient, Tracer, exporter_for, server_timing, unbudgeted
 
 from models import (
     Location,
@@ -19,26 +47,412 @@ from models import (
     Menu,
     Rating,
     MenuFilter,
+    MatchRanking,
+    GroupMatchRanking,
+    GroupMatchRequest,
     CreateRestaurantRequest,
     CreateMenuRequest,
+    BulkCreateMenuRequest,
+    SyncMenusRequest,
     CreateRatingRequest,
     MenuResponse,
+    MenuPage,
+    MenuList,
+    RestaurantPage,
+    RestaurantList,
     RestaurantMenuResponse,
+    GroupRestaurantMenuResponse,
+    BulkMenuResult,
+    BulkCreateMenuResponse,
+    MenuSyncResponse,
 )
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global supabase
+    supabase = TracedClient(
+        await acreate_client(SUPABASE_URL, SUPABASE_KEY, supabase_transport)
+    )
+
+    # Load the catalog snapshot, then keep it fresh in the background
+    stop = asyncio.Event()
+    refresh = asyncio.create_task(
+        run_refresh(
+            catalog,
+            supabase,
+            CATALOG_REFRESH_SECONDS,
+            CATALOG_RELOAD_SECONDS,
+            stop,
+        )
+    )
+    yield
+    stop.set()
+    await cleanup_queue.stop()
+    image_pipeline.shutdown()
+    await tracer.close()
+    await refresh
+    await supabase_transport.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
+install_error_handlers(app)
 
 load_dotenv()
 
 SUPABASE_URL = os.getenv("SUPABASE_URL", "")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY", "")
+CATALOG_REFRESH_SECONDS = float(os.getenv("CATALOG_REFRESH_SECONDS", "30"))
+CATALOG_RELOAD_SECONDS = float(os.getenv("CATALOG_RELOAD_SECONDS", "600"))
+CATALOG_MAX_STALENESS_SECONDS = float(
+    os.getenv("CATALOG_MAX_STALENESS_SECONDS", "60")
+)
+# Snapshot file written by the catalog builder and mapped by every worker
+CATALOG_SNAPSHOT = os.getenv("CATALOG_SNAPSHOT", "")
+USER_CONTEXT_TTL_SECONDS = float(os.getenv("USER_CONTEXT_TTL_SECONDS", "30"))
+BULK_UPLOAD_CONCURRENCY = int(os.getenv("BULK_UPLOAD_CONCURRENCY", "8"))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", str(10 * 1024 * 1024)))
+# Minimum n-gram similarity for an ingredient to count as a preference or restriction
+PREFERENCE_SIMILARITY = float(os.getenv("PREFERENCE_SIMILARITY", "0.5"))
+RESTRICTION_SIMILARITY = float(os.getenv("RESTRICTION_SIMILARITY", "0.45"))
+# A JSONL file path or a collector url to export request traces to
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "")
+# Sent as X-Admin-Token to the admin routes, which are disabled while it is empty
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+# "log" or "raise" when a request goes over its route's query budget
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "log")
+# Seconds the Supabase calls of one request may take in all; empty for no deadline
+REQUEST_DEADLINE_SECONDS = os.getenv("REQUEST_DEADLINE_SECONDS", "30")
+REQUEST_DEADLINE_SECONDS = (
+    float(REQUEST_DEADLINE_SECONDS) if REQUEST_DEADLINE_SECONDS else None
+)
+# Most Supabase calls one request to each route may make, not counting catalog refreshes
+QUERY_BUDGETS = {
+    "GET /restaurant": 0,
+    "GET /menu": 0,
+    "GET /restaurant/matches": 3,
+    "POST /restaurant/matches/group": 2,
+    "GET /restaurant/{restaurant_id}": 2,
+    "GET /restaurant/{restaurant_id}/menu": 5,
+    "GET /menu/{menu_id}": 3,
+    "GET /menu/{menu_id}/rating": 3,
+    **json.loads(os.getenv("QUERY_BUDGETS", "{}")),
+}
+
+install_deadline(app, REQUEST_DEADLINE_SECONDS)
+
+# Timeouts, retries, hedging and circuit breaking of every Supabase call
+supabase_transport = AsyncResilientTransport(Policy.from_env())
+# Created in `lifespan`, the async client needs a running event loop
+supabase: AsyncClient = None
+
+
+rating_aggregates = RatingAggregates()
+catalog = Catalog(
+    rating_aggregates, SnapshotFile(CATALOG_SNAPSHOT) if CATALOG_SNAPSHOT else None
+)
+
+
+async def require_admin(x_admin_token: Annotated[Optional[str], Header()] = None):
+    if not ADMIN_TOKEN or not secrets.compare_digest(x_admin_token or "", ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+async def get_catalog() -> Catalog:
+    # A refresh is shared by every request, so it is neither charged to this one
+    # nor cut short by its deadline
+    with unbudgeted(), deadline(None):
+        return await catalog.ensure_fresh(supabase, CATALOG_MAX_STALENESS_SECONDS)
+
+
+user_contexts = UserContextCache(USER_CONTEXT_TTL_SECONDS)
+cleanup_queue = CleanupQueue()
+image_pipeline = ImagePipeline(IMAGE_WORKERS)
+response_cache = ResponseCache()
+tracer = Tracer(
+    exporter_for(TRACE_EXPORT),
+    QUERY_BUDGETS,
+    enforce=QUERY_BUDGET_MODE == "raise",
+)
+
+
+@app.middleware("http")
+async def trace_request(request: Request, call_next):
+    with tracer.trace(request.method, request.url.path) as trace:
+        response = await call_next(request)
+        response.headers["Server-Timing"] = server_timing(trace)
+        route = request.scope.get("route")
+        tracer.finish(trace, getattr(route, "path", None), response.status_code)
+    return response
+
+
+async def resolve_user_context(user_uuid: str) -> UserContext:
+    # The Profile is keyed by the user's uuid, so fetch it alongside the auth user
+    user, user_profile = await asyncio.gather(
+        supabase.auth.admin.get_user_by_id(user_uuid),
+        supabase.table("Profile").select("*").eq("user", user_uuid).execute(),
+    )
+    user = user.user
+    user_profile = user_profile.data[0]
+    current_location = (
+        await supabase.table("Location")
+        .select("*")
+        .eq("id", user_profile["current_location"])
+        .execute()
+    ).data[0]
+
+    return user_context(user.id, user_profile, current_location)
+
+
+async def resolve_user_contexts(user_uuids: List[str]) -> dict:
+    # One Profile query for the whole group, then one for their locations
+    profiles = (
+        await supabase.table("Profile").select("*").in_("user", user_uuids).execute()
+    ).data
+    profiles = {profile["user"]: profile for profile in profiles}
+    missing = [user_uuid for user_uuid in user_uuids if user_uuid not in profiles]
+    if missing:
+        raise HTTPException(
+            status_code=404, detail=f"User profile not found: {', '.join(missing)}"
+        )
+    locations = (
+        await supabase.table("Location")
+        .select("*")
+        .in_("id", list({profile["current_location"] for profile in profiles.values()}))
+        .execute()
+    ).data
+    locations = {location["id"]: location for location in locations}
+
+    return {
+        user_uuid: user_context(
+            user_uuid, profile, locations[profile["current_location"]]
+        )
+        for user_uuid, profile in profiles.items()
+    }
+
+
+def user_context(
+    user_id: str, user_profile: dict, current_location: dict
+) -> UserContext:
+    return UserContext(
+        user_id=user_id,
+        dietary_preferences=frozenset(
+            preferences["name"].lower()
+            for preferences in user_profile["dietary_preferences"]
+        ),
+        current_location=Location(**current_location),
+        dietary_restrictions=frozenset(
+            restriction["name"].lower()
+            for restriction in user_profile.get("dietary_restrictions") or []
+        ),
+    )
+
+
+async def get_user_context(x_user_uuid: Annotated[str, Header()]) -> UserContext:
+    return await user_contexts.get(x_user_uuid, resolve_user_context)
+
+
+async def get_user_contexts(user_uuids: List[str]) -> dict:
+    return await user_contexts.get_many(user_uuids, resolve_user_contexts)
+
+
+async def get_match_catalog(user_uuid: str, menu_filter: MenuFilter):
+    """
+    The user, the plan of their filter and the catalog to match it against.
+    Until the catalog has loaded, the plan's predicates are evaluated by
+    Supabase and only the rows they select are matched, instead of waiting
+    for the full load.
+    """
+    if catalog.loaded:
+        user, loaded = await asyncio.gather(get_user_context(user_uuid), get_catalog())
+        return user, plan_matches(menu_filter, user.current_location), loaded
+    user = await get_user_context(user_uuid)
+    plan = plan_matches(menu_filter, user.current_location)
+    # Charged like the catalog load it stands in for
+    with unbudgeted():
+        return user, plan, await plan.fetch_catalog(supabase)
+
+
+async def load_restaurant(restaurant_id) -> dict:
+    """
+    Read-through lookup of a Restaurant row: rows inserted by other writers
+    since the last refresh are fetched and added to the catalog.
+    """
+    restaurant = catalog.restaurant_row(restaurant_id)
+    if restaurant is None:
+        restaurant = (
+            await supabase.table("Restaurant")
+            .select("*")
+            .eq("id", restaurant_id)
+            .execute()
+        ).data
+        if not restaurant:
+            return None
+        location = (
+            await supabase.table("Location")
+            .select("*")
+            .eq("id", restaurant[0]["location"])
+            .execute()
+        ).data[0]
+        catalog.put_restaurant(restaurant[0], location)
+        restaurant = catalog.restaurant_row(restaurant_id)
+    return restaurant
+
+
+async def load_menu(menu_id) -> dict:
+    """
+    Read-through lookup of a Menu row.
+    """
+    menu = catalog.menu_row(menu_id)
+    if menu is None:
+        menu = (
+            await supabase.table("Menu").select("*").eq("id", menu_id).execute()
+        ).data
+        if not menu:
+            return None
+        catalog.put_menu(menu[0])
+        menu = catalog.menu_row(menu_id)
+    return menu
+
+
+async def store_image(
+    image: bytes, mime_type: str, folder: str, key: str, upsert: bool = False
+):
+    """
+    Upload an image together with its resized variants, rendered off the
+    event loop, and return the storage path and public url of the original.
+    """
+    extension = image_extension(mime_type)
+    uploads = [(original_name(key, extension), mime_type, image)]
+    if extension != "svg":
+        try:
+            variants = await image_pipeline.render(image)
+        except Exception as e:
+            raise HTTPException(status_code=422, detail=f"Invalid image: {e}")
+        uploads.extend(
+            (variant_name(key, variant, variant_extension), variant_type, data)
+            for variant, variant_extension, variant_type, data in variants
+        )
+
+    async def upload(name, content_type, data):
+        file_options = {"content-type": content_type}
+        if upsert:
+            file_options["upsert"] = "true"
+        return await supabase.storage.from_("media").upload(
+            f"{folder}/{name}", data, file_options
+        )
+
+    image_path, *_ = await asyncio.gather(*(upload(*item) for item in uploads))
+    image_url = await supabase.storage.from_("media").get_public_url(image_path.path)
+    return image_path.path, image_url
+
+
+async def upload_image(image: str, folder: str):
+    """
+    Decode a base64 image complete with its header, upload it to supabase
+    storage and return its storage path and public url.
+    """
+    image, mime_type, _ = decode_image(image)
+    return await store_image(image, mime_type, folder, str(uuid.uuid4()))
+
+
+async def read_upload(image: UploadFile) -> bytes:
+    """
+    Read a multipart image upload in chunks, rejecting it once it grows past
+    MAX_IMAGE_BYTES.
+    """
+    if not (image.content_type or "").startswith("image/"):
+        raise HTTPException(status_code=415, detail="Upload must be an image")
+    chunks, size = [], 0
+    while chunk := await image.read(1 << 20):
+        size += len(chunk)
+        if size > MAX_IMAGE_BYTES:
+            raise HTTPException(status_code=413, detail="Image is too large")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+async def no_image():
+    return None, None
+
+
+def image_paths(folder: str, image_url: str) -> list:
+    """
+    Storage paths of an uploaded image and its variants.
+    """
+    original = image_url.split("/")[-1].split("?")[0]
+    return [f"{folder}/{name}" for name in [original] + variant_names(original)]
+
+
+def remove_restaurant_image(image_url: str):
+    paths = image_paths("restaurant", image_url)
+    cleanup_queue.enqueue(
+        f"remove {paths[0]}", lambda: supabase.storage.from_("media").remove(paths)
+    )
+
+
+def remove_menu_images(image_urls):
+    """
+    Queue the removal of menu images no remaining menu refers to; images
+    synced under their digest can be shared between menus, including ones
+    written by other workers, so the references are read from the database
+    when the job runs.
+    """
+    image_urls = list(set(image_urls) - {None})
+    if not image_urls:
+        return
+
+    async def remove():
+        res = (
+            await supabase.table("Menu")
+            .select("image_url")
+            .in_("image_url", image_urls)
+            .execute()
+        )
+        referenced = {menu["image_url"] for menu in res.data or []}
+        paths = [
+            path
+            for url in image_urls
+            if url not in referenced
+            for path in image_paths("menu", url)
+        ]
+        if paths:
+            await supabase.storage.from_("media").remove(paths)
+
+    cleanup_queue.enqueue(f"remove {len(image_urls)} menu images", remove)
+
+
+async def delete_menus(menus, remove_images: bool = True):
+    """
+    Delete Menu rows in one query. Their ratings and, unless the caller
+    handles them, their images are cleaned up in the background.
+    """
+    menu_ids = [menu["id"] for menu in menus]
+    if not menu_ids:
+        return
+    await supabase.table("Menu").delete().in_("id", menu_ids).execute()
+    for menu_id in menu_ids:
+        rating_aggregates.remove_menu(menu_id)
+        catalog.remove_menu(menu_id)
+
+    cleanup_queue.enqueue(
+        f"delete ratings of {len(menu_ids)} menus",
+        lambda: supabase.table("Rating").delete().in_("menu", menu_ids).execute(),
+    )
+    if remove_images:
+        remove_menu_images(menu["image_url"] for menu in menus)
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+def get_page(rows, sort_value, sort, order, after, limit):
+    try:
+        return paginate(rows, sort_value, sort, order, after, limit)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.get("/")
-def hello_world():
+async def hello_world():
     return {"Hello": "World"}
 
 
@@ -48,211 +462,290 @@ Restaurant API
 
 
 @app.post("/restaurant", status_code=201)
-def create_restaurant(body: CreateRestaurantRequest):
-    # Check if restaurant already exists
-    restaurant_exists = (
-        supabase.table("Restaurant").select("*").eq("name", body.name).execute()
-    ).data
+async def create_restaurant(body: CreateRestaurantRequest):
+    # Check if restaurant already exists while the image uploads
+    restaurant_exists, (_, image_url) = await asyncio.gather(
+        supabase.table("Restaurant").select("*").eq("name", body.name).execute(),
+        (
+            upload_image(body.image, "restaurant")
+            if body.image is not None
+            else no_image()
+        ),
+    )
 
-    if restaurant_exists:
+    if restaurant_exists.data:
+        # The image and its variants
+        if image_url is not None:
+            remove_restaurant_image(image_url)
         raise HTTPException(status_code=409, detail="Restaurant already exists")
 
-    # Decode base64 image and upload to supabase storage
-    if body.image is not None:
-        header, base64_image = body.image.split(",", 1)
-
-        image = base64.b64decode(base64_image)
-        mime_type = header.split(";")[0].split(":")[1]
-        image_type = mime_type.split("/")[1]
-        if image_type == "jpeg":
-            image_type = "jpg"
-        elif image_type == "svg+xml":
-            image_type = "svg"
-
-        image_path = supabase.storage.from_("media").upload(
-            f"restaurant/{uuid.uuid4()}.{image_type}",
-            image,
-            {"content-type": mime_type},
-        )
-        image_url = supabase.storage.from_("media").get_public_url(image_path.path)
-
     # Create location
     new_location = body.location.model_dump()
-    create_location_resp = supabase.table("Location").insert(new_location).execute()
+    create_location_resp = (
+        await supabase.table("Location").insert(new_location).execute()
+    )
     location = create_location_resp.data[0]
 
     # create restaurant
     new_restaurant = body.model_dump()
     new_restaurant["location"] = location["id"]
-    new_restaurant["image_url"] = image_url if body.image is not None else None
+    new_restaurant["image_url"] = image_url
     del new_restaurant["image"]
 
-    restaurant = supabase.table("Restaurant").insert(new_restaurant).execute()
+    restaurant = await supabase.table("Restaurant").insert(new_restaurant).execute()
     restaurant = restaurant.data[0]
+    catalog.put_restaurant(dict(restaurant), location)
     restaurant["location"] = location
 
     return Restaurant(**restaurant)
 
 
 @app.delete("/restaurant/{restaurant_id}", status_code=204)
-def delete_restaurant(restaurant_id: str):
+async def delete_restaurant(restaurant_id: str):
     # Check if restaurant exists
     restaurant = (
-        supabase.table("Restaurant").select("*").eq("id", restaurant_id).execute()
+        await supabase.table("Restaurant")
+        .select("*")
+        .eq("id", restaurant_id)
+        .execute()
     ).data
     if not restaurant:
         raise HTTPException(status_code=404, detail="Restaurant not found")
 
     # Delete restaurant
-    supabase.table("Restaurant").delete().eq("id", restaurant_id).execute()
+    await supabase.table("Restaurant").delete().eq("id", restaurant_id).execute()
+    catalog.remove_restaurant(restaurant[0]["id"])
 
-    # Delete location
+    # Delete location and image from storage in the background
     location_id = restaurant[0]["location"]
-    supabase.table("Location").delete().eq("id", location_id).execute()
-
-    # Delete image from storage
+    cleanup_queue.enqueue(
+        f"delete Location {location_id}",
+        lambda: supabase.table("Location").delete().eq("id", location_id).execute(),
+    )
     if restaurant[0]["image_url"] is not None:
-        image_path = f"restaurant/{restaurant[0]['image_url'].split('/')[-1][:-1]}"
-        supabase.storage.from_("media").remove([image_path])
+        remove_restaurant_image(restaurant[0]["image_url"])
 
     return 204, None
 
 
-@app.get("/restaurant")
-def list_all_restaurants():
-    response = []
-    for restaurant in supabase.table("Restaurant").select("*").execute().data:
-        location = Location(
-            **(
-                supabase.table("Location")
-                .select("*")
-                .eq("id", restaurant["location"])
-                .execute()
-                .data[0]
-            )
+@app.get("/restaurant", response_model=Union[RestaurantPage, List[Restaurant]])
+async def list_all_restaurants(
+    request: Request,
+    catalog: Annotated[Catalog, Depends(get_catalog)],
+    after: Optional[str] = None,
+    limit: Annotated[Optional[int], Query(ge=1, le=MAX_PAGE_SIZE)] = None,
+    sort: Literal["id", "name", "created_at"] = "id",
+    order: Literal["asc", "desc"] = "asc",
+):
+    paginated = after is not None or limit is not None
+
+    def render() -> bytes:
+        restaurants, next_cursor = get_page(
+            catalog.restaurant_rows(),
+            lambda restaurant: restaurant[sort],
+            sort,
+            order,
+            after,
+            (limit or DEFAULT_PAGE_SIZE) if paginated else None,
         )
-        restaurant["location"] = location
-        response.append(Restaurant(**restaurant))
+        items = [catalog.restaurant(restaurant["id"]) for restaurant in restaurants]
+        if not paginated:
+            return RestaurantList(items).model_dump_json().encode()
+        return RestaurantPage(
+            items=items, next_cursor=next_cursor
+        ).model_dump_json().encode()
 
-    return response
+    return response_cache.get(request, catalog.version, render).respond(request)
 
 
 @app.get("/restaurant/matches")
-def list_matches_restaurant(
+async def list_matches_restaurant(
     x_user_uuid: Annotated[str, Header()],
     menu_filter: Annotated[MenuFilter, Query(...)],
+    ranking: Annotated[MatchRanking, Depends()],
 ):
-    # Get user dietary preferences and current location
-    user = supabase.auth.admin.get_user_by_id(x_user_uuid).user
-    user_profile = (
-        supabase.table("Profile").select("*").eq("user", user.id).execute()
-    ).data[0]
-    user_dietary_preferences = set(
-        [
-            preferences["name"].lower()
-            for preferences in user_profile["dietary_preferences"]
-        ]
+    user, plan, catalog = await get_match_catalog(x_user_uuid, menu_filter)
+    if plan.empty:
+        return []
+
+    # Restaurants passing the location predicates, nearest first
+    nearby_restaurants = plan.nearby_restaurants(catalog)
+
+    # Ingredient names similar to the restrictions and preferences, looked up once
+    ingredient_index = catalog.ingredient_index()
+    restricted = ingredient_index.expand(
+        menu_filter.restrictions, RESTRICTION_SIMILARITY
+    )
+    preferred = ingredient_index.expand(
+        user.dietary_preferences, PREFERENCE_SIMILARITY
     )
 
-    # Get all menu which matches the dietary preferences, restrictions and price
-    menus = (
-        supabase.table("Menu")
-        .select("*")
-        .gte("price", menu_filter.price_min)
-        .lte("price", menu_filter.price_max)
-        .execute()
-    ).data
+    # Menus passing the price and ingredient predicates, by restaurant
+    menu_matches = catalog.match_menus(
+        {restaurant_id for restaurant_id, _ in nearby_restaurants},
+        plan.price_min,
+        plan.price_max,
+        restricted,
+        preferred,
+    )
 
-    filter_restrictions = set(menu_filter.restrictions)
-    matches_restaurant_menus = {}
-    for menu in menus:
-        # TODO: Change string matching between main ingredients and user restrictions and dietary preferences
-        main_ingredients = set(
-            [ingredients["name"].lower() for ingredients in menu["main_ingredients"]]
+    candidates = []
+    for restaurant_id, distance in nearby_restaurants:
+        # If the average rating is outside the requested range, skip
+        matches = [
+            menu_id
+            for menu_id in menu_matches.get(restaurant_id, [])
+            if plan.accepts_rating(catalog.ratings.stats(menu_id))
+        ]
+        if not matches:
+            continue
+
+        rated = [
+            catalog.ratings.average(menu_id)
+            for menu_id in matches
+            if catalog.ratings.stats(menu_id)["count"]
+        ]
+        score = composite_score(
+            ranking,
+            distance,
+            menu_filter.distance_max,
+            sum(rated) / len(rated) if rated else 0.0,
+            len(matches),
         )
-        print(main_ingredients, filter_restrictions, user_dietary_preferences)
+        candidates.append((score, distance, restaurant_id, matches))
 
-        # If the main ingredients contains any of the restrictions, skip
-        if len((main_ingredients - filter_restrictions)) != len(main_ingredients):
-            continue
+    # Only the restaurants that make the cut are turned into responses
+    response = []
+    for score, distance, restaurant_id, matches in top_k(candidates, ranking.limit):
+        menus = []
+        for menu_id in matches:
+            menu = catalog.menu_row(menu_id)
+            menu["average_rating"] = catalog.ratings.average(menu_id)
+            del menu["restaurant"]
+            menus.append(MenuResponse(**menu))
 
-        # If the main ingredients does not contain at least one of the dietary preferences, skip
-        if len((main_ingredients - user_dietary_preferences)) == len(main_ingredients):
-            continue
+        response.append(
+            RestaurantMenuResponse(
+                restaurant=catalog.restaurant(restaurant_id),
+                menus=menus,
+                distance=distance,
+                food_matches=len(menus),
+                score=score,
+            )
+        )
 
-        if menu["restaurant"] not in matches_restaurant_menus:
-            matches_restaurant_menus[menu["restaurant"]] = [menu]
-        else:
-            matches_restaurant_menus[menu["restaurant"]].append(menu)
+    return response
 
-    restaurants = (
-        supabase.table("Restaurant")
-        .select("*")
-        .in_("id", list(matches_restaurant_menus.keys()))
-        .execute()
-    ).data
 
-    user_current_location = Location(
-        **(
-            supabase.table("Location")
-            .select("*")
-            .eq("id", user_profile["current_location"])
-            .execute()
-        ).data[0]
+@app.post("/restaurant/matches/group")
+async def list_group_matches_restaurant(
+    request: GroupMatchRequest,
+    menu_filter: Annotated[MenuFilter, Query(...)],
+    ranking: Annotated[GroupMatchRanking, Depends()],
+):
+    user_uuids = list(dict.fromkeys(request.users))
+    users, catalog = await asyncio.gather(
+        get_user_contexts(user_uuids), get_catalog()
     )
+    members = [users[user_uuid] for user_uuid in user_uuids]
+    plan = plan_group_matches(menu_filter, [user.current_location for user in members])
+    if plan.empty:
+        return []
+
+    # Restaurants every member is within range of, and each member's distance to them
+    restaurant_ids, distances = plan.nearby_restaurants(catalog)
+    columns = {
+        restaurant_id: column
+        for column, restaurant_id in enumerate(restaurant_ids.tolist())
+    }
+    distance_of = group_distances(ranking, distances)
 
-    response = []
-    # Filter restaurants based on location and inside/outside KAIST
-    for restaurant in restaurants:
-        restaurant_location = Location(
-            **(
-                supabase.table("Location")
-                .select("*")
-                .eq("id", restaurant["location"])
-                .execute()
-            ).data[0]
+    # Everyone's restrictions apply; a menu matching anyone's preferences is kept
+    ingredient_index = catalog.ingredient_index()
+    restrictions = set(menu_filter.restrictions).union(
+        *(user.dietary_restrictions for user in members)
+    )
+    restricted = ingredient_index.expand(restrictions, RESTRICTION_SIMILARITY)
+    preferred = [
+        ingredient_index.expand(user.dietary_preferences, PREFERENCE_SIMILARITY)
+        for user in members
+    ]
+    menu_matches = catalog.match_menus(
+        set(columns),
+        plan.plan.price_min,
+        plan.plan.price_max,
+        restricted,
+        frozenset().union(*preferred),
+    )
+    # Which of those menus match each member's own preferences
+    member_matches = [
+        catalog.match_menus(
+            set(menu_matches),
+            plan.plan.price_min,
+            plan.plan.price_max,
+            restricted,
+            member_preferred,
         )
-
-        if (
-            restaurant_location.inside_kaist != menu_filter.inside_kaist
-            and not restaurant_location.inside_kaist != menu_filter.outside_kaist
-        ):
-            del matches_restaurant_menus[restaurant["id"]]
-            continue
-
-        # calculate distance from user current location to restaurant location
-        distance = calculate_distance(user_current_location, restaurant_location)
-        if distance > menu_filter.distance_max or distance < menu_filter.distance_min:
-            del matches_restaurant_menus[restaurant["id"]]
+        for member_preferred in preferred
+    ]
+
+    candidates = []
+    for restaurant_id, menu_ids in menu_matches.items():
+        matches = [
+            menu_id
+            for menu_id in menu_ids
+            if plan.plan.accepts_rating(catalog.ratings.stats(menu_id))
+        ]
+        if not matches:
             continue
 
-        # Get the average rating for the menu
-        average_rating = (
-            supabase.table("Rating")
-            .select("rating_value")
-            .eq("menu", menu["id"])
-            .execute()
-        ).data
-        average_rating_value = (
-            sum(rating["rating_value"] for rating in average_rating)
-            / len(average_rating)
-            if average_rating
-            else 0
+        rated = [
+            catalog.ratings.average(menu_id)
+            for menu_id in matches
+            if catalog.ratings.stats(menu_id)["count"]
+        ]
+        covered = sum(
+            not set(matches).isdisjoint(member.get(restaurant_id, ()))
+            for member in member_matches
         )
+        coverage = covered / len(members)
+        column = columns[restaurant_id]
+        distance = float(distance_of[column])
+        score = group_score(
+            ranking,
+            distance,
+            len(members),
+            menu_filter.distance_max,
+            sum(rated) / len(rated) if rated else 0.0,
+            len(matches),
+            coverage,
+        )
+        candidates.append((score, distance, restaurant_id, matches, column, coverage))
 
-        menu["average_rating"] = average_rating_value
-        del menu["restaurant"]
-        restaurant["location"] = restaurant_location
+    # Only the restaurants that make the cut are turned into responses
+    response = []
+    for score, distance, restaurant_id, matches, column, coverage in top_k(
+        candidates, ranking.limit
+    ):
+        menus = []
+        for menu_id in matches:
+            menu = catalog.menu_row(menu_id)
+            menu["average_rating"] = catalog.ratings.average(menu_id)
+            del menu["restaurant"]
+            menus.append(MenuResponse(**menu))
 
         response.append(
-            RestaurantMenuResponse(
-                restaurant=Restaurant(**restaurant),
-                menus=[
-                    MenuResponse(**menu)
-                    for menu in matches_restaurant_menus[restaurant["id"]]
-                ],
+            GroupRestaurantMenuResponse(
+                restaurant=catalog.restaurant(restaurant_id),
+                menus=menus,
                 distance=distance,
-                food_matches=len(matches_restaurant_menus[restaurant["id"]]),
+                distances={
+                    user.user_id: float(distances[row, column])
+                    for row, user in enumerate(members)
+                },
+                coverage=coverage,
+                food_matches=len(menus),
+                score=score,
             )
         )
 
@@ -260,25 +753,42 @@ def list_matches_restaurant(
 
 
 @app.get("/restaurant/{restaurant_id}")
-def get_restaurant(restaurant_id: str):
-    restaurant = (
-        supabase.table("Restaurant").select("*").eq("id", restaurant_id).execute()
-    ).data
-    if not restaurant:
+async def get_restaurant(
+    restaurant_id: str, catalog: Annotated[Catalog, Depends(get_catalog)]
+):
+    restaurant = await load_restaurant(restaurant_id)
+    if restaurant is None:
         raise HTTPException(status_code=404, detail="Restaurant not found")
 
-    restaurant = restaurant[0]
-    location = Location(
-        **(
-            supabase.table("Location")
-            .select("*")
-            .eq("id", restaurant["location"])
-            .execute()
-            .data[0]
-        )
+    return catalog.restaurant(restaurant["id"])
+
+
+@app.put("/restaurant/{restaurant_id}/image")
+async def upload_restaurant_image(restaurant_id: str, image: UploadFile):
+    data, restaurant = await asyncio.gather(
+        read_upload(image),
+        supabase.table("Restaurant").select("*").eq("id", restaurant_id).execute(),
     )
-    restaurant["location"] = location
-    return Restaurant(**restaurant)
+    if not restaurant.data:
+        raise HTTPException(status_code=404, detail="Restaurant not found")
+    previous_url = restaurant.data[0]["image_url"]
+
+    _, image_url = await store_image(
+        data, image.content_type, "restaurant", str(uuid.uuid4())
+    )
+    restaurant = (
+        await supabase.table("Restaurant")
+        .update({"image_url": image_url})
+        .eq("id", restaurant_id)
+        .execute()
+    ).data[0]
+    await load_restaurant(restaurant["id"])
+    catalog.put_restaurant(restaurant, catalog.location_row(restaurant["location"]))
+
+    if previous_url is not None:
+        remove_restaurant_image(previous_url)
+
+    return catalog.restaurant(restaurant["id"])
 
 
 """
@@ -287,240 +797,354 @@ Menu API
 
 
 @app.post("/restaurant/{restaurant_id}/menu", status_code=201)
-def create_menu(restaurant_id: str, body: CreateMenuRequest):
-    restaurant = (
-        supabase.table("Restaurant").select("*").eq("id", restaurant_id).execute()
+async def create_menu(restaurant_id: str, body: CreateMenuRequest):
+    # Look up the restaurant while the image uploads
+    restaurant, (_, image_url) = await asyncio.gather(
+        load_restaurant(restaurant_id),
+        upload_image(body.image, "menu") if body.image is not None else no_image(),
     )
-    if not restaurant.data:
+    if restaurant is None:
+        remove_menu_images([image_url])
         raise HTTPException(status_code=404, detail="Restaurant not found")
 
-    restaurant = restaurant.data[0]
-    restaurant_location = (
-        supabase.table("Location")
-        .select("*")
-        .eq("id", restaurant["location"])
-        .execute()
-    ).data[0]
-    restaurant["location"] = Location(**restaurant_location)
-
-    # Decode base64 image and upload to supabase storage
-    if body.image is not None:
-        header, base64_image = body.image.split(",", 1)
-
-        image = base64.b64decode(base64_image)
-        mime_type = header.split(";")[0].split(":")[1]
-        image_type = mime_type.split("/")[1]
-        if image_type == "jpeg":
-            image_type = "jpg"
-        elif image_type == "svg+xml":
-            image_type = "svg"
-
-        image_path = supabase.storage.from_("media").upload(
-            f"menu/{uuid.uuid4()}.{image_type}",
-            image,
-            {"content-type": mime_type},
-        )
-        image_url = supabase.storage.from_("media").get_public_url(image_path.path)
-
     new_menu = body.model_dump()
     new_menu["restaurant"] = restaurant["id"]
-    new_menu["image_url"] = image_url if body.image is not None else None
+    new_menu["image_url"] = image_url
     del new_menu["image"]
 
-    menu = supabase.table("Menu").insert(new_menu).execute()
+    menu = await supabase.table("Menu").insert(new_menu).execute()
     menu = menu.data[0]
-    menu["restaurant"] = restaurant
+    catalog.put_menu(dict(menu))
+    menu["restaurant"] = catalog.restaurant(restaurant["id"])
 
     return Menu(**menu)
 
 
-@app.get("/restaurant/{restaurant_id}/menu")
-def list_restaurant_menus(x_user_uuid: Annotated[str, Header()], restaurant_id: str):
-    restaurant = (
-        supabase.table("Restaurant").select("*").eq("id", restaurant_id).execute()
+@app.post("/restaurant/{restaurant_id}/menus/bulk")
+async def create_menus_bulk(restaurant_id: str, body: BulkCreateMenuRequest):
+    restaurant = await load_restaurant(restaurant_id)
+    if restaurant is None:
+        raise HTTPException(status_code=404, detail="Restaurant not found")
+
+    # Upload the images concurrently, a few at a time
+    semaphore = asyncio.Semaphore(BULK_UPLOAD_CONCURRENCY)
+
+    async def upload(menu: CreateMenuRequest):
+        if menu.image is None:
+            return None, None
+        async with semaphore:
+            return await upload_image(menu.image, "menu")
+
+    uploads = await asyncio.gather(
+        *(upload(menu) for menu in body.menus), return_exceptions=True
     )
-    if not restaurant.data:
+
+    results = [None] * len(body.menus)
+    pending = []
+    for index, (menu, uploaded) in enumerate(zip(body.menus, uploads)):
+        if isinstance(uploaded, Exception):
+            results[index] = BulkMenuResult(
+                index=index, created=False, error=f"Image upload failed: {uploaded}"
+            )
+            continue
+        new_menu = menu.model_dump()
+        new_menu["restaurant"] = restaurant["id"]
+        new_menu["image_url"] = uploaded[1]
+        del new_menu["image"]
+        pending.append((index, new_menu))
+
+    # Insert every menu whose image made it in one batch
+    if pending:
+        try:
+            menus = (
+                await supabase.table("Menu")
+                .insert([new_menu for _, new_menu in pending])
+                .execute()
+            ).data
+        except Exception as e:
+            # The uploaded images and their variants
+            remove_menu_images(new_menu["image_url"] for _, new_menu in pending)
+            detail = error_message(e)
+            for index, _ in pending:
+                results[index] = BulkMenuResult(
+                    index=index, created=False, error=f"Supabase error: {detail}"
+                )
+        else:
+            restaurant_model = catalog.restaurant(restaurant["id"])
+            for (index, _), menu in zip(pending, menus):
+                catalog.put_menu(dict(menu))
+                menu["restaurant"] = restaurant_model
+                results[index] = BulkMenuResult(
+                    index=index, created=True, menu=Menu(**menu)
+                )
+
+    created = sum(result.created for result in results)
+    return BulkCreateMenuResponse(
+        created=created, failed=len(results) - created, results=results
+    )
+
+
+@app.put("/restaurant/{restaurant_id}/menus/sync")
+async def sync_menus(restaurant_id: str, body: SyncMenusRequest):
+    names = [menu.name for menu in body.menus]
+    if len(set(names)) != len(names):
+        raise HTTPException(status_code=422, detail="Menu names must be unique")
+    try:
+        desired_menus = [DesiredMenu.from_request(menu) for menu in body.menus]
+    except (ValueError, IndexError) as e:
+        raise HTTPException(status_code=422, detail=f"Invalid image: {e}")
+
+    restaurant, stored_menus = await asyncio.gather(
+        load_restaurant(restaurant_id),
+        supabase.table("Menu").select("*").eq("restaurant", restaurant_id).execute(),
+    )
+    if restaurant is None:
         raise HTTPException(status_code=404, detail="Restaurant not found")
 
-    restaurant = restaurant.data[0]
-    restaurant_location = Location(
-        **(
-            supabase.table("Location")
-            .select("*")
-            .eq("id", restaurant["location"])
-            .execute()
-        ).data[0]
+    plan = plan_menu_sync(stored_menus.data, desired_menus)
+
+    # Images are stored under their digest, so unchanged ones are never uploaded
+    # again and an image shared by several menus is uploaded once
+    semaphore = asyncio.Semaphore(BULK_UPLOAD_CONCURRENCY)
+    uploads = {}
+
+    async def upload(desired: DesiredMenu):
+        async with semaphore:
+            _, url = await store_image(
+                desired.image, desired.mime_type, "menu", desired.digest, upsert=True
+            )
+        return url
+
+    async def image_url(desired: DesiredMenu, stored: dict = None):
+        if desired.digest is None:
+            return None
+        if stored is not None:
+            if image_digest_from_url(stored["image_url"]) == desired.digest:
+                return stored["image_url"]
+        if desired.digest not in uploads:
+            uploads[desired.digest] = asyncio.ensure_future(upload(desired))
+        return await uploads[desired.digest]
+
+    insert_urls, update_urls = await asyncio.gather(
+        asyncio.gather(*(image_url(desired) for desired in plan.insert)),
+        asyncio.gather(
+            *(image_url(desired, stored) for stored, desired in plan.update)
+        ),
     )
-    restaurant["location"] = restaurant_location
 
-    menus = (
-        supabase.table("Menu").select("*").eq("restaurant", restaurant_id).execute()
-    ).data
+    def menu_row(desired: DesiredMenu, url: str) -> dict:
+        row = desired.request.model_dump()
+        row["restaurant"] = restaurant["id"]
+        row["image_url"] = url
+        del row["image"]
+        return row
+
+    async def insert_menus():
+        if not plan.insert:
+            return []
+        rows = [
+            menu_row(desired, url) for desired, url in zip(plan.insert, insert_urls)
+        ]
+        return (await supabase.table("Menu").insert(rows).execute()).data
+
+    async def update_menus():
+        if not plan.update:
+            return []
+        rows = [
+            {**menu_row(desired, url), "id": stored["id"]}
+            for (stored, desired), url in zip(plan.update, update_urls)
+        ]
+        return (await supabase.table("Menu").upsert(rows).execute()).data
+
+    inserted, updated, _ = await asyncio.gather(
+        insert_menus(), update_menus(), delete_menus(plan.delete, remove_images=False)
+    )
+
+    for menu in inserted + updated:
+        catalog.put_menu(dict(menu))
+
+    # Remove the replaced images no menu refers to anymore
+    remove_menu_images(
+        [menu["image_url"] for menu in plan.delete]
+        + [stored["image_url"] for stored, _ in plan.update]
+    )
+
+    return MenuSyncResponse(
+        inserted=[menu["id"] for menu in inserted],
+        updated=[menu["id"] for menu in updated],
+        deleted=[menu["id"] for menu in plan.delete],
+        unchanged=[menu["id"] for menu in plan.unchanged],
+    )
+
+
+@app.get("/restaurant/{restaurant_id}/menu")
+async def list_restaurant_menus(
+    x_user_uuid: Annotated[str, Header()],
+    restaurant_id: str,
+    catalog: Annotated[Catalog, Depends(get_catalog)],
+):
+    restaurant, user = await asyncio.gather(
+        load_restaurant(restaurant_id), get_user_context(x_user_uuid)
+    )
+    if restaurant is None:
+        raise HTTPException(status_code=404, detail="Restaurant not found")
+
+    menus = catalog.menu_rows(restaurant["id"])
 
     menu_responses = []
     for menu in menus:
-        # Get the average rating for the menu
-        average_rating = (
-            supabase.table("Rating")
-            .select("rating_value")
-            .eq("menu", menu["id"])
-            .execute()
-        ).data
-        average_rating_value = (
-            sum(rating["rating_value"] for rating in average_rating)
-            / len(average_rating)
-            if average_rating
-            else 0
-        )
-        menu["average_rating"] = average_rating_value
+        menu["average_rating"] = catalog.ratings.average(menu["id"])
         del menu["restaurant"]
         menu_response = MenuResponse(**menu)
         menu_responses.append(menu_response)
 
-    # Get user current location
-    user = supabase.auth.admin.get_user_by_id(x_user_uuid).user
-    user_profile = (
-        supabase.table("Profile").select("*").eq("user", user.id).execute()
-    ).data[0]
-    user_current_location = Location(
-        **(
-            supabase.table("Location")
-            .select("*")
-            .eq("id", user_profile["current_location"])
-            .execute()
-        ).data[0]
-    )
+    restaurant = catalog.restaurant(restaurant["id"])
 
     return RestaurantMenuResponse(
-        restaurant=Restaurant(**restaurant),
+        restaurant=restaurant,
         menus=menu_responses,
-        distance=calculate_distance(user_current_location, restaurant_location),
+        distance=calculate_distance(user.current_location, restaurant.location),
     )
 
 
-@app.get("/menu")
-def list_all_menus():
-    menus = supabase.table("Menu").select("*").execute().data
-
-    menu_responses = []
-    for menu in menus:
-        # Get the restaurant
-        restaurant = (
-            supabase.table("Restaurant")
-            .select("*")
-            .eq("id", menu["restaurant"])
-            .execute()
-        ).data[0]
-        restaurant_location = (
-            supabase.table("Location")
-            .select("*")
-            .eq("id", restaurant["location"])
-            .execute()
-        ).data[0]
-        restaurant["location"] = Location(**restaurant_location)
+@app.get("/menu", response_model=Union[MenuPage, List[MenuResponse]])
+async def list_all_menus(
+    request: Request,
+    catalog: Annotated[Catalog, Depends(get_catalog)],
+    after: Optional[str] = None,
+    limit: Annotated[Optional[int], Query(ge=1, le=MAX_PAGE_SIZE)] = None,
+    sort: Literal["id", "price", "average_rating", "created_at"] = "id",
+    order: Literal["asc", "desc"] = "asc",
+):
+    paginated = after is not None or limit is not None
 
-        # Get the average rating for the menu
-        average_rating = (
-            supabase.table("Rating")
-            .select("rating_value")
-            .eq("menu", menu["id"])
-            .execute()
-        ).data
-        average_rating_value = (
-            sum(rating["rating_value"] for rating in average_rating)
-            / len(average_rating)
-            if average_rating
-            else 0
+    def render() -> bytes:
+        if sort == "average_rating":
+            sort_value = lambda menu: catalog.ratings.average(menu["id"])
+        else:
+            sort_value = lambda menu: menu[sort]
+        menus, next_cursor = get_page(
+            catalog.menu_rows(),
+            sort_value,
+            sort,
+            order,
+            after,
+            (limit or DEFAULT_PAGE_SIZE) if paginated else None,
         )
 
-        menu["average_rating"] = average_rating_value
-        menu["restaurant"] = Restaurant(**restaurant)
-        menu_response = MenuResponse(**menu)
-        menu_responses.append(menu_response)
+        restaurant_models = {
+            restaurant_id: catalog.restaurant(restaurant_id)
+            for restaurant_id in {menu["restaurant"] for menu in menus}
+        }
+
+        menu_responses = []
+        for menu in menus:
+            menu["average_rating"] = catalog.ratings.average(menu["id"])
+            menu["restaurant"] = restaurant_models[menu["restaurant"]]
+            menu_response = MenuResponse(**menu)
+            menu_responses.append(menu_response)
+
+        if not paginated:
+            return MenuList(menu_responses).model_dump_json().encode()
+        return MenuPage(
+            items=menu_responses, next_cursor=next_cursor
+        ).model_dump_json().encode()
 
-    return menu_responses
+    return response_cache.get(request, catalog.version, render).respond(request)
 
 
 @app.get("/menu/{menu_id}")
-def get_menu(menu_id: str):
-    menu = supabase.table("Menu").select("*").eq("id", menu_id).execute().data
-    if not menu:
+async def get_menu(
+    menu_id: str, catalog: Annotated[Catalog, Depends(get_catalog)]
+):
+    menu = await load_menu(menu_id)
+    if menu is None:
         raise HTTPException(status_code=404, detail="Menu not found")
 
-    menu = menu[0]
-
     # Get restaurant information
-    restaurant = (
-        supabase.table("Restaurant").select("*").eq("id", menu["restaurant"]).execute()
-    ).data[0]
-    restaurant_location = (
-        supabase.table("Location")
-        .select("*")
-        .eq("id", restaurant["location"])
-        .execute()
-    ).data[0]
-    restaurant["location"] = Location(**restaurant_location)
+    await load_restaurant(menu["restaurant"])
+    menu["average_rating"] = catalog.ratings.average(menu["id"])
+    menu["restaurant"] = catalog.restaurant(menu["restaurant"])
 
-    # Get the average rating for the menu
-    average_rating = (
-        supabase.table("Rating").select("rating_value").eq("menu", menu_id).execute()
-    ).data
-    average_rating_value = (
-        sum(rating["rating_value"] for rating in average_rating) / len(average_rating)
-        if average_rating
-        else 0
+    return MenuResponse(**menu)
+
+
+@app.put("/menu/{menu_id}/image")
+async def upload_menu_image(menu_id: str, image: UploadFile):
+    data, menu = await asyncio.gather(
+        read_upload(image),
+        supabase.table("Menu").select("*").eq("id", menu_id).execute(),
     )
-    menu["average_rating"] = average_rating_value
-    menu["restaurant"] = Restaurant(**restaurant)
+    if not menu.data:
+        raise HTTPException(status_code=404, detail="Menu not found")
+    previous_url = menu.data[0]["image_url"]
 
-    return MenuResponse(**menu)
+    _, image_url = await store_image(
+        data, image.content_type, "menu", str(uuid.uuid4())
+    )
+    menu = (
+        await supabase.table("Menu")
+        .update({"image_url": image_url})
+        .eq("id", menu_id)
+        .execute()
+    ).data[0]
+    catalog.put_menu(dict(menu))
+    remove_menu_images([previous_url])
+
+    await load_restaurant(menu["restaurant"])
+    menu["restaurant"] = catalog.restaurant(menu["restaurant"])
+    return Menu(**menu)
 
 
 @app.delete("/menu/{menu_id}", status_code=204)
-def delete_menu(menu_id: str):
+async def delete_menu(menu_id: str):
     # Check if menu exists
-    menu = supabase.table("Menu").select("*").eq("id", menu_id).execute().data
+    menu = (await supabase.table("Menu").select("*").eq("id", menu_id).execute()).data
     if not menu:
         raise HTTPException(status_code=404, detail="Menu not found")
 
     menu = menu[0]
 
-    # Delete menu
-    supabase.table("Menu").delete().eq("id", menu_id).execute()
+    # Delete menu; its ratings and image are removed in the background
+    await delete_menus([menu])
 
-    # Delete image from storage
-    if menu["image_url"] is not None:
-        image_path = f"menu/{menu['image_url'].split('/')[-1][:-1]}"
-        supabase.storage.from_("media").remove([image_path])
+    return 204, None
 
-    # Delete ratings associated with the menu
-    supabase.table("Rating").delete().eq("menu", menu_id).execute()
 
-    return 204, None
+@app.delete("/menu")
+async def delete_menus_batch(ids: Annotated[List[str], Query(min_length=1)]):
+    # Accept both ?ids=1&ids=2 and ?ids=1,2
+    try:
+        menu_ids = [int(menu_id) for value in ids for menu_id in value.split(",")]
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Menu ids must be integers")
+
+    menus = (
+        await supabase.table("Menu").select("*").in_("id", menu_ids).execute()
+    ).data
+    await delete_menus(menus)
+
+    found = {menu["id"] for menu in menus}
+    return {
+        "deleted": [menu["id"] for menu in menus],
+        "not_found": [
+            menu_id for menu_id in dict.fromkeys(menu_ids) if menu_id not in found
+        ],
+    }
 
 
 @app.post("/menu/{menu_id}/rate", status_code=201)
-def rate_menu(menu_id: str, request: CreateRatingRequest):
+async def rate_menu(
+    menu_id: str,
+    request: CreateRatingRequest,
+    catalog: Annotated[Catalog, Depends(get_catalog)],
+):
     # Check if menu exists
-    menu = supabase.table("Menu").select("*").eq("id", menu_id).execute().data
-    if not menu:
+    menu = await load_menu(menu_id)
+    if menu is None:
         raise HTTPException(status_code=404, detail="Menu not found")
-    restaurant = (
-        supabase.table("Restaurant")
-        .select("*")
-        .eq("id", menu[0]["restaurant"])
-        .execute()
-    ).data
-    restaurant_location = (
-        supabase.table("Location")
-        .select("*")
-        .eq("id", restaurant[0]["location"])
-        .execute()
-    ).data[0]
-
-    restaurant[0]["location"] = Location(**restaurant_location)
-    menu = menu[0]
-    menu["restaurant"] = Restaurant(**restaurant[0])
+    await load_restaurant(menu["restaurant"])
+    menu["restaurant"] = catalog.restaurant(menu["restaurant"])
 
     # Create rating
     new_rating = {
@@ -528,7 +1152,75 @@ def rate_menu(menu_id: str, request: CreateRatingRequest):
         "comment_text": request.comment_text,
         "menu": menu_id,
     }
-    rating = supabase.table("Rating").insert(new_rating).execute().data[0]
+    rating = (await supabase.table("Rating").insert(new_rating).execute()).data[0]
+    catalog.ratings.add(menu["id"], request.rating_value)
     rating["menu"] = menu
 
     return Rating(**rating)
+
+
+@app.get("/menu/{menu_id}/rating")
+async def get_menu_rating(
+    menu_id: str, catalog: Annotated[Catalog, Depends(get_catalog)]
+):
+    menu = await load_menu(menu_id)
+    if menu is None:
+        raise HTTPException(status_code=404, detail="Menu not found")
+
+    return catalog.ratings.stats(menu["id"])
+
+
+@app.post("/menu/ratings/reconcile", dependencies=[Depends(require_admin)])
+async def reconcile_menu_ratings():
+    # Only this worker's aggregates; every worker rebuilds its own at each full
+    # catalog reload, so ratings made through other workers lag by up to
+    # CATALOG_RELOAD_SECONDS
+    await rating_aggregates.rebuild(supabase)
+    return {"message": "Rating aggregates rebuilt"}
+
+
+"""
+User context cache API
+"""
+
+
+@app.delete("/user/{user_uuid}/context", status_code=204)
+async def invalidate_user_context(user_uuid: str):
+    # Called when the user's profile or current location changes
+    user_contexts.invalidate(user_uuid)
+    return 204, None
+
+
+@app.get("/user/context/metrics")
+async def user_context_metrics():
+    return user_contexts.metrics()
+
+
+"""
+Cleanup queue API
+"""
+
+
+@app.get("/cleanup/metrics")
+async def cleanup_metrics():
+    return cleanup_queue.metrics()
+
+
+"""
+Response cache API
+"""
+
+
+@app.get("/cache/metrics")
+async def response_cache_metrics():
+    return response_cache.metrics()
+
+
+"""
+Supabase API
+"""
+
+
+@app.get("/supabase/metrics")
+async def supabase_metrics():
+    return supabase_transport.metrics()
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from models import CreateMenuRequest
+from utils import decode_image
+
+"""
+Content-hash diff of a restaurant's menus
+"""
+
+_DIGEST_NAME = re.compile(r"^[0-9a-f]{64}$")
+
+
+def image_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def image_digest_from_url(image_url: Optional[str]) -> Optional[str]:
+    """
+    The digest of a stored image, when it was uploaded under its digest.
+    Images uploaded under a random name have no known digest.
+    """
+    if image_url is None:
+        return None
+    name = image_url.split("/")[-1].split("?")[0].rsplit(".", 1)[0]
+    name = name.removesuffix("-original")
+    return name if _DIGEST_NAME.match(name) else None
+
+
+def stored_content_hash(menu: dict) -> str:
+    # An image of unknown digest never matches a desired one, so it is replaced once
+    image = menu["image_url"]
+    if image is not None:
+        image = image_digest_from_url(image) or image
+    return content_hash(menu, image)
+
+
+def content_hash(menu: dict, digest: Optional[str]) -> str:
+    """
+    Hash of the fields a menu sync compares: name, description,
+    main_ingredients, price and the digest of its image.
+    """
+    content = {
+        "name": menu["name"],
+        "description": menu["description"],
+        "main_ingredients": [
+            [ingredient["name"], ingredient["description"]]
+            for ingredient in menu["main_ingredients"]
+        ],
+        "price": float(menu["price"]),
+        "image": digest,
+    }
+    return hashlib.sha256(
+        json.dumps(content, sort_keys=True, separators=(",", ":")).encode()
+    ).hexdigest()
+
+
+@dataclass
+class DesiredMenu:
+    request: CreateMenuRequest
+    image: Optional[bytes] = None
+    mime_type: Optional[str] = None
+    image_type: Optional[str] = None
+    digest: Optional[str] = None
+    hash: str = ""
+
+    @classmethod
+    def from_request(cls, request: CreateMenuRequest) -> "DesiredMenu":
+        desired = cls(request=request)
+        if request.image is not None:
+            desired.image, desired.mime_type, desired.image_type = decode_image(
+                request.image
+            )
+            desired.digest = image_digest(desired.image)
+        desired.hash = content_hash(request.model_dump(), desired.digest)
+        return desired
+
+
+@dataclass
+class MenuSyncPlan:
+    """
+    What it takes to turn the stored menus into the desired ones, matched by
+    menu name. `update` pairs each stored row with its replacement.
+    """
+
+    insert: List[DesiredMenu] = field(default_factory=list)
+    update: List[tuple] = field(default_factory=list)
+    delete: List[dict] = field(default_factory=list)
+    unchanged: List[dict] = field(default_factory=list)
+
+
+def plan_menu_sync(stored_menus: List[dict], desired_menus: List[DesiredMenu]) -> MenuSyncPlan:
+    stored_by_name = {menu["name"]: menu for menu in stored_menus}
+    plan = MenuSyncPlan()
+    for desired in desired_menus:
+        stored = stored_by_name.pop(desired.request.name, None)
+        if stored is None:
+            plan.insert.append(desired)
+        elif stored_content_hash(stored) == desired.hash:
+            plan.unchanged.append(stored)
+        else:
+            plan.update.append((stored, desired))
+    plan.delete = list(stored_by_name.values())
+    return plan
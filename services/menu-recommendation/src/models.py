@@ -1,7 +1,9 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field, RootModel, computed_field
+from typing import Dict, List, Literal, Optional
 from datetime import datetime
 
+from images import variant_urls
+
 """
 Models
 """
@@ -18,6 +20,20 @@ class Location(BaseModel):
     inside_kaist: bool = False
 
 
+class ImageVariant(BaseModel):
+    name: str
+    format: str
+    max_size: int
+    url: str
+
+
+def image_variants(image_url: Optional[str]) -> Optional[List[ImageVariant]]:
+    variants = variant_urls(image_url)
+    if variants is None:
+        return None
+    return [ImageVariant(**variant) for variant in variants]
+
+
 class Restaurant(BaseModel):
     id: int
     name: str
@@ -27,6 +43,11 @@ class Restaurant(BaseModel):
     location: Location
     created_at: datetime
 
+    @computed_field
+    @property
+    def image_variants(self) -> Optional[List[ImageVariant]]:
+        return image_variants(self.image_url)
+
 
 class Menu(BaseModel):
     id: int
@@ -38,6 +59,11 @@ class Menu(BaseModel):
     restaurant: Restaurant
     created_at: datetime
 
+    @computed_field
+    @property
+    def image_variants(self) -> Optional[List[ImageVariant]]:
+        return image_variants(self.image_url)
+
 
 class Rating(BaseModel):
     id: int
@@ -77,11 +103,23 @@ class CreateMenuRequest(BaseModel):
     """
 
 
+class BulkCreateMenuRequest(BaseModel):
+    menus: List[CreateMenuRequest] = Field(min_length=1, max_length=500)
+
+
+class SyncMenusRequest(BaseModel):
+    menus: List[CreateMenuRequest] = Field(max_length=500)
+
+
 class CreateRatingRequest(BaseModel):
     rating_value: int
     comment_text: str = ""
 
 
+class GroupMatchRequest(BaseModel):
+    users: List[str] = Field(min_length=1, max_length=100)
+
+
 """
 Responses
 """
@@ -92,11 +130,57 @@ class MenuResponse(Menu):
     restaurant: Optional[Restaurant] = None
 
 
+class MenuPage(BaseModel):
+    items: List[MenuResponse]
+    next_cursor: Optional[str] = None
+
+
+class RestaurantPage(BaseModel):
+    items: List[Restaurant]
+    next_cursor: Optional[str] = None
+
+
+# Unpaginated listings, as returned before pagination
+class MenuList(RootModel[List[MenuResponse]]):
+    pass
+
+
+class RestaurantList(RootModel[List[Restaurant]]):
+    pass
+
+
+class BulkMenuResult(BaseModel):
+    index: int
+    created: bool
+    menu: Optional[Menu] = None
+    error: Optional[str] = None
+
+
+class BulkCreateMenuResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[BulkMenuResult]
+
+
+class MenuSyncResponse(BaseModel):
+    inserted: List[int]
+    updated: List[int]
+    deleted: List[int]
+    unchanged: List[int]
+
+
 class RestaurantMenuResponse(BaseModel):
     restaurant: Restaurant
     menus: List[MenuResponse]
     distance: float
     food_matches: Optional[int] = None
+    score: Optional[float] = None
+
+
+class GroupRestaurantMenuResponse(RestaurantMenuResponse):
+    # `distance` is the group's max or total member distance
+    distances: Dict[str, float]
+    coverage: float
 
 
 """
@@ -114,3 +198,26 @@ class MenuFilter(BaseModel):
     distance_max: float = 5000.0
     rating_min: int = 1
     rating_max: int = 5
+
+
+class MatchRanking(BaseModel):
+    """
+    Weights of the composite score /restaurant/matches ranks by, and how many
+    restaurants to return. The defaults rank nearest first and return all.
+    """
+
+    limit: Optional[int] = Field(None, ge=1)
+    distance_weight: float = 1.0
+    rating_weight: float = 0.0
+    food_matches_weight: float = 0.0
+
+
+class GroupMatchRanking(MatchRanking):
+    """
+    The composite score of /restaurant/matches/group, over the members' max
+    or total distance, plus a weight on the share of members whose
+    preferences a matched menu covers.
+    """
+
+    objective: Literal["max", "total"] = "max"
+    coverage_weight: float = 1.0
@@ -0,0 +1,91 @@
+import base64
+import heapq
+import json
+from typing import Optional
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+"""
+Keyset pagination over catalog rows
+"""
+
+
+# JSON types a cursor's sort value may decode to, by sort key; None is always allowed
+CURSOR_VALUE_TYPES = {
+    "id": (int,),
+    "name": (str,),
+    "created_at": (str,),
+    "price": (int, float),
+    "average_rating": (int, float),
+}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(sort: str, order: str, value, row_id) -> str:
+    payload = json.dumps([sort, order, value, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, order: str):
+    """
+    The `(value, id)` position encoded in `cursor`. A cursor is only valid for
+    the sort key and order it was issued for, with a value of that key's type.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, cursor_order, value, row_id = json.loads(
+            base64.urlsafe_b64decode(padded)
+        )
+    except (ValueError, TypeError):
+        raise InvalidCursor("Malformed cursor")
+    if (cursor_sort, cursor_order) != (sort, order):
+        raise InvalidCursor("Cursor was issued for a different sort")
+    value_types = CURSOR_VALUE_TYPES.get(sort, (str, int, float))
+    if value is not None and (
+        isinstance(value, bool) or not isinstance(value, value_types)
+    ):
+        raise InvalidCursor("Malformed cursor")
+    if isinstance(row_id, bool) or not isinstance(row_id, int):
+        raise InvalidCursor("Malformed cursor")
+    return value, row_id
+
+
+def sort_key(value, row_id) -> tuple:
+    """
+    Rows without a sort value order after every other row, and compare by id.
+    """
+    return (value is None, value, row_id)
+
+
+def paginate(rows, sort_value, sort: str, order: str, after: str, limit: Optional[int]):
+    """
+    One page of `rows` ordered by `sort_key(sort_value(row), row["id"])`, starting
+    after the `after` cursor, and the cursor of the next page (None on the
+    last page). Only the `limit + 1` leading rows are ever sorted; without a
+    `limit` every row is returned.
+    """
+    descending = order == "desc"
+    keyed = ((sort_key(sort_value(row), row["id"]), row) for row in rows)
+    if after is not None:
+        position = sort_key(*decode_cursor(after, sort, order))
+        if descending:
+            keyed = (item for item in keyed if item[0] < position)
+        else:
+            keyed = (item for item in keyed if item[0] > position)
+    if limit is None:
+        keyed = sorted(keyed, key=lambda item: item[0], reverse=descending)
+        return [row for _, row in keyed], None
+
+    select = heapq.nlargest if descending else heapq.nsmallest
+    page = select(limit + 1, keyed, key=lambda item: item[0])
+
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        (_, value, row_id), _ = page[-1]
+        next_cursor = encode_cursor(sort, order, value, row_id)
+    return [row for _, row in page], next_cursor
@@ -0,0 +1,271 @@
+import asyncio
+import dataclasses
+import math
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+from supabase import AsyncClient
+
+from catalog import Catalog
+from models import Location, MenuFilter
+from ratings import RatingAggregates
+from utils import EARTH_RADIUS, calculate_distance_matrix, calculate_distances, fetch_all_rows
+
+"""
+Query planner for /restaurant/matches and /restaurant/matches/group
+"""
+
+
+@dataclass
+class MatchQueryPlan:
+    """
+    A MenuFilter compiled into predicates over the catalog snapshot. The
+    bounding box and KAIST predicates are evaluated on the restaurants in the
+    catalog's grid cells around the origin first, so the exact distance is
+    only computed for nearby restaurants.
+    """
+
+    origin: Location
+    latitude_min: float
+    latitude_max: float
+    longitude_min: float
+    longitude_max: float
+    inside_kaist: Optional[bool]
+    price_min: float
+    price_max: float
+    distance_min: float
+    distance_max: float
+    rating_min: float
+    rating_max: float
+    empty: bool = False
+
+    def nearby_restaurants(self, catalog: Catalog):
+        """
+        `(restaurant_id, distance)` of the catalog restaurants passing the
+        bounding box, KAIST and exact distance predicates, nearest first.
+        """
+        restaurant_ids, latitudes, longitudes = self.candidates(catalog)
+        distances = calculate_distances(self.origin, latitudes, longitudes)
+        within = (distances >= self.distance_min) & (distances <= self.distance_max)
+        restaurant_ids, distances = restaurant_ids[within], distances[within]
+        order = np.argsort(distances, kind="stable")
+        return [(int(restaurant_ids[i]), float(distances[i])) for i in order]
+
+    def candidates(self, catalog: Catalog):
+        """
+        Ids, latitudes and longitudes of the catalog restaurants passing the
+        bounding box and KAIST predicates. Only the restaurants in the grid
+        cells overlapping the box are checked.
+        """
+        grid = catalog.spatial_index()
+        restaurant_ids, latitudes, longitudes, inside_kaist = grid.coordinates
+        nearby = grid.within_box(
+            self.latitude_min, self.latitude_max, self.longitude_min, self.longitude_max
+        )
+        restaurant_ids, latitudes, longitudes, inside_kaist = (
+            restaurant_ids[nearby], latitudes[nearby], longitudes[nearby], inside_kaist[nearby]
+        )
+        candidates = (
+            (latitudes >= self.latitude_min)
+            & (latitudes <= self.latitude_max)
+            & (longitudes >= self.longitude_min)
+            & (longitudes <= self.longitude_max)
+        )
+        if self.inside_kaist is not None:
+            candidates &= inside_kaist == self.inside_kaist
+        candidates = np.flatnonzero(candidates)
+        return restaurant_ids[candidates], latitudes[candidates], longitudes[candidates]
+
+    def accepts_rating(self, stats: dict) -> bool:
+        """
+        Unrated menus have no average to compare and are always kept.
+        """
+        return stats["count"] == 0 or (
+            self.rating_min <= stats["average"] <= self.rating_max
+        )
+
+    """
+    Database-side predicates, for matching before the catalog has loaded
+    """
+
+    def location_query(self, supabase: AsyncClient):
+        query = (
+            supabase.table("Location")
+            .select("*")
+            .gte("latitude", self.latitude_min)
+            .lte("latitude", self.latitude_max)
+            .gte("longitude", self.longitude_min)
+            .lte("longitude", self.longitude_max)
+        )
+        if self.inside_kaist is not None:
+            query = query.eq("inside_kaist", self.inside_kaist)
+        return query.order("id")
+
+    def restaurant_query(self, supabase: AsyncClient, location_ids):
+        return supabase.table("Restaurant").select("*").in_("location", location_ids).order("id")
+
+    def menu_query(self, supabase: AsyncClient, restaurant_ids):
+        return (
+            supabase.table("Menu")
+            .select("*")
+            .in_("restaurant", restaurant_ids)
+            .gte("price", self.price_min)
+            .lte("price", self.price_max)
+            .order("id")
+        )
+
+    def rating_query(self, supabase: AsyncClient, menu_ids):
+        return (
+            supabase.table("Rating")
+            .select("id, menu, rating_value")
+            .in_("menu", menu_ids)
+            .order("id")
+        )
+
+    async def fetch_catalog(self, supabase: AsyncClient) -> Catalog:
+        """
+        A catalog of only the restaurants passing the location predicates,
+        their menus passing the price predicate and those menus' ratings,
+        with every predicate but the exact distance evaluated by Supabase.
+        """
+        catalog = Catalog(RatingAggregates())
+        if self.empty:
+            return catalog
+
+        locations = await fetch_all_rows(lambda: self.location_query(supabase))
+        distances = calculate_distances(
+            self.origin,
+            np.fromiter((row["latitude"] for row in locations), dtype=np.float64),
+            np.fromiter((row["longitude"] for row in locations), dtype=np.float64),
+        )
+        locations = {
+            location["id"]: location
+            for location, distance in zip(locations, distances.tolist())
+            if self.distance_min <= distance <= self.distance_max
+        }
+        if not locations:
+            return catalog
+
+        restaurants = await _fetch_in(
+            lambda ids: self.restaurant_query(supabase, ids), list(locations)
+        )
+        menus = await _fetch_in(
+            lambda ids: self.menu_query(supabase, ids),
+            [restaurant["id"] for restaurant in restaurants],
+        )
+        ratings = await _fetch_in(
+            lambda ids: self.rating_query(supabase, ids), [menu["id"] for menu in menus]
+        )
+
+        for restaurant in restaurants:
+            catalog.put_restaurant(restaurant, locations[restaurant["location"]])
+        for menu in menus:
+            catalog.put_menu(menu)
+        for rating in ratings:
+            catalog.ratings.add(rating["menu"], rating["rating_value"])
+        return catalog
+
+
+async def _fetch_in(build_query, ids, chunk_size: int = 500) -> list:
+    """
+    Every row of `build_query(chunk)` for `ids` in chunks, which keeps the
+    `in_` lists short enough for a request line.
+    """
+    pages = await asyncio.gather(
+        *(
+            fetch_all_rows(lambda chunk=ids[start:start + chunk_size]: build_query(chunk))
+            for start in range(0, len(ids), chunk_size)
+        )
+    )
+    return [row for page in pages for row in page]
+
+
+def plan_matches(menu_filter: MenuFilter, origin: Location) -> MatchQueryPlan:
+    # A bounding box of the search circle, checked on the catalog coordinate arrays
+    # before the exact distance is computed
+    angular_radius = menu_filter.distance_max / EARTH_RADIUS
+    delta_latitude = math.degrees(angular_radius)
+    cos_latitude = math.cos(math.radians(origin.latitude))
+    delta_longitude = (
+        math.degrees(math.asin(math.sin(angular_radius) / cos_latitude))
+        if math.sin(angular_radius) < cos_latitude
+        else 180.0
+    )
+
+    if menu_filter.inside_kaist and menu_filter.outside_kaist:
+        inside_kaist = None
+    else:
+        inside_kaist = menu_filter.inside_kaist
+
+    return MatchQueryPlan(
+        origin=origin,
+        latitude_min=origin.latitude - delta_latitude,
+        latitude_max=origin.latitude + delta_latitude,
+        longitude_min=origin.longitude - delta_longitude,
+        longitude_max=origin.longitude + delta_longitude,
+        inside_kaist=inside_kaist,
+        price_min=menu_filter.price_min,
+        price_max=menu_filter.price_max,
+        distance_min=menu_filter.distance_min,
+        distance_max=menu_filter.distance_max,
+        rating_min=menu_filter.rating_min,
+        rating_max=menu_filter.rating_max,
+        empty=(
+            not (menu_filter.inside_kaist or menu_filter.outside_kaist)
+            or menu_filter.price_min > menu_filter.price_max
+            or menu_filter.distance_min > menu_filter.distance_max
+            or menu_filter.rating_min > menu_filter.rating_max
+        ),
+    )
+
+
+@dataclass
+class GroupMatchQueryPlan:
+    """
+    A MenuFilter compiled for a group. Every member must be within the
+    distance range of a restaurant, so `plan` carries the intersection of the
+    members' bounding boxes, and only the restaurants inside it get a column
+    in the members x restaurants distance matrix.
+    """
+
+    plan: MatchQueryPlan
+    origins: List[Location]
+
+    @property
+    def empty(self) -> bool:
+        return self.plan.empty
+
+    def nearby_restaurants(self, catalog: Catalog):
+        """
+        Ids of the catalog restaurants every member is within range of, and
+        the members x restaurants array of their distances.
+        """
+        restaurant_ids, latitudes, longitudes = self.plan.candidates(catalog)
+        distances = calculate_distance_matrix(
+            [origin.latitude for origin in self.origins],
+            [origin.longitude for origin in self.origins],
+            latitudes,
+            longitudes,
+        )
+        within = (
+            (distances >= self.plan.distance_min) & (distances <= self.plan.distance_max)
+        ).all(axis=0)
+        return restaurant_ids[within], distances[:, within]
+
+
+def plan_group_matches(menu_filter: MenuFilter, origins: List[Location]) -> GroupMatchQueryPlan:
+    plans = [plan_matches(menu_filter, origin) for origin in origins]
+    plan = dataclasses.replace(
+        plans[0],
+        latitude_min=max(plan.latitude_min for plan in plans),
+        latitude_max=min(plan.latitude_max for plan in plans),
+        longitude_min=max(plan.longitude_min for plan in plans),
+        longitude_max=min(plan.longitude_max for plan in plans),
+    )
+    plan.empty = (
+        plan.empty
+        or plan.latitude_min > plan.latitude_max
+        or plan.longitude_min > plan.longitude_max
+    )
+    return GroupMatchQueryPlan(plan, origins)
@@ -0,0 +1,71 @@
+import heapq
+
+import numpy as np
+
+from models import GroupMatchRanking, MatchRanking
+
+"""
+Composite ranking for /restaurant/matches and /restaurant/matches/group
+"""
+
+
+def composite_score(
+    ranking: MatchRanking,
+    distance: float,
+    distance_max: float,
+    average_rating: float,
+    food_matches: int,
+) -> float:
+    """
+    Weighted sum of three signals in [0, 1]: closeness within the search
+    radius, average rating out of 5, and a saturating count of matched menus.
+    """
+    closeness = 1 - distance / distance_max if distance_max > 0 else 1.0
+    return (
+        ranking.distance_weight * closeness
+        + ranking.rating_weight * average_rating / 5
+        + ranking.food_matches_weight * food_matches / (food_matches + 1)
+    )
+
+
+def group_distances(ranking: GroupMatchRanking, distances: np.ndarray) -> np.ndarray:
+    """
+    Per restaurant, the max or the total distance over the members (rows).
+    """
+    if ranking.objective == "max":
+        return distances.max(axis=0)
+    return distances.sum(axis=0)
+
+
+def group_score(
+    ranking: GroupMatchRanking,
+    distance: float,
+    members: int,
+    distance_max: float,
+    average_rating: float,
+    food_matches: int,
+    coverage: float,
+) -> float:
+    """
+    The composite score with the group's distance as the distance (a total
+    is averaged over the members first, so closeness stays in [0, 1]), plus
+    the share of members with a matched preference.
+    """
+    if ranking.objective == "total":
+        distance /= members
+    return (
+        composite_score(ranking, distance, distance_max, average_rating, food_matches)
+        + ranking.coverage_weight * coverage
+    )
+
+
+def top_k(candidates, limit):
+    """
+    The `limit` best `(score, distance, restaurant_id, ...)` candidates,
+    highest score first, nearer and then lower id breaking ties. Selection
+    keeps a heap of at most `limit` entries; `limit=None` sorts them all.
+    """
+    key = lambda candidate: (candidate[0], -candidate[1], -candidate[2])
+    if limit is None:
+        return sorted(candidates, key=key, reverse=True)
+    return heapq.nlargest(limit, candidates, key=key)
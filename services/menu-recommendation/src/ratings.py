@@ -0,0 +1,78 @@
+import threading
+
+from supabase import AsyncClient
+
+from utils import fetch_all_rows
+
+RECONCILE_PAGE_SIZE = 1000
+
+"""
+Menu rating aggregates
+"""
+
+
+class RatingAggregates:
+    """
+    Per-menu rating count and sum, maintained incrementally by this service's
+    writes so read paths never scan the Rating table. `rebuild` recomputes
+    everything from scratch to repair drift (e.g. writes from other workers).
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self.version = 0
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def add(self, menu_id, rating_value: int):
+        with self._lock:
+            stats = self._stats.setdefault(menu_id, [0, 0])
+            stats[0] += 1
+            stats[1] += rating_value
+            self.version += 1
+
+    def remove_menu(self, menu_id):
+        with self._lock:
+            if self._stats.pop(menu_id, None) is not None:
+                self.version += 1
+
+    def stats(self, menu_id) -> dict:
+        count, total = self._stats.get(menu_id, (0, 0))
+        return {
+            "count": count,
+            "sum": total,
+            "average": total / count if count else 0,
+        }
+
+    def average(self, menu_id) -> float:
+        return self.stats(menu_id)["average"]
+
+    def averages(self, menu_ids) -> dict:
+        return {menu_id: self.average(menu_id) for menu_id in menu_ids}
+
+    async def rebuild(self, supabase: AsyncClient):
+        """
+        Recompute every aggregate from the Rating table, one page at a time.
+        """
+        rows = await fetch_all_rows(
+            lambda: supabase.table("Rating")
+            .select("id, menu, rating_value")
+            .not_.is_("menu", "null")
+            .order("id"),
+            RECONCILE_PAGE_SIZE,
+        )
+        stats = {}
+        for row in rows:
+            menu_stats = stats.setdefault(row["menu"], [0, 0])
+            menu_stats[0] += 1
+            menu_stats[1] += row["rating_value"]
+
+        with self._lock:
+            self._stats = stats
+            self.loaded = True
+            self.version += 1
+
+    async def ensure_loaded(self, supabase: AsyncClient) -> "RatingAggregates":
+        if not self.loaded:
+            await self.rebuild(supabase)
+        return self
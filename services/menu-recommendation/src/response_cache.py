@@ -0,0 +1,124 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable
+
+import brotli
+from fastapi import Request, Response
+
+"""
+Rendered response cache
+"""
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = 512
+
+
+class RenderedResponse:
+    """
+    A JSON body rendered once, with its ETag and its gzip and brotli
+    encodings compressed on first use.
+    """
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        self._encoded = {"identity": body}
+        self._lock = threading.Lock()
+
+    def encoded(self, encoding: str) -> bytes:
+        with self._lock:
+            if encoding not in self._encoded:
+                if encoding == "br":
+                    self._encoded[encoding] = brotli.compress(self.body, quality=5)
+                else:
+                    self._encoded[encoding] = gzip.compress(self.body, compresslevel=6)
+            return self._encoded[encoding]
+
+    def respond(self, request: Request) -> Response:
+        headers = {"ETag": self.etag, "Vary": "Accept-Encoding"}
+        if_none_match = request.headers.get("if-none-match", "")
+        if self.etag in [tag.strip() for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
+
+        encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+        if len(self.body) < MIN_COMPRESS_BYTES:
+            encoding = "identity"
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(
+            content=self.encoded(encoding),
+            media_type="application/json",
+            headers=headers,
+        )
+
+
+def negotiate_encoding(accept_encoding: str) -> str:
+    accepted = set()
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                pass
+        if quality > 0:
+            accepted.add(coding.strip().lower())
+    for encoding in ("br", "gzip"):
+        if encoding in accepted:
+            return encoding
+    return "identity"
+
+
+class ResponseCache:
+    """
+    Rendered response bodies by request path, query parameters and catalog
+    version, for at most `max_entries` requests (least recently used first
+    out). Entries rendered from an older catalog version are dropped as soon
+    as a newer version is seen.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, request: Request, version, render: Callable[[], bytes]) -> RenderedResponse:
+        key = (request.url.path, tuple(sorted(request.query_params.multi_items())))
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            rendered = self._entries.get(key)
+            if rendered is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return rendered
+            self.misses += 1
+
+        rendered = RenderedResponse(render())
+        with self._lock:
+            if version == self._version:
+                self._entries[key] = rendered
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return rendered
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+            }
@@ -0,0 +1,65 @@
+import math
+
+import numpy as np
+
+"""
+Spatial index
+"""
+
+
+class RestaurantGrid:
+    """
+    Grid over the catalog's `(ids, latitudes, longitudes, inside_kaist)`
+    restaurant coordinate arrays, bucketed by `cell_degrees` of
+    latitude/longitude. Box queries only visit the cells overlapping the box
+    and return positions into those arrays.
+    """
+
+    def __init__(self, coordinates: tuple, cell_degrees: float = 0.01):
+        self.coordinates = coordinates
+        self.cell_degrees = cell_degrees
+        _, latitudes, longitudes, _ = coordinates
+        self.size = len(latitudes)
+        rows = np.floor(latitudes / cell_degrees).astype(np.int64)
+        columns = np.floor(longitudes / cell_degrees).astype(np.int64)
+        # Positions sorted by cell, and the slice of them in each occupied cell
+        self._positions = np.lexsort((columns, rows))
+        cells = np.stack((rows[self._positions], columns[self._positions]), axis=1)
+        starts = np.flatnonzero(np.any(np.diff(cells, axis=0) != 0, axis=1)) + 1
+        starts = np.concatenate(([0], starts)) if self.size else starts
+        ends = np.append(starts[1:], self.size)
+        self._cells = {
+            (int(cells[start, 0]), int(cells[start, 1])): (int(start), int(end))
+            for start, end in zip(starts, ends)
+        }
+
+    def __len__(self):
+        return self.size
+
+    def _cell(self, latitude: float, longitude: float):
+        return (
+            math.floor(latitude / self.cell_degrees),
+            math.floor(longitude / self.cell_degrees),
+        )
+
+    def within_box(self, latitude_min, latitude_max, longitude_min, longitude_max) -> np.ndarray:
+        """
+        Positions of the restaurants in the cells overlapping the box. The
+        cells may extend past the box, so callers still apply its bounds.
+        """
+        min_cell = self._cell(latitude_min, longitude_min)
+        max_cell = self._cell(latitude_max, longitude_max)
+        cell_count = (max_cell[0] - min_cell[0] + 1) * (max_cell[1] - min_cell[1] + 1)
+        if cell_count > len(self._cells):
+            # The box covers more cells than are occupied: scan them all
+            return np.arange(self.size)
+        slices = [
+            self._positions[start:end]
+            for row in range(min_cell[0], max_cell[0] + 1)
+            for column in range(min_cell[1], max_cell[1] + 1)
+            for start, end in [self._cells.get((row, column), (0, 0))]
+            if end > start
+        ]
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(slices))
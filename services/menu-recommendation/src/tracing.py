@@ -0,0 +1,372 @@
+import asyncio
+import contextvars
+import json
+import logging
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+import httpx
+
+"""
+Request tracing and query budgets
+"""
+
+logger = logging.getLogger(__name__)
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_budgeted = contextvars.ContextVar("budgeted", default=True)
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+@dataclass
+class Span:
+    """
+    One Supabase, auth or storage call made while handling a request.
+    """
+
+    kind: str
+    target: str
+    operation: str
+    filters: List[str]
+    start_ms: float
+    duration_ms: float = 0.0
+    rows: Optional[int] = None
+    error: Optional[str] = None
+    budgeted: bool = True
+
+
+@dataclass
+class Trace:
+    method: str
+    path: str
+    trace_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    started_at: float = field(default_factory=time.time)
+    route: Optional[str] = None
+    status_code: Optional[int] = None
+    duration_ms: float = 0.0
+    spans: List[Span] = field(default_factory=list)
+    finished: bool = False
+    _started: float = field(default_factory=time.perf_counter, repr=False)
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._started) * 1000
+
+    @property
+    def queries(self) -> int:
+        """
+        Calls counted against the route's budget.
+        """
+        return sum(span.budgeted for span in self.spans)
+
+    def to_dict(self) -> dict:
+        trace = asdict(self)
+        del trace["_started"], trace["finished"]
+        return trace
+
+
+@asynccontextmanager
+async def span(kind: str, target: str, operation: str, filters: List[str] = ()):
+    """
+    Record the enclosed call on the current request's trace, if any. Calls
+    made after the response has been sent, e.g. by deferred cleanup, are
+    not recorded.
+    """
+    trace = _current_trace.get()
+    if trace is None or trace.finished:
+        yield Span(kind, target, operation, list(filters), 0.0)
+        return
+
+    current = Span(
+        kind,
+        target,
+        operation,
+        list(filters),
+        start_ms=trace.elapsed_ms(),
+        budgeted=_budgeted.get(),
+    )
+    try:
+        yield current
+    except Exception as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.duration_ms = trace.elapsed_ms() - current.start_ms
+        trace.spans.append(current)
+
+
+@contextmanager
+def unbudgeted():
+    """
+    Calls made inside are traced but not counted against the route's query
+    budget, e.g. a catalog refresh that a request happens to trigger.
+    """
+    token = _budgeted.set(False)
+    try:
+        yield
+    finally:
+        _budgeted.reset(token)
+
+
+"""
+Traced client
+"""
+
+
+def _describe(name: str, args) -> str:
+    values = [
+        f"[{len(arg)} values]" if isinstance(arg, (list, tuple, set)) else repr(arg)
+        for arg in args
+    ]
+    return f"{name}({', '.join(values)})"
+
+
+QUERY_OPERATIONS = {"select", "insert", "update", "upsert", "delete"}
+
+
+class _TracedQuery:
+    """
+    Wraps a PostgREST request builder, noting the operation and each filter
+    as it is chained, and records a span when it is executed.
+    """
+
+    def __init__(self, builder, table: str, operation: str = "select", filters=()):
+        self._builder = builder
+        self._table = table
+        self._operation = operation
+        self._filters = list(filters)
+
+    def _chain(self, builder, name: str, args=None):
+        if not hasattr(builder, "execute"):
+            return builder
+        if name in QUERY_OPERATIONS:
+            return _TracedQuery(builder, self._table, name, self._filters)
+        return _TracedQuery(
+            builder,
+            self._table,
+            self._operation,
+            self._filters + [name if args is None else _describe(name, args)],
+        )
+
+    def __getattr__(self, name):
+        value = getattr(self._builder, name)
+        if not callable(value):
+            # e.g. `.not_`, which returns the builder itself
+            return self._chain(value, name)
+
+        def call(*args, **kwargs):
+            return self._chain(value(*args, **kwargs), name, args)
+
+        return call
+
+    async def execute(self):
+        async with span("postgrest", self._table, self._operation, self._filters) as current:
+            result = await self._builder.execute()
+            if isinstance(result.data, list):
+                current.rows = len(result.data)
+            return result
+
+
+class _TracedAdmin:
+    def __init__(self, admin):
+        self._admin = admin
+
+    async def get_user_by_id(self, uid: str):
+        async with span("auth", "users", "get_user_by_id"):
+            return await self._admin.get_user_by_id(uid)
+
+    def __getattr__(self, name):
+        return getattr(self._admin, name)
+
+
+class _TracedAuth:
+    def __init__(self, auth):
+        self._auth = auth
+        self.admin = _TracedAdmin(auth.admin)
+
+    def __getattr__(self, name):
+        return getattr(self._auth, name)
+
+
+class _TracedBucket:
+    def __init__(self, bucket, name: str):
+        self._bucket = bucket
+        self._name = name
+
+    async def upload(self, path: str, *args, **kwargs):
+        async with span("storage", self._name, "upload", [path]):
+            return await self._bucket.upload(path, *args, **kwargs)
+
+    async def remove(self, paths: List[str]):
+        async with span("storage", self._name, "remove", [f"[{len(paths)} paths]"]) as current:
+            result = await self._bucket.remove(paths)
+            current.rows = len(result) if isinstance(result, list) else None
+            return result
+
+    def __getattr__(self, name):
+        return getattr(self._bucket, name)
+
+
+class _TracedStorage:
+    def __init__(self, storage):
+        self._storage = storage
+
+    def from_(self, bucket: str):
+        return _TracedBucket(self._storage.from_(bucket), bucket)
+
+    def __getattr__(self, name):
+        return getattr(self._storage, name)
+
+
+class TracedClient:
+    """
+    A Supabase client whose table queries, auth admin lookups and storage
+    uploads and removals are recorded as spans on the current trace.
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self.auth = _TracedAuth(client.auth)
+        self.storage = _TracedStorage(client.storage)
+
+    def table(self, name: str):
+        return _TracedQuery(self._client.table(name), name)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+"""
+Exporters
+"""
+
+
+class JsonlExporter:
+    """
+    Appends each trace as a line of JSON to a local file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _write(self, line: str):
+        with self._lock, open(self.path, "a") as f:
+            f.write(line + "\n")
+
+    async def export(self, trace: dict):
+        await asyncio.to_thread(self._write, json.dumps(trace))
+
+    async def close(self):
+        pass
+
+
+class HttpExporter:
+    """
+    Posts each trace as JSON to a collector.
+    """
+
+    def __init__(self, url: str, timeout: float = 2.0):
+        self.url = url
+        self._client = httpx.AsyncClient(timeout=timeout)
+
+    async def export(self, trace: dict):
+        await self._client.post(self.url, json=trace)
+
+    async def close(self):
+        await self._client.aclose()
+
+
+def exporter_for(target: str):
+    """
+    The exporter for a TRACE_EXPORT setting: a collector url, a JSONL file
+    path, or nothing for no export.
+    """
+    if not target:
+        return None
+    if target.startswith(("http://", "https://")):
+        return HttpExporter(target)
+    return JsonlExporter(target)
+
+
+"""
+Tracer
+"""
+
+
+class Tracer:
+    """
+    Traces requests, checks each against its route's query budget, and
+    hands finished traces to the exporter off the response path.
+
+    `budgets` maps "METHOD /route/{param}" to the most Supabase calls one
+    request may make. Over budget, a request is logged, or with `enforce`
+    fails with `QueryBudgetExceeded`.
+    """
+
+    def __init__(self, exporter=None, budgets: Dict[str, int] = None, enforce: bool = False):
+        self.exporter = exporter
+        self.budgets = dict(budgets or {})
+        self.enforce = enforce
+        self.over_budget = 0
+        self._exports = set()
+
+    @contextmanager
+    def trace(self, method: str, path: str):
+        trace = Trace(method, path)
+        token = _current_trace.set(trace)
+        try:
+            yield trace
+        finally:
+            _current_trace.reset(token)
+
+    def finish(self, trace: Trace, route: Optional[str], status_code: int):
+        trace.route = route
+        trace.status_code = status_code
+        trace.duration_ms = trace.elapsed_ms()
+        trace.finished = True
+
+        if self.exporter is not None:
+            export = asyncio.create_task(self._export(trace.to_dict()))
+            self._exports.add(export)
+            export.add_done_callback(self._exports.discard)
+
+        budget = self.budgets.get(f"{trace.method} {route}")
+        if budget is not None and trace.queries > budget:
+            self.over_budget += 1
+            message = (
+                f"{trace.method} {route} made {trace.queries} queries, over its budget of "
+                f"{budget}: "
+                + ", ".join(
+                    f"{span.operation} {span.target}" for span in trace.spans if span.budgeted
+                )
+            )
+            if self.enforce:
+                raise QueryBudgetExceeded(message)
+            logger.warning("Query budget exceeded: %s", message)
+
+    async def _export(self, trace: dict):
+        try:
+            await self.exporter.export(trace)
+        except Exception:
+            logger.exception("Trace export failed")
+
+    async def close(self):
+        if self._exports:
+            await asyncio.gather(*list(self._exports))
+        if self.exporter is not None:
+            await self.exporter.close()
+
+
+def server_timing(trace: Trace) -> str:
+    """
+    Server-Timing header value summarising the backend calls of a trace.
+    """
+    backend_ms = sum(span.duration_ms for span in trace.spans)
+    return f'db;dur={backend_ms:.1f};desc="{len(trace.spans)} calls", total;dur={trace.elapsed_ms():.1f}'
@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, FrozenSet, List
+
+from models import Location
+
+"""
+User context cache
+"""
+
+
+@dataclass(frozen=True)
+class UserContext:
+    """
+    What the menu endpoints need to know about the requesting user.
+    """
+
+    user_id: str
+    dietary_preferences: FrozenSet[str]
+    current_location: Location
+    dietary_restrictions: FrozenSet[str] = frozenset()
+
+
+class UserContextCache:
+    """
+    Resolved UserContext by X-User-uuid, kept for `ttl` seconds and for at
+    most `max_entries` users (least recently used first out). Profile or
+    location changes must call `invalidate` to be seen before the TTL runs out.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get(
+        self, user_uuid: str, resolve: Callable[[str], Awaitable[UserContext]]
+    ) -> UserContext:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_uuid)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_uuid)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        # Resolve outside the lock; failures are not cached
+        context = await resolve(user_uuid)
+        with self._lock:
+            self._entries[user_uuid] = (time.monotonic() + self.ttl, context)
+            self._entries.move_to_end(user_uuid)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return context
+
+    async def get_many(
+        self,
+        user_uuids: List[str],
+        resolve_many: Callable[[List[str]], Awaitable[Dict[str, UserContext]]],
+    ) -> Dict[str, UserContext]:
+        """
+        Like `get` for several users, resolving every miss in one call.
+        """
+        now = time.monotonic()
+        contexts = {}
+        with self._lock:
+            for user_uuid in user_uuids:
+                entry = self._entries.get(user_uuid)
+                if entry is not None and entry[0] > now:
+                    self._entries.move_to_end(user_uuid)
+                    self.hits += 1
+                    contexts[user_uuid] = entry[1]
+            missing = [user_uuid for user_uuid in user_uuids if user_uuid not in contexts]
+            self.misses += len(missing)
+        if not missing:
+            return contexts
+
+        resolved = await resolve_many(missing)
+        with self._lock:
+            expires = time.monotonic() + self.ttl
+            for user_uuid, context in resolved.items():
+                self._entries[user_uuid] = (expires, context)
+                self._entries.move_to_end(user_uuid)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return {**contexts, **resolved}
+
+    def invalidate(self, user_uuid: str):
+        with self._lock:
+            if self._entries.pop(user_uuid, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "ttl": self.ttl,
+            }
@@ -1,9 +1,15 @@
+import base64
 import math
+
+import numpy as np
+
 from models import Location
 
+EARTH_RADIUS = 6378137
+
 
 def calculate_distance(location1: Location, location2: Location) -> float:
-    R = 6378137
+    R = EARTH_RADIUS
 
     # Convert degrees to radians
     phi1 = math.radians(location1.latitude)
@@ -19,3 +25,72 @@ def calculate_distance(location1: Location, location2: Location) -> float:
 
     distance = R * c
     return distance
+
+
+def calculate_distance_matrix(
+    latitudes1, longitudes1, latitudes2, longitudes2
+) -> np.ndarray:
+    """
+    Haversine distance in meters between every point of the first set (N)
+    and every point of the second set (M), as an N x M array.
+    """
+    phi1 = np.radians(np.asarray(latitudes1, dtype=np.float64))[:, np.newaxis]
+    lambda1 = np.radians(np.asarray(longitudes1, dtype=np.float64))[:, np.newaxis]
+    phi2 = np.radians(np.asarray(latitudes2, dtype=np.float64))[np.newaxis, :]
+    lambda2 = np.radians(np.asarray(longitudes2, dtype=np.float64))[np.newaxis, :]
+
+    a = (
+        np.sin((phi2 - phi1) / 2) ** 2
+        + np.cos(phi1) * np.cos(phi2) * np.sin((lambda2 - lambda1) / 2) ** 2
+    )
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    return EARTH_RADIUS * c
+
+
+def calculate_distances(origin: Location, latitudes, longitudes) -> np.ndarray:
+    """
+    Haversine distance in meters from `origin` to each point given by the
+    `latitudes` and `longitudes` arrays.
+    """
+    return calculate_distance_matrix(
+        [origin.latitude], [origin.longitude], latitudes, longitudes
+    )[0]
+
+
+async def fetch_all_rows(build_query, page_size: int = 1000) -> list:
+    """
+    Run the query returned by `build_query()` one `range` page at a time, so
+    tables larger than the PostgREST row limit are read completely. The query
+    must have a stable order.
+    """
+    rows = []
+    start = 0
+    while True:
+        page = (await build_query().range(start, start + page_size - 1).execute()).data
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        start += page_size
+
+
+def image_extension(mime_type: str) -> str:
+    image_type = mime_type.split("/")[1]
+    if image_type == "jpeg":
+        image_type = "jpg"
+    elif image_type == "svg+xml":
+        image_type = "svg"
+    return image_type
+
+
+def decode_image(image: str):
+    """
+    Split a base64 encoded image complete with its header into its bytes,
+    mime type and file extension.
+    """
+    header, base64_image = image.split(",", 1)
+
+    data = base64.b64decode(base64_image)
+    mime_type = header.split(";")[0].split(":")[1]
+
+    return data, mime_type, image_extension(mime_type)
@@ -0,0 +1,203 @@
+import asyncio
+import os
+import sys
+import time
+
+from data_access import SnapshotFile, write_snapshot
+from data_access.catalog_snapshot import CATALOG_SETS, snapshot_meta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from catalog import Catalog
+from ratings import RatingAggregates
+
+
+class StubQuery:
+    def __init__(self, rows):
+        self.rows = rows
+        self.not_ = self
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
+
+    def gt(self, column, value):
+        self.rows = [row for row in self.rows if row[column] > value]
+        return self
+
+    def in_(self, column, values):
+        self.rows = [row for row in self.rows if row[column] in values]
+        return self
+
+    def range(self, start, end):
+        self.rows = self.rows[start:end + 1]
+        return self
+
+    async def execute(self):
+        return type("Response", (), {"data": self.rows})()
+
+
+class StubSupabase:
+    def __init__(self):
+        self.tables = {
+            "Restaurant": [restaurant_row(1, "2025-01-01T00:00:00")],
+            "Location": [location_row(1), location_row(2)],
+            "Menu": [menu_row(10, 1, "2025-01-01T00:00:00")],
+            "Rating": [{"id": 1, "menu": 10, "rating_value": 4}],
+        }
+
+    def table(self, name):
+        return StubQuery(list(self.tables[name]))
+
+
+def restaurant_row(restaurant_id, created_at):
+    return {
+        "id": restaurant_id,
+        "name": f"Restaurant {restaurant_id}",
+        "address": "KAIST",
+        "telephone": "042",
+        "image_url": None,
+        "location": restaurant_id,
+        "created_at": created_at,
+        "updated_at": created_at,
+    }
+
+
+def location_row(location_id, updated_at="2025-01-01T00:00:00"):
+    return {
+        "id": location_id,
+        "latitude": 36.37,
+        "longitude": 127.36,
+        "inside_kaist": True,
+        "created_at": updated_at,
+        "updated_at": updated_at,
+    }
+
+
+def menu_row(menu_id, restaurant_id, created_at):
+    return {
+        "id": menu_id,
+        "name": f"Menu {menu_id}",
+        "description": "",
+        "main_ingredients": [],
+        "price": 5000,
+        "image_url": None,
+        "restaurant": restaurant_id,
+        "created_at": created_at,
+        "updated_at": created_at,
+    }
+
+
+def test_load_and_refresh_picks_up_new_rows():
+    supabase = StubSupabase()
+    catalog = Catalog(RatingAggregates())
+    asyncio.run(catalog.ensure_fresh(supabase, max_staleness=60))
+    assert [restaurant.id for restaurant in catalog.restaurants()] == [1]
+    assert catalog.ratings.average(10) == 4
+
+    supabase.tables["Restaurant"].append(restaurant_row(2, "2025-01-02T00:00:00"))
+    supabase.tables["Menu"].append(menu_row(11, 2, "2025-01-02T00:00:00"))
+    asyncio.run(catalog.refresh(supabase))
+    assert [restaurant.id for restaurant in catalog.restaurants()] == [1, 2]
+    assert [menu["id"] for menu in catalog.menu_rows("2")] == [11]
+
+
+def test_refresh_picks_up_edits_and_deletes_made_elsewhere():
+    supabase = StubSupabase()
+    supabase.tables["Menu"].append(menu_row(11, 1, "2025-01-01T00:00:00"))
+    catalog = Catalog(RatingAggregates())
+    asyncio.run(catalog.load(supabase))
+
+    edited = {**menu_row(10, 1, "2025-01-01T00:00:00"), "price": 7000, "updated_at": "2025-01-02T00:00:00"}
+    moved = {**location_row(1, "2025-01-02T00:00:00"), "latitude": 36.0}
+    supabase.tables["Menu"] = [edited]
+    supabase.tables["Location"] = [moved, location_row(2)]
+    asyncio.run(catalog.refresh(supabase))
+    assert catalog.menu_row(10)["price"] == 7000
+    assert catalog.menu_row(11) is None
+    assert catalog.location(1).latitude == 36.0
+
+    # A row this service wrote after the ids were read is not a delete
+    catalog.put_menu(menu_row(12, 1, None))
+    supabase.tables["Restaurant"] = []
+    asyncio.run(catalog.refresh(supabase))
+    assert catalog.restaurant(1) is None
+    assert catalog.menu_rows(1) == []
+
+
+def test_rows_are_copies():
+    catalog = Catalog(RatingAggregates())
+    catalog.put_restaurant(restaurant_row(1, None), location_row(1))
+    catalog.put_menu(menu_row(10, 1, None))
+    catalog.menu_rows()[0]["restaurant"] = None
+    assert catalog.menu_row("10")["restaurant"] == 1
+
+
+def test_removing_a_restaurant_hides_its_menus():
+    catalog = Catalog(RatingAggregates())
+    catalog.put_restaurant(restaurant_row(1, None), location_row(1))
+    catalog.put_menu(menu_row(10, 1, None))
+    catalog.put_menu(menu_row(11, 2, None))
+    catalog.remove_restaurant(1)
+    assert catalog.restaurant(1) is None
+    assert catalog.menu_rows() == []
+
+
+def test_snapshot_file_is_swapped_in_and_keeps_newer_writes(tmp_path):
+    path = str(tmp_path / "catalog.snap")
+    tables = {
+        "Restaurant": [restaurant_row(1, "2025-01-01T00:00:00")],
+        "Location": [location_row(1), location_row(2)],
+        "Menu": [menu_row(10, 1, "2025-01-01T00:00:00")],
+    }
+    write_snapshot(path, tables, snapshot_meta(tables, time.time()), CATALOG_SETS)
+
+    supabase = StubSupabase()
+    catalog = Catalog(RatingAggregates(), SnapshotFile(path, check_interval=0))
+    asyncio.run(catalog.ensure_fresh(supabase, max_staleness=60))
+    assert [menu["id"] for menu in catalog.menu_rows(1)] == [10]
+
+    # Written by this worker after the snapshot was built
+    catalog.put_restaurant(restaurant_row(2, "2025-01-02T00:00:00"), location_row(2))
+    catalog.remove_menu(10)
+    supabase.tables["Restaurant"].append(restaurant_row(2, "2025-01-02T00:00:00"))
+    supabase.tables["Menu"] = []
+
+    tables["Restaurant"][0]["name"] = "Renamed"
+    write_snapshot(path, tables, snapshot_meta(tables, time.time() - 60), CATALOG_SETS)
+    asyncio.run(catalog.refresh(supabase))
+    assert catalog.restaurant(1).name == "Renamed"
+    assert [restaurant.id for restaurant in catalog.restaurants()] == [1, 2]
+    assert catalog.menu_rows(1) == []
+
+    # A snapshot built after those writes supersedes them
+    del tables["Menu"][0]
+    supabase.tables["Restaurant"] = list(tables["Restaurant"])
+    write_snapshot(path, tables, snapshot_meta(tables, time.time()), CATALOG_SETS)
+    asyncio.run(catalog.refresh(supabase))
+    assert [restaurant.id for restaurant in catalog.restaurants()] == [1]
+
+
+def test_ingredient_names_come_from_the_snapshot_and_overlay():
+    supabase = StubSupabase()
+    supabase.tables["Menu"][0]["main_ingredients"] = [{"name": "Pork  Belly", "description": ""}]
+    catalog = Catalog(RatingAggregates())
+    asyncio.run(catalog.ensure_fresh(supabase, max_staleness=60))
+    catalog.put_menu({**menu_row(11, 1, None), "main_ingredients": [{"name": "Kimchi", "description": ""}]})
+    assert catalog.ingredient_index().matching("pork belly", 0.9) >= {"pork belly"}
+    assert "kimchi" in catalog.ingredient_index().matching("kimchi", 0.9)
+
+
+def test_match_menus_filters_snapshot_and_overlay_menus():
+    supabase = StubSupabase()
+    supabase.tables["Menu"] = [
+        {**menu_row(10, 1, None), "main_ingredients": [{"name": "Pork", "description": ""}]},
+        {**menu_row(11, 1, None), "main_ingredients": [{"name": "Beef", "description": ""}]},
+        {**menu_row(12, 1, None), "price": 9000, "main_ingredients": [{"name": "Pork", "description": ""}]},
+    ]
+    catalog = Catalog(RatingAggregates())
+    asyncio.run(catalog.ensure_fresh(supabase, max_staleness=60))
+    catalog.put_menu({**menu_row(13, 1, None), "main_ingredients": [{"name": "pork", "description": ""}]})
+    catalog.remove_menu(10)
+
+    assert catalog.match_menus({1}, 0, 8000, {"beef"}, {"pork"}) == {1: [13]}
+    assert catalog.match_menus({1}, 0, 10000, set(), {"pork", "beef"}) == {1: [11, 12, 13]}
+    assert catalog.match_menus({2}, 0, 10000, set(), {"pork"}) == {}
@@ -0,0 +1,51 @@
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from cleanup import CleanupQueue
+from data_access import deadline, remaining
+
+
+def test_jobs_are_retried_until_they_succeed_or_give_up(caplog):
+    attempts = {"flaky": 0, "broken": 0}
+
+    async def flaky():
+        attempts["flaky"] += 1
+        if attempts["flaky"] < 3:
+            raise RuntimeError("storage unavailable")
+
+    async def broken():
+        attempts["broken"] += 1
+        raise RuntimeError("gone for good")
+
+    async def run():
+        queue = CleanupQueue(max_attempts=4, backoff=0.001)
+        queue.enqueue("flaky", flaky)
+        queue.enqueue("broken", broken)
+        await queue.stop()
+        return queue.metrics()
+
+    with caplog.at_level("ERROR", logger="cleanup"):
+        metrics = asyncio.run(run())
+    assert [record.getMessage() for record in caplog.records] == [
+        "Cleanup broken failed after 4 attempts: gone for good"
+    ]
+    assert attempts == {"flaky": 3, "broken": 4}
+    assert metrics == {"pending": 0, "completed": 1, "retried": 5, "failed": 1}
+
+
+def test_jobs_run_without_the_enqueuing_requests_deadline():
+    seen = []
+
+    async def job():
+        seen.append(remaining())
+
+    async def run():
+        queue = CleanupQueue()
+        with deadline(0):
+            queue.enqueue("job", job)
+        await queue.stop()
+
+    asyncio.run(run())
+    assert seen == [None]
@@ -0,0 +1,50 @@
+import io
+import os
+import sys
+
+from PIL import Image
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from images import render_variants, variant_names, variant_urls
+
+
+def png(width, height):
+    output = io.BytesIO()
+    Image.new("RGBA", (width, height), (200, 80, 40, 255)).save(output, "PNG")
+    return output.getvalue()
+
+
+def rendered_sizes(data):
+    sizes = {}
+    for variant, extension, _, rendered in render_variants(data):
+        with Image.open(io.BytesIO(rendered)) as image:
+            assert image.format == {"webp": "WEBP", "jpg": "JPEG"}[extension]
+            sizes[variant, extension] = image.size
+    return sizes
+
+
+def test_variants_fit_their_size_without_upscaling():
+    sizes = rendered_sizes(png(2000, 1000))
+    assert sizes["thumbnail", "webp"] == (160, 80)
+    assert sizes["medium", "jpg"] == (1024, 512)
+
+    sizes = rendered_sizes(png(300, 200))
+    assert sizes["thumbnail", "jpg"] == (160, 107)
+    assert sizes["small", "webp"] == sizes["medium", "webp"] == (300, 200)
+
+
+def test_variant_urls_derive_from_the_original():
+    url = "https://x/storage/v1/object/public/media/menu/abc-original.png?"
+    variants = variant_urls(url)
+    assert len(variants) == 6
+    assert variants[0] == {
+        "name": "thumbnail",
+        "format": "webp",
+        "max_size": 160,
+        "url": "https://x/storage/v1/object/public/media/menu/abc-thumbnail.webp?",
+    }
+    assert "abc-medium.jpg" in variant_names("abc-original.png")
+
+    # Images uploaded before variants existed have none
+    assert variant_urls("https://x/storage/v1/object/public/media/menu/abc.png?") is None
+    assert variant_names("abc.png") == []
@@ -0,0 +1,29 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from ingredients import IngredientIndex
+
+NAMES = [
+    "Pork", "pork belly", "Pork Belly Kimchi", "park", "beef", "ground beef",
+    "chicken", "fried chicken", "egg", "eggplant", "peanut butter", "soy sauce",
+]
+
+
+def test_matches_names_containing_the_term():
+    index = IngredientIndex(NAMES)
+    assert index.matching("pork", 0.5) == {"pork", "pork belly", "pork belly kimchi"}
+    assert index.matching("Peanut", 0.5) == {"peanut", "peanut butter"}
+    assert "eggplant" not in index.matching("egg", 0.5)
+
+
+def test_tolerates_misspellings():
+    index = IngredientIndex(NAMES)
+    assert {"chicken", "fried chicken"} <= index.matching("chiken", 0.45)
+    assert "chicken" not in index.matching("chiken", 0.6)
+
+
+def test_expand_keeps_unindexed_terms():
+    index = IngredientIndex(NAMES)
+    assert index.expand(["beef", "Tofu"], 0.5) == {"beef", "ground beef", "tofu"}
+    assert index.expand([], 0.5) == frozenset()
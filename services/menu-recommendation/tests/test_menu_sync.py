@@ -0,0 +1,60 @@
+import base64
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from menu_sync import DesiredMenu, image_digest, image_digest_from_url, plan_menu_sync
+from models import CreateMenuRequest
+
+PNG = "data:image/png;base64," + base64.b64encode(b"png bytes").decode()
+DIGEST = image_digest(b"png bytes")
+
+
+def request(name, price=5000, image=None):
+    return CreateMenuRequest(
+        name=name,
+        description="",
+        main_ingredients=[{"name": "rice", "description": ""}],
+        price=price,
+        image=image,
+    )
+
+
+def stored(menu_id, name, price=5000, image_url=None):
+    return {
+        "id": menu_id,
+        "name": name,
+        "description": "",
+        "main_ingredients": [{"name": "rice", "description": ""}],
+        "price": price,
+        "image_url": image_url,
+        "restaurant": 1,
+    }
+
+
+def test_plan_matches_menus_by_name_and_content():
+    plan = plan_menu_sync(
+        [stored(1, "kept"), stored(2, "repriced"), stored(3, "dropped")],
+        [
+            DesiredMenu.from_request(request("kept")),
+            DesiredMenu.from_request(request("repriced", price=6000)),
+            DesiredMenu.from_request(request("added")),
+        ],
+    )
+    assert [menu["id"] for menu in plan.unchanged] == [1]
+    assert [stored["id"] for stored, _ in plan.update] == [2]
+    assert [menu["id"] for menu in plan.delete] == [3]
+    assert [desired.request.name for desired in plan.insert] == ["added"]
+
+
+def test_images_compare_by_digest():
+    url = f"https://x/storage/v1/object/public/media/menu/{DIGEST}-original.png?"
+    assert image_digest_from_url(url) == DIGEST
+    desired = DesiredMenu.from_request(request("a", image=PNG))
+    assert plan_menu_sync([stored(1, "a", image_url=url)], [desired]).unchanged
+
+    # Images stored under a random name, or dropped from the request, are changes
+    random_url = "https://x/storage/v1/object/public/media/menu/0b1c-uuid.png?"
+    assert plan_menu_sync([stored(1, "a", image_url=random_url)], [desired]).update
+    no_image = DesiredMenu.from_request(request("a"))
+    assert plan_menu_sync([stored(1, "a", image_url=url)], [no_image]).update
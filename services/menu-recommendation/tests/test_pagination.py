@@ -0,0 +1,67 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from pagination import InvalidCursor, encode_cursor, paginate
+
+ROWS = [{"id": i, "price": price} for i, price in enumerate([300, 100, 200, 100, 300])]
+
+
+def walk(sort, order, limit):
+    pages, after = [], None
+    while True:
+        page, after = paginate(
+            ROWS, lambda row: row[sort], sort, order, after, limit
+        )
+        pages.append([row["id"] for row in page])
+        if after is None:
+            return pages
+
+
+def test_pages_follow_sort_key_then_id():
+    assert walk("price", "asc", 2) == [[1, 3], [2, 0], [4]]
+    assert walk("price", "desc", 2) == [[4, 0], [2, 3], [1]]
+
+
+def test_last_full_page_has_no_cursor():
+    assert walk("id", "asc", 5) == [[0, 1, 2, 3, 4]]
+
+
+def test_cursor_is_bound_to_its_sort():
+    cursor = encode_cursor("price", "asc", 100, 1)
+    with pytest.raises(InvalidCursor):
+        paginate(ROWS, lambda row: row["id"], "id", "asc", cursor, 2)
+    with pytest.raises(InvalidCursor):
+        paginate(ROWS, lambda row: row["id"], "id", "asc", "not-a-cursor", 2)
+
+
+def test_without_a_limit_every_row_is_returned():
+    page, after = paginate(ROWS, lambda row: row["price"], "price", "desc", None, None)
+    assert [row["id"] for row in page] == [4, 0, 2, 3, 1]
+    assert after is None
+
+
+def test_cursor_values_must_match_the_sort_key():
+    for cursor in [
+        encode_cursor("price", "desc", "x", 1),
+        encode_cursor("price", "desc", True, 1),
+        encode_cursor("price", "desc", 100, "1"),
+        encode_cursor("price", "desc", 100, 1.5),
+    ]:
+        with pytest.raises(InvalidCursor):
+            paginate(ROWS, lambda row: row["price"], "price", "desc", cursor, 2)
+
+
+def test_rows_without_a_sort_value_come_last():
+    rows = [{"id": 0, "price": None}, {"id": 1, "price": 200}, {"id": 2, "price": None}]
+    pages, after = [], None
+    while True:
+        page, after = paginate(rows, lambda row: row["price"], "price", "asc", after, 1)
+        pages.append([row["id"] for row in page])
+        if after is None:
+            break
+    assert pages == [[1], [0], [2]]
+    page, _ = paginate(rows, lambda row: row["price"], "price", "desc", None, None)
+    assert [row["id"] for row in page] == [2, 0, 1]
@@ -0,0 +1,208 @@
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from catalog import Catalog
+from models import Location, MenuFilter
+from planner import plan_group_matches, plan_matches
+from ratings import RatingAggregates
+from utils import calculate_distance
+
+KAIST = Location(latitude=36.3721, longitude=127.3604)
+
+
+def test_bounding_box_contains_search_circle():
+    plan = plan_matches(MenuFilter(distance_max=1000), KAIST)
+    for latitude, longitude in [
+        (plan.latitude_min, KAIST.longitude),
+        (plan.latitude_max, KAIST.longitude),
+        (KAIST.latitude, plan.longitude_min),
+        (KAIST.latitude, plan.longitude_max),
+    ]:
+        edge = Location(latitude=latitude, longitude=longitude)
+        assert calculate_distance(KAIST, edge) >= 1000
+
+
+def test_kaist_predicate():
+    assert plan_matches(MenuFilter(), KAIST).inside_kaist is None
+    assert plan_matches(MenuFilter(outside_kaist=False), KAIST).inside_kaist is True
+    assert plan_matches(MenuFilter(inside_kaist=False), KAIST).inside_kaist is False
+    assert plan_matches(MenuFilter(inside_kaist=False, outside_kaist=False), KAIST).empty
+
+
+def test_contradictory_bounds_are_empty():
+    assert plan_matches(MenuFilter(price_min=10, price_max=5), KAIST).empty
+    assert plan_matches(MenuFilter(distance_min=10, distance_max=5), KAIST).empty
+    assert not plan_matches(MenuFilter(), KAIST).empty
+
+
+def make_catalog():
+    catalog = Catalog(RatingAggregates())
+    for restaurant_id, (offset, inside_kaist) in enumerate(
+        [(0.05, False), (0.005, True), (0.0, True), (0.004, False)]
+    ):
+        catalog.put_restaurant(
+            {"id": restaurant_id, "location": 100 + restaurant_id},
+            {
+                "id": 100 + restaurant_id,
+                "latitude": KAIST.latitude + offset,
+                "longitude": KAIST.longitude,
+                "inside_kaist": inside_kaist,
+            },
+        )
+    return catalog
+
+
+def test_nearby_restaurants_sorted_by_distance():
+    plan = plan_matches(MenuFilter(distance_min=100, distance_max=1000), KAIST)
+    nearby = plan.nearby_restaurants(make_catalog())
+    assert [restaurant_id for restaurant_id, _ in nearby] == [3, 1]
+    assert abs(nearby[1][1] - 556.6) < 1
+
+
+def test_nearby_restaurants_kaist_predicate():
+    plan = plan_matches(MenuFilter(outside_kaist=False, distance_max=1000), KAIST)
+    nearby = plan.nearby_restaurants(make_catalog())
+    assert [restaurant_id for restaurant_id, _ in nearby] == [2, 1]
+
+
+def test_rating_range_keeps_unrated_menus():
+    plan = plan_matches(MenuFilter(rating_min=3, rating_max=4), KAIST)
+    assert plan.accepts_rating({"count": 0, "sum": 0, "average": 0})
+    assert plan.accepts_rating({"count": 2, "sum": 7, "average": 3.5})
+    assert not plan.accepts_rating({"count": 1, "sum": 5, "average": 5.0})
+
+
+def test_group_keeps_restaurants_every_member_is_within_range_of():
+    north = Location(latitude=KAIST.latitude + 0.008, longitude=KAIST.longitude)
+    plan = plan_group_matches(MenuFilter(distance_max=700), [KAIST, north])
+    assert plan.plan.latitude_min > plan_matches(MenuFilter(distance_max=700), KAIST).latitude_min
+    restaurant_ids, distances = plan.nearby_restaurants(make_catalog())
+    assert sorted(restaurant_ids.tolist()) == [1, 3]
+    assert distances.shape == (2, 2)
+    assert (distances <= 700).all()
+
+
+def test_group_without_a_common_area_is_empty():
+    far = Location(latitude=KAIST.latitude + 0.1, longitude=KAIST.longitude)
+    assert plan_group_matches(MenuFilter(distance_max=1000), [KAIST, far]).empty
+
+
+def test_grid_only_returns_restaurants_in_cells_around_the_box():
+    catalog = make_catalog()
+    # Far enough apart that the search box covers fewer cells than are occupied
+    for restaurant_id in range(10, 1010):
+        catalog.put_restaurant(
+            {"id": restaurant_id, "location": 10000 + restaurant_id},
+            {
+                "id": 10000 + restaurant_id,
+                "latitude": KAIST.latitude + 0.1 + restaurant_id % 40 * 0.02,
+                "longitude": KAIST.longitude + restaurant_id // 40 * 0.02,
+                "inside_kaist": False,
+            },
+        )
+    grid = catalog.spatial_index()
+    assert grid is catalog.spatial_index()
+    plan = plan_matches(MenuFilter(distance_max=1000), KAIST)
+    nearby = grid.within_box(
+        plan.latitude_min, plan.latitude_max, plan.longitude_min, plan.longitude_max
+    )
+    assert sorted(int(grid.coordinates[0][i]) for i in nearby) == [1, 2, 3]
+    assert [restaurant_id for restaurant_id, _ in plan.nearby_restaurants(catalog)] == [2, 3, 1]
+
+    catalog.remove_restaurant(3)
+    assert catalog.spatial_index() is not grid
+    assert len(catalog.spatial_index()) == 1003
+
+
+class StubQuery:
+    """
+    Evaluates the predicates the way PostgREST would, recording each one.
+    """
+
+    def __init__(self, table, rows, calls):
+        self.rows = rows
+        self.calls = calls
+        self.table = table
+
+    def _filter(self, name, column, value, keep):
+        self.calls.append((self.table, name, column))
+        self.rows = [row for row in self.rows if keep(row[column], value)]
+        return self
+
+    def select(self, *args):
+        return self
+
+    def order(self, *args):
+        return self
+
+    def gte(self, column, value):
+        return self._filter("gte", column, value, lambda a, b: a >= b)
+
+    def lte(self, column, value):
+        return self._filter("lte", column, value, lambda a, b: a <= b)
+
+    def eq(self, column, value):
+        return self._filter("eq", column, value, lambda a, b: a == b)
+
+    def in_(self, column, values):
+        return self._filter("in", column, values, lambda a, b: a in b)
+
+    def range(self, start, end):
+        self.rows = self.rows[start:end + 1]
+        return self
+
+    async def execute(self):
+        return type("Response", (), {"data": self.rows})()
+
+
+class StubSupabase:
+    def __init__(self, tables):
+        self.tables = tables
+        self.calls = []
+
+    def table(self, name):
+        return StubQuery(name, list(self.tables[name]), self.calls)
+
+
+def test_fetch_catalog_pushes_the_predicates_down():
+    tables = {"Restaurant": [], "Location": [], "Menu": [], "Rating": []}
+    for restaurant_id, (offset, inside_kaist) in enumerate(
+        [(0.05, False), (0.005, True), (0.0, True), (0.004, False)]
+    ):
+        tables["Location"].append(
+            {
+                "id": 100 + restaurant_id,
+                "latitude": KAIST.latitude + offset,
+                "longitude": KAIST.longitude,
+                "inside_kaist": inside_kaist,
+            }
+        )
+        tables["Restaurant"].append({"id": restaurant_id, "location": 100 + restaurant_id})
+        for price in (3000, 9000):
+            tables["Menu"].append(
+                {
+                    "id": restaurant_id * 10 + price // 3000,
+                    "restaurant": restaurant_id,
+                    "price": price,
+                    "main_ingredients": [{"name": "Pork"}],
+                }
+            )
+    tables["Rating"] = [
+        {"id": 1, "menu": 11, "rating_value": 4},
+        {"id": 2, "menu": 0, "rating_value": 1},
+    ]
+    supabase = StubSupabase(tables)
+
+    plan = plan_matches(
+        MenuFilter(distance_min=100, distance_max=1000, outside_kaist=False, price_max=5000),
+        KAIST,
+    )
+    catalog = asyncio.run(plan.fetch_catalog(supabase))
+    assert [restaurant_id for restaurant_id, _ in plan.nearby_restaurants(catalog)] == [1]
+    assert catalog.match_menus({1}, 0, 5000, set(), {"pork"}) == {1: [11]}
+    assert catalog.ratings.stats(11)["count"] == 1
+    assert ("Location", "eq", "inside_kaist") in supabase.calls
+    assert ("Menu", "lte", "price") in supabase.calls
+    assert ("Rating", "in", "menu") in supabase.calls
@@ -0,0 +1,44 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+import numpy as np
+
+from models import GroupMatchRanking, MatchRanking
+from ranking import composite_score, group_distances, group_score, top_k
+
+
+def test_default_ranking_is_nearest_first():
+    ranking = MatchRanking()
+    candidates = [
+        (composite_score(ranking, distance, 1000, rating, matches), distance, i)
+        for i, (distance, rating, matches) in enumerate([(500, 5, 4), (100, 1, 1), (900, 3, 2)])
+    ]
+    assert [c[2] for c in top_k(candidates, None)] == [1, 0, 2]
+
+
+def test_weights_and_limit():
+    ranking = MatchRanking(distance_weight=0, rating_weight=1, food_matches_weight=1, limit=2)
+    candidates = [
+        (composite_score(ranking, distance, 1000, rating, matches), distance, i)
+        for i, (distance, rating, matches) in enumerate(
+            [(500, 5, 4), (100, 1, 1), (900, 5, 4), (50, 3, 2)]
+        )
+    ]
+    # 0 and 2 tie on score; the nearer one ranks first
+    assert [c[2] for c in top_k(candidates, ranking.limit)] == [0, 2]
+    assert composite_score(ranking, 0, 1000, 5, 1) == 1.5
+
+
+def test_group_distance_is_the_max_or_the_total_over_members():
+    distances = np.array([[100.0, 400.0], [700.0, 400.0]])
+    assert group_distances(GroupMatchRanking(), distances).tolist() == [700.0, 400.0]
+    assert group_distances(GroupMatchRanking(objective="total"), distances).tolist() == [800.0, 800.0]
+
+
+def test_group_score_adds_coverage_to_the_members_closeness():
+    ranking = GroupMatchRanking(objective="total")
+    assert group_score(ranking, 800, 2, 1000, 0, 1, 0.5) == 0.6 + 0.5
+    assert group_score(GroupMatchRanking(coverage_weight=0), 700, 2, 1000, 0, 1, 1.0) == composite_score(
+        ranking, 700, 1000, 0, 1
+    )
@@ -0,0 +1,55 @@
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+import ratings
+from ratings import RatingAggregates
+
+
+class StubQuery:
+    def __init__(self, rows):
+        self.rows = rows
+        self.not_ = self
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
+
+    def range(self, start, end):
+        self.page = self.rows[start:end + 1]
+        return self
+
+    async def execute(self):
+        return type("Response", (), {"data": self.page})()
+
+
+class StubSupabase:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def table(self, name):
+        return StubQuery(self.rows)
+
+
+def test_add_and_remove_menu():
+    aggregates = RatingAggregates()
+    aggregates.add(1, 4)
+    aggregates.add(1, 5)
+    aggregates.add(2, 1)
+    assert aggregates.stats(1) == {"count": 2, "sum": 9, "average": 4.5}
+    aggregates.remove_menu(1)
+    assert aggregates.stats(1) == {"count": 0, "sum": 0, "average": 0}
+    assert aggregates.averages([1, 2]) == {1: 0, 2: 1.0}
+
+
+def test_rebuild_pages_through_all_ratings(monkeypatch):
+    monkeypatch.setattr(ratings, "RECONCILE_PAGE_SIZE", 2)
+    rows = [{"id": i, "menu": i % 2, "rating_value": i} for i in range(1, 6)]
+    aggregates = RatingAggregates()
+    aggregates.add(7, 5)
+    asyncio.run(aggregates.ensure_loaded(StubSupabase(rows)))
+    assert aggregates.loaded
+    assert aggregates.stats(1) == {"count": 3, "sum": 9, "average": 3.0}
+    assert aggregates.stats(0) == {"count": 2, "sum": 6, "average": 3.0}
+    # Drift from before the rebuild is discarded
+    assert aggregates.stats(7)["count"] == 0
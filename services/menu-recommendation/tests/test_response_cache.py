@@ -0,0 +1,56 @@
+import gzip
+import os
+import sys
+
+import brotli
+from starlette.requests import Request
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from response_cache import ResponseCache, negotiate_encoding
+
+BODY = b'{"items":[' + b",".join(b'{"id":%d}' % i for i in range(100)) + b"]}"
+
+
+def request(query=b"", **headers):
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/menu",
+        "query_string": query,
+        "headers": [(k.replace("_", "-").encode(), v.encode()) for k, v in headers.items()],
+    })
+
+
+def test_renders_once_per_version_and_query():
+    cache, renders = ResponseCache(), []
+
+    def render():
+        renders.append(1)
+        return BODY
+
+    cache.get(request(b"limit=2&sort=id"), (1, 0), render)
+    cache.get(request(b"sort=id&limit=2"), (1, 0), render)
+    cache.get(request(b"limit=3"), (1, 0), render)
+    cache.get(request(b"limit=2&sort=id"), (2, 0), render)
+    assert len(renders) == 3
+    assert cache.metrics()["size"] == 1
+
+
+def test_compressed_variants_and_conditional_requests():
+    rendered = ResponseCache().get(request(), (1, 0), lambda: BODY)
+
+    response = rendered.respond(request(accept_encoding="gzip, br"))
+    assert response.headers["content-encoding"] == "br"
+    assert brotli.decompress(response.body) == BODY
+
+    response = rendered.respond(request(accept_encoding="gzip"))
+    assert gzip.decompress(response.body) == BODY
+
+    response = rendered.respond(request(if_none_match=rendered.etag))
+    assert response.status_code == 304
+    assert response.body == b""
+
+
+def test_negotiate_encoding():
+    assert negotiate_encoding("gzip;q=1.0, br;q=0") == "gzip"
+    assert negotiate_encoding("deflate") == "identity"
@@ -0,0 +1,100 @@
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from tracing import JsonlExporter, QueryBudgetExceeded, TracedClient, Tracer, unbudgeted
+
+
+class StubQuery:
+    def __init__(self, rows):
+        self.rows = rows
+        self.not_ = self
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
+
+    async def execute(self):
+        return type("Response", (), {"data": self.rows})()
+
+
+class StubSupabase:
+    auth = type("Auth", (), {"admin": None})()
+    storage = None
+
+    def table(self, name):
+        return StubQuery([{"id": 1}, {"id": 2}])
+
+
+def test_spans_record_table_filters_and_rows():
+    client = TracedClient(StubSupabase())
+    tracer = Tracer()
+
+    async def run():
+        with tracer.trace("GET", "/menu/1") as trace:
+            await client.table("Menu").select("*").eq("id", 1).execute()
+            await client.table("Rating").select("id").not_.is_("menu", "null").in_(
+                "menu", [1, 2, 3]
+            ).execute()
+            tracer.finish(trace, "/menu/{menu_id}", 200)
+        return trace
+
+    trace = asyncio.run(run())
+    assert [(s.operation, s.target, s.filters, s.rows) for s in trace.spans] == [
+        ("select", "Menu", ["eq('id', 1)"], 2),
+        ("select", "Rating", ["not_", "is_('menu', 'null')", "in_('menu', [3 values])"], 2),
+    ]
+    assert trace.queries == 2
+
+
+def test_calls_outside_a_request_are_not_recorded():
+    client = TracedClient(StubSupabase())
+    result = asyncio.run(client.table("Menu").select("*").execute())
+    assert len(result.data) == 2
+
+
+def test_query_budget(caplog):
+    client = TracedClient(StubSupabase())
+
+    async def run(tracer):
+        with tracer.trace("GET", "/restaurant") as trace:
+            with unbudgeted():
+                await client.table("Restaurant").select("*").execute()
+            await client.table("Menu").select("*").execute()
+            await client.table("Menu").select("*").execute()
+            tracer.finish(trace, "/restaurant", 200)
+        return trace
+
+    trace = asyncio.run(run(Tracer(budgets={"GET /restaurant": 2})))
+    assert len(trace.spans) == 3 and trace.queries == 2
+
+    tracer = Tracer(budgets={"GET /restaurant": 1})
+    with caplog.at_level("WARNING", logger="tracing"):
+        asyncio.run(run(tracer))
+    assert tracer.over_budget == 1
+    assert "GET /restaurant made 2 queries" in caplog.records[0].getMessage()
+
+    with pytest.raises(QueryBudgetExceeded):
+        asyncio.run(run(Tracer(budgets={"GET /restaurant": 1}, enforce=True)))
+
+
+def test_jsonl_export(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    client = TracedClient(StubSupabase())
+
+    async def run():
+        tracer = Tracer(JsonlExporter(str(path)))
+        for menu_id in (1, 2):
+            with tracer.trace("GET", f"/menu/{menu_id}") as trace:
+                await client.table("Menu").select("*").eq("id", menu_id).execute()
+                tracer.finish(trace, "/menu/{menu_id}", 200)
+        await tracer.close()
+
+    asyncio.run(run())
+    traces = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [trace["path"] for trace in traces] == ["/menu/1", "/menu/2"]
+    assert traces[0]["route"] == "/menu/{menu_id}"
+    assert traces[0]["spans"][0]["target"] == "Menu"
@@ -0,0 +1,66 @@
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from models import Location
+from users import UserContext, UserContextCache
+
+
+class CountingResolver:
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self, user_uuid):
+        self.calls += 1
+        return UserContext(
+            user_id=user_uuid,
+            dietary_preferences=frozenset({"pork"}),
+            current_location=Location(latitude=36.37, longitude=127.36),
+        )
+
+
+def test_hits_until_invalidated():
+    cache, resolve = UserContextCache(ttl=60), CountingResolver()
+    for _ in range(3):
+        assert asyncio.run(cache.get("u1", resolve)).user_id == "u1"
+    assert resolve.calls == 1
+
+    cache.invalidate("u1")
+    asyncio.run(cache.get("u1", resolve))
+    assert resolve.calls == 2
+    metrics = cache.metrics()
+    assert (metrics["hits"], metrics["misses"], metrics["invalidations"]) == (2, 2, 1)
+    assert metrics["hit_rate"] == 0.5
+
+
+def test_expired_and_evicted_entries_are_resolved_again():
+    resolve = CountingResolver()
+    expired = UserContextCache(ttl=0)
+    asyncio.run(expired.get("u1", resolve))
+    asyncio.run(expired.get("u1", resolve))
+    assert resolve.calls == 2
+
+    bounded = UserContextCache(ttl=60, max_entries=1)
+    asyncio.run(bounded.get("u1", resolve))
+    asyncio.run(bounded.get("u2", resolve))
+    asyncio.run(bounded.get("u1", resolve))
+    assert resolve.calls == 5
+    assert bounded.metrics()["size"] == 1
+
+
+def test_get_many_resolves_only_the_misses_in_one_call():
+    cache, resolve = UserContextCache(ttl=60), CountingResolver()
+    asyncio.run(cache.get("u1", resolve))
+    batches = []
+
+    async def resolve_many(user_uuids):
+        batches.append(user_uuids)
+        return {user_uuid: await resolve(user_uuid) for user_uuid in user_uuids}
+
+    contexts = asyncio.run(cache.get_many(["u1", "u2", "u3"], resolve_many))
+    assert sorted(contexts) == ["u1", "u2", "u3"]
+    assert batches == [["u2", "u3"]]
+    asyncio.run(cache.get_many(["u2", "u3"], resolve_many))
+    assert len(batches) == 1
+    assert cache.metrics()["hits"] == 3
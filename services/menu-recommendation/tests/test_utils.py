@@ -0,0 +1,44 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from models import Location
+from utils import calculate_distance, calculate_distances, calculate_distance_matrix
+
+
+def random_coordinates(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(-80, 80, count), rng.uniform(-180, 180, count)
+
+
+def test_calculate_distances_matches_scalar():
+    latitudes, longitudes = random_coordinates(500)
+    origin = Location(latitude=36.3721, longitude=127.3604)
+    expected = [
+        calculate_distance(origin, Location(latitude=lat, longitude=lon))
+        for lat, lon in zip(latitudes, longitudes)
+    ]
+    np.testing.assert_allclose(
+        calculate_distances(origin, latitudes, longitudes), expected, rtol=1e-9, atol=1e-6
+    )
+
+
+def test_calculate_distance_matrix_matches_scalar():
+    latitudes1, longitudes1 = random_coordinates(7, seed=1)
+    latitudes2, longitudes2 = random_coordinates(11, seed=2)
+    matrix = calculate_distance_matrix(latitudes1, longitudes1, latitudes2, longitudes2)
+    assert matrix.shape == (7, 11)
+    for i in range(7):
+        for j in range(11):
+            expected = calculate_distance(
+                Location(latitude=latitudes1[i], longitude=longitudes1[i]),
+                Location(latitude=latitudes2[j], longitude=longitudes2[j]),
+            )
+            assert abs(matrix[i, j] - expected) < 1e-6
+
+
+def test_calculate_distances_empty():
+    origin = Location(latitude=36.3721, longitude=127.3604)
+    assert calculate_distances(origin, [], []).shape == (0,)
@@ -0,0 +1,137 @@
+from typing import Annotated, Literal
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from data_access import deadline, supabase_errors
+from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
+
+from recipe.utils import supabase
+
+router = APIRouter()
+
+EXPORT_BATCH_SIZE = 1000
+
+_name_desc = pa.list_(pa.struct([("name", pa.string()), ("description", pa.string())]))
+
+EXPORT_SCHEMAS = {
+    "recipe": pa.schema([
+        ("id", pa.int64()),
+        ("name", pa.string()),
+        ("description", pa.string()),
+        ("ingredients", _name_desc),
+        ("tools", _name_desc),
+        ("instructions", pa.list_(pa.string())),
+        ("estimated_price", pa.float64()),
+        ("estimated_time", pa.string()),
+        ("image_url", pa.string()),
+    ]),
+    "rating": pa.schema([
+        ("id", pa.int64()),
+        ("recipe", pa.int64()),
+        ("user", pa.string()),
+        ("rating_value", pa.int64()),
+        ("comment_text", pa.string()),
+    ]),
+}
+
+_TABLES = {"recipe": "Recipe", "rating": "Rating"}
+# Rows of the table that belong to the export; Rating also holds menu ratings
+_FILTERS = {"rating": lambda query: query.not_.is_("recipe", "null")}
+_MEDIA_TYPES = {"arrow": "application/vnd.apache.arrow.file", "parquet": "application/vnd.apache.parquet"}
+
+
+class _ChunkSink:
+    """Write-only file object whose buffered bytes are drained after every batch."""
+
+    closed = False
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def fetch_batches(table: str, batch_size: int = EXPORT_BATCH_SIZE, where=None):
+    """Yield the rows of ``table`` in id order, one keyset-paginated page at a time.
+
+    ``where`` narrows the query builder to the exported rows. The pages are streamed
+    for as long as the export takes, so they are fetched without the request's deadline.
+    """
+    last_id = None
+    while True:
+        query = supabase.table(table).select("*").order("id").limit(batch_size)
+        if where is not None:
+            query = where(query)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        with deadline(None):
+            rows = query.execute().data or []
+        if rows:
+            yield rows
+        if len(rows) < batch_size:
+            return
+        last_id = rows[-1]["id"]
+
+
+def to_record_batch(rows, schema: pa.Schema) -> pa.RecordBatch:
+    columns = {name: [row.get(name) for row in rows] for name in schema.names}
+    return pa.RecordBatch.from_pydict(columns, schema=schema)
+
+
+def stream_columnar(batches, schema: pa.Schema, export_format: str):
+    """Encode row batches as an Arrow IPC file or a Parquet file, yielding bytes as they are written."""
+    sink = _ChunkSink()
+    if export_format == "parquet":
+        writer = pq.ParquetWriter(sink, schema)
+    else:
+        writer = pa.ipc.new_file(sink, schema)
+    try:
+        for rows in batches:
+            writer.write_batch(to_record_batch(rows, schema))
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+@router.get("/recipe/export")
+def export_catalog(
+    export_format: Annotated[Literal["arrow", "parquet"], Query(alias="format")] = "arrow",
+    table: Literal["recipe", "rating"] = "recipe",
+):
+    batches = fetch_batches(_TABLES[table], where=_FILTERS.get(table))
+    # Pull the first page eagerly so Supabase errors still map to an HTTP status
+    with supabase_errors():
+        first = next(batches, [])
+
+    def all_batches():
+        if first:
+            yield first
+        yield from batches
+
+    return StreamingResponse(
+        stream_columnar(all_batches(), EXPORT_SCHEMAS[table], export_format),
+        media_type=_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{table}.{export_format}"'},
+    )
@@ -0,0 +1,13 @@
+from recipe.matching import cookable_view
+from recipe.similarity import similarity_index, recipe_tokens
+
+
+def on_recipe_saved(recipe: dict):
+    """Propagate a created or updated Recipe row to the in-memory indexes."""
+    similarity_index.insert(recipe["id"], recipe_tokens(recipe))
+    cookable_view.upsert_recipe(recipe)
+
+
+def on_recipe_deleted(recipe_id: int):
+    similarity_index.remove(recipe_id)
+    cookable_view.remove_recipe(recipe_id)
@@ -1,13 +1,19 @@
 import sys
 import os
 
+from data_access import install_deadline, install_error_handlers
 from fastapi import FastAPI
 from fastapi.responses import JSONResponse
 
 from recipe.crud_endpoints import router as crud_router
 from recipe.recommendation_endpoints import router as rec_router
+from recipe.export_endpoints import router as export_router
+from recipe.utils import REQUEST_DEADLINE_SECONDS
 
 app = FastAPI(title="Recipe Recommendation Service")
+install_error_handlers(app)
+install_deadline(app, REQUEST_DEADLINE_SECONDS)
 
 app.include_router(rec_router)
+app.include_router(export_router)
 app.include_router(crud_router)
@@ -0,0 +1,284 @@
+import threading
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from recipe.utils import extract_names
+
+
+@dataclass
+class Pantry:
+    restrictions: set = field(default_factory=set)
+    tools: set = field(default_factory=set)
+    ingredients: set = field(default_factory=set)
+
+    @classmethod
+    def from_profile(cls, profile: dict) -> "Pantry":
+        return cls(
+            restrictions=extract_names(profile.get("dietary_restrictions", {})),
+            tools=extract_names(profile.get("available_tools", {})),
+            ingredients=extract_names(profile.get("available_ingredients", {})),
+        )
+
+    @classmethod
+    def pool(cls, pantries) -> "Pantry":
+        """A group's pantry: everyone's restrictions, everyone's tools and ingredients."""
+        pooled = cls()
+        for pantry in pantries:
+            pooled.restrictions |= pantry.restrictions
+            pooled.tools |= pantry.tools
+            pooled.ingredients |= pantry.ingredients
+        return pooled
+
+    def usage(self, ingredients: set) -> float:
+        """The share of this pantry's ingredients that a recipe uses."""
+        if not self.ingredients:
+            return 0.0
+        return len(self.ingredients & ingredients) / len(self.ingredients)
+
+    def can_cook(self, ingredients: set, tools: set) -> bool:
+        return (
+            not self.restrictions & ingredients
+            and tools <= self.tools
+            and ingredients <= self.ingredients
+        )
+
+
+class CookableView:
+    """Materialized per-user "cookable now" recipe sets.
+
+    A user is materialized the first time their matches are requested. After that a
+    recipe write only re-checks the users whose pantry holds every ingredient of the
+    recipe (found through ``_users_by_ingredient``) plus the users that matched it
+    before, and a profile change recomputes that single user.
+
+    Recipes either live in ``_recipes`` or, once ``load_snapshot`` is called, in the
+    mapped catalog snapshot shared by every worker; ``_recipes`` then only holds the
+    rows this worker wrote since the snapshot was built (``None`` for a removed one).
+    Every load bumps ``generation``, so indexes built from the recipes can tell they
+    are stale. A user's match set is only served for the pantry it was computed from.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._recipes = {}
+        self._written_at = {}
+        self.snapshot = None
+        self._table = None
+        self._pantries = {}
+        self._matches = {}
+        self._matched_by = {}
+        self._users_by_ingredient = {}
+        self.loaded = False
+        self.loaded_at = 0.0
+        self.generation = 0
+
+    def age(self) -> float:
+        return time.monotonic() - self.loaded_at if self.loaded else float("inf")
+
+    def load_recipes(self, recipes, fetched_at: float = 0.0):
+        """Replace the recipes with ``recipes``, keeping the local writes made after ``fetched_at``.
+
+        Match sets were computed against the previous recipes, so every user is
+        materialized again on their next request.
+        """
+        with self._lock:
+            later = {
+                recipe_id: self._recipes.get(recipe_id)
+                for recipe_id, written_at in self._written_at.items()
+                if written_at >= fetched_at
+            }
+            self._recipes = {}
+            for recipe in recipes:
+                self._store_recipe(recipe)
+            for recipe_id, recipe in later.items():
+                if recipe is None:
+                    self._recipes.pop(recipe_id, None)
+                else:
+                    self._recipes[recipe_id] = recipe
+            self._written_at = {
+                recipe_id: self._written_at[recipe_id] for recipe_id in later
+            }
+            self._clear_users()
+            self._loaded()
+
+    def load_snapshot(self, snapshot):
+        """Use the snapshot's recipes, keeping only the local writes made after it was built.
+
+        Match sets were computed against the previous recipes, so every user is
+        materialized again on their next request.
+        """
+        built_at = snapshot.meta.get("built_at", 0.0)
+        with self._lock:
+            for recipe_id, written_at in list(self._written_at.items()):
+                if written_at < built_at:
+                    del self._written_at[recipe_id]
+                    self._recipes.pop(recipe_id, None)
+            if self._table is None:
+                # A recipe deleted since then is kept as None, hiding the snapshot's row
+                self._recipes = {
+                    recipe_id: self._recipes.get(recipe_id) for recipe_id in self._written_at
+                }
+            self.snapshot = snapshot
+            self._table = snapshot.table("Recipe")
+            self._clear_users()
+            self._loaded()
+
+    def recipes(self):
+        with self._lock:
+            recipes = [recipe for recipe in self._recipes.values() if recipe is not None]
+            if self._table is None:
+                return recipes
+            mask = ~np.isin(self._table.column("id"), list(self._recipes))
+            return self._table.rows(np.flatnonzero(mask)) + recipes
+
+    def cookable(self, pantry: Pantry):
+        """The recipes ``pantry`` can cook; snapshot recipes are filtered on their id sets."""
+        with self._lock:
+            recipes = [
+                recipe for recipe in self._recipes.values()
+                if recipe is not None and pantry.can_cook(*_names(recipe))
+            ]
+            if self._table is None:
+                return recipes
+            table, snapshot = self._table, self.snapshot
+            mask = table.rows_within("ingredients", snapshot.string_ids(pantry.ingredients))
+            mask &= table.rows_within("tools", snapshot.string_ids(pantry.tools))
+            if pantry.restrictions:
+                mask &= ~table.rows_with_any("ingredients", snapshot.string_ids(pantry.restrictions))
+            mask &= ~np.isin(table.column("id"), list(self._recipes))
+            return table.rows(np.flatnonzero(mask)) + recipes
+
+    def matches(self, user_id: str, pantry: Pantry = None):
+        """The user's cookable recipes, or ``None`` if the user is not materialized
+        or was materialized for a pantry other than ``pantry``."""
+        with self._lock:
+            recipe_ids = self._matches.get(user_id)
+            if recipe_ids is None:
+                return None
+            if pantry is not None and self._pantries[user_id] != pantry:
+                return None
+            return [self._recipe(recipe_id) for recipe_id in recipe_ids]
+
+    def materialize(self, user_id: str, pantry: Pantry, recipes):
+        """Store ``recipes`` as the full match set of ``user_id``, replacing any previous one."""
+        with self._lock:
+            self._drop_user(user_id)
+            self._pantries[user_id] = pantry
+            for ingredient in pantry.ingredients:
+                self._users_by_ingredient.setdefault(ingredient, set()).add(user_id)
+            self._matches[user_id] = dict.fromkeys(recipe["id"] for recipe in recipes)
+            for recipe in recipes:
+                self._matched_by.setdefault(recipe["id"], set()).add(user_id)
+
+    def invalidate_user(self, user_id: str):
+        with self._lock:
+            self._drop_user(user_id)
+
+    def upsert_recipe(self, recipe: dict):
+        with self._lock:
+            if not self.loaded:
+                return
+            ingredients, tools = self._store_recipe(recipe)
+            self._written_at[recipe["id"]] = time.time()
+            candidates = self._users_holding(ingredients)
+            for user_id in candidates | self._matched_by.get(recipe["id"], set()):
+                if user_id in candidates and self._pantries[user_id].can_cook(ingredients, tools):
+                    self._matches[user_id][recipe["id"]] = None
+                    self._matched_by.setdefault(recipe["id"], set()).add(user_id)
+                else:
+                    self._matches[user_id].pop(recipe["id"], None)
+                    self._forget_match(user_id, recipe["id"])
+
+    def remove_recipe(self, recipe_id: int):
+        with self._lock:
+            if self._table is None:
+                self._recipes.pop(recipe_id, None)
+            else:
+                self._recipes[recipe_id] = None
+            self._written_at[recipe_id] = time.time()
+            for user_id in self._matched_by.pop(recipe_id, set()):
+                self._matches[user_id].pop(recipe_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._recipes.clear()
+            self._written_at.clear()
+            self.snapshot = None
+            self._table = None
+            self._clear_users()
+            self.loaded = False
+            self.generation += 1
+
+    def _loaded(self):
+        self.loaded = True
+        self.loaded_at = time.monotonic()
+        self.generation += 1
+
+    def _clear_users(self):
+        self._pantries.clear()
+        self._matches.clear()
+        self._matched_by.clear()
+        self._users_by_ingredient.clear()
+
+    def _store_recipe(self, recipe):
+        self._recipes[recipe["id"]] = recipe
+        return _names(recipe)
+
+    def _recipe(self, recipe_id):
+        if recipe_id in self._recipes:
+            return self._recipes[recipe_id]
+        return self._table.row(self._table.position(recipe_id))
+
+    def _users_holding(self, ingredients):
+        if not ingredients:
+            return set(self._pantries)
+        postings = sorted(
+            (self._users_by_ingredient.get(ingredient, set()) for ingredient in ingredients),
+            key=len,
+        )
+        return set(postings[0]).intersection(*postings[1:])
+
+    def _forget_match(self, user_id, recipe_id):
+        users = self._matched_by.get(recipe_id)
+        if users is not None:
+            users.discard(user_id)
+            if not users:
+                del self._matched_by[recipe_id]
+
+    def _drop_user(self, user_id):
+        pantry = self._pantries.pop(user_id, None)
+        if pantry is None:
+            return
+        for ingredient in pantry.ingredients:
+            users = self._users_by_ingredient.get(ingredient)
+            if users is not None:
+                users.discard(user_id)
+                if not users:
+                    del self._users_by_ingredient[ingredient]
+        for recipe_id in self._matches.pop(user_id, {}):
+            self._forget_match(user_id, recipe_id)
+
+
+def rank_for_group(recipes, pantries: dict):
+    """Order ``recipes`` by the mean share of each member's pantry they use.
+
+    Ties go to the recipe whose least-served member uses more of their pantry.
+    Each result carries its ``score`` and the per-member ``pantry_usage``.
+    """
+    ranked = []
+    for recipe in recipes:
+        ingredients = extract_names(recipe["ingredients"])
+        usage = {user_id: pantry.usage(ingredients) for user_id, pantry in pantries.items()}
+        score = sum(usage.values()) / len(usage)
+        ranked.append((score, min(usage.values()), {**recipe, "score": score, "pantry_usage": usage}))
+    ranked.sort(key=lambda entry: (-entry[0], -entry[1], entry[2]["id"]))
+    return [recipe for _, _, recipe in ranked]
+
+
+def _names(recipe):
+    return extract_names(recipe["ingredients"]), extract_names(recipe["tools"])
+
+
+cookable_view = CookableView()
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List, Dict
 
 class NameDescPair(BaseModel):
@@ -40,3 +40,6 @@ class RatingCreate(BaseModel):
 class RatingUpdate(BaseModel):
     rating_value: int | None = None
     comment_text: str | None = None
+
+class GroupMatchRequest(BaseModel):
+    users: List[str] = Field(min_length=1)
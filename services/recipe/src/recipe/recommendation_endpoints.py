@@ -1,27 +1,75 @@
 import json
+import threading
+import time
 
 from typing import Annotated
 
-from fastapi import APIRouter, Header, HTTPException
+from data_access import supabase_errors
+from fastapi import APIRouter, Header, HTTPException, Query
 from fastapi.responses import JSONResponse
 
-from recipe.utils import supabase, get_user_profile, extract_names, filter_recipes, GOOGLE_GENAI_MODEL
-from recipe.models import Recipe
+from recipe.utils import supabase, catalog_snapshot, get_user_profile, get_user_profiles, extract_names, GOOGLE_GENAI_MODEL, RECIPE_RELOAD_SECONDS
+from recipe.models import Recipe, GroupMatchRequest
+from recipe.similarity import ensure_similarity_index, recipe_tokens, similarity_index
+from recipe.matching import Pantry, cookable_view, rank_for_group
+from recipe.indexes import on_recipe_saved
 
 router = APIRouter()
+# Held while the recipes are fetched, so concurrent requests on stale recipes fetch them once
+_reload_lock = threading.Lock()
+
+def load_recipes():
+    """Map the latest catalog snapshot if there is one, else fetch the recipes again
+    once they are older than ``RECIPE_RELOAD_SECONDS``."""
+    snapshot = catalog_snapshot.current() if catalog_snapshot else None
+    if snapshot is not None:
+        if snapshot is not cookable_view.snapshot:
+            cookable_view.load_snapshot(snapshot)
+    elif cookable_view.age() > RECIPE_RELOAD_SECONDS:
+        with _reload_lock:
+            if cookable_view.age() > RECIPE_RELOAD_SECONDS:
+                fetched_at = time.time()
+                recipes = supabase.table("Recipe").select("*").execute().data or []
+                cookable_view.load_recipes(recipes, fetched_at)
+
+def materialize_matches(user_id: str, pantry: Pantry = None):
+    load_recipes()
+    if pantry is None:
+        pantry = Pantry.from_profile(get_user_profile(user_id))
+    filtered = cookable_view.cookable(pantry)
+    cookable_view.materialize(user_id, pantry, filtered)
+    return filtered
 
 @router.get("/recipe/matches")
 def recommend_recipes(x_user_uuid: Annotated[str, Header(alias="X-User-uuid")]):
-    profile = get_user_profile(x_user_uuid)
-    restrictions = extract_names(profile.get("dietary_restrictions", {}))
-    available_tools = extract_names(profile.get("available_tools", {}))
-    available_ingredients = extract_names(profile.get("available_ingredients", {}))
-    res = supabase.table("Recipe").select("*").execute()
-    filtered = filter_recipes(res.data, restrictions, available_tools, available_ingredients)
+    load_recipes()
+    # The profile is read on every request, so pantry changes made elsewhere show up at once
+    pantry = Pantry.from_profile(get_user_profile(x_user_uuid))
+    filtered = cookable_view.matches(x_user_uuid, pantry)
+    if filtered is None:
+        filtered = materialize_matches(x_user_uuid, pantry)
     if not filtered:
         return JSONResponse(status_code=200, content={"message": "No recipes found. Search the internet?", "results": []})
     return {"results": filtered}
 
+@router.post("/recipe/matches/refresh")
+def refresh_recipe_matches(x_user_uuid: Annotated[str, Header(alias="X-User-uuid")]):
+    """Called when a user's profile changes so only that user's match set is recomputed."""
+    filtered = materialize_matches(x_user_uuid)
+    return {"message": "Matches refreshed", "count": len(filtered)}
+
+@router.post("/recipe/matches/group")
+def recommend_group_recipes(request: GroupMatchRequest):
+    """Recipes the group can cook together from their pooled tools and ingredients."""
+    user_ids = list(dict.fromkeys(request.users))
+    profiles = get_user_profiles(user_ids)
+    pantries = {user_id: Pantry.from_profile(profiles[user_id]) for user_id in user_ids}
+    load_recipes()
+    ranked = rank_for_group(cookable_view.cookable(Pantry.pool(pantries.values())), pantries)
+    if not ranked:
+        return JSONResponse(status_code=200, content={"message": "No recipes found for the group.", "results": []})
+    return {"results": ranked}
+
 @router.get("/recipe/matches_web")
 def recommend_recipes_search(x_user_uuid: Annotated[str, Header(alias="X-User-uuid")]):
     profile = get_user_profile(x_user_uuid)
@@ -71,18 +119,37 @@ def recommend_recipes_search(x_user_uuid: Annotated[str, Header(alias="X-User-uu
         raise JSONDecodeError("Failed to parse JSON", text, 0)
     
     if recipes_to_store:
-        try:
+        with supabase_errors():
             stored = supabase.table("Recipe").insert(recipes_to_store).execute()
             if not stored.data or (isinstance(stored.data, list) and len(stored.data) == 0):
                 raise HTTPException(status_code=400, detail="Failed to create gathered recipes")
+            for recipe in stored.data:
+                on_recipe_saved(recipe)
             return {
                 "results": stored.data,
             }
-        except Exception as e:
-            detail = getattr(e, 'message', str(e))
-            if hasattr(e, 'args') and e.args and isinstance(e.args[0], dict):
-                err = e.args[0]
-                detail = err.get('message', str(e))
-            raise HTTPException(status_code=400, detail=f"Supabase error: {detail}")
     else:
         return JSONResponse(status_code=200, content={"message": "No matched recipes found from the internet", "results": []})
+
+
+@router.get("/recipe/{recipe_id}/similar")
+def similar_recipes(recipe_id: int, k: Annotated[int, Query(ge=1, le=100)] = 10):
+    with supabase_errors(not_found="Recipe not found"):
+        res = supabase.table("Recipe").select("*").eq("id", recipe_id).single().execute()
+        if not res.data:
+            raise HTTPException(status_code=404, detail="Recipe not found")
+        load_recipes()
+        index = ensure_similarity_index(cookable_view.recipes, cookable_view.generation)
+        neighbours = index.query(recipe_tokens(res.data), k=k, exclude=recipe_id)
+        if not neighbours:
+            return {"results": []}
+        rows = supabase.table("Recipe").select("*").in_("id", [i for i, _ in neighbours]).execute().data or []
+    by_id = {row["id"]: row for row in rows}
+    results = []
+    for neighbour_id, score in neighbours:
+        if neighbour_id in by_id:
+            results.append({**by_id[neighbour_id], "similarity": score})
+        else:
+            # Deleted outside this service; drop it from the index as well.
+            similarity_index.remove(neighbour_id)
+    return {"results": results}
@@ -0,0 +1,174 @@
+import threading
+import zlib
+
+import numpy as np
+
+from recipe.utils import extract_names
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_EMPTY = np.uint32((1 << 32) - 1)
+
+
+def recipe_tokens(recipe: dict) -> set:
+    """Ingredient and tool names of a recipe, prefixed so a tool never collides with an ingredient."""
+    ingredients = {f"i:{name.lower()}" for name in extract_names(recipe.get("ingredients") or [])}
+    tools = {f"t:{name.lower()}" for name in extract_names(recipe.get("tools") or [])}
+    return ingredients | tools
+
+
+class MinHashLSH:
+    """MinHash signatures over recipe token sets, banded into an LSH index.
+
+    Signatures live in one contiguous ``uint32`` matrix (one row per recipe); deleted
+    rows are recycled. Each band of ``rows`` hash values is keyed into its own bucket
+    table, so a query only scores recipes sharing at least one band with it.
+    ``built_from`` records what the index was last rebuilt from, so callers can tell
+    when it is stale.
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 32, seed: int = 1):
+        if num_perm % bands != 0:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._signatures = np.empty((0, num_perm), dtype=np.uint32)
+        self._slot_of = {}
+        self._id_of_slot = []
+        self._free_slots = []
+        self._buckets = [{} for _ in range(bands)]
+        self._lock = threading.Lock()
+        self.loaded = False
+        self.built_from = None
+
+    def __len__(self):
+        return len(self._slot_of)
+
+    def __contains__(self, recipe_id):
+        return recipe_id in self._slot_of
+
+    def signature(self, tokens) -> np.ndarray:
+        if not tokens:
+            return np.full(self.num_perm, _EMPTY, dtype=np.uint32)
+        hv = np.fromiter(
+            (zlib.crc32(token.encode("utf-8")) for token in tokens),
+            dtype=np.uint64,
+            count=len(tokens),
+        )
+        phv = ((np.outer(hv, self._a) + self._b) % _MERSENNE_PRIME) & _MAX_HASH
+        return phv.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray):
+        return [
+            signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+    def _allocate_slot(self) -> int:
+        if self._free_slots:
+            return self._free_slots.pop()
+        slot = len(self._id_of_slot)
+        if slot >= self._signatures.shape[0]:
+            grown = np.empty((max(64, slot * 2), self.num_perm), dtype=np.uint32)
+            grown[:slot] = self._signatures[:slot]
+            self._signatures = grown
+        self._id_of_slot.append(None)
+        return slot
+
+    def insert(self, recipe_id: int, tokens):
+        signature = self.signature(tokens)
+        with self._lock:
+            self._remove_locked(recipe_id)
+            slot = self._allocate_slot()
+            self._signatures[slot] = signature
+            self._slot_of[recipe_id] = slot
+            self._id_of_slot[slot] = recipe_id
+            if tokens:
+                for table, key in zip(self._buckets, self._band_keys(signature)):
+                    table.setdefault(key, set()).add(recipe_id)
+
+    def remove(self, recipe_id: int):
+        with self._lock:
+            self._remove_locked(recipe_id)
+
+    def _remove_locked(self, recipe_id):
+        slot = self._slot_of.pop(recipe_id, None)
+        if slot is None:
+            return
+        for table, key in zip(self._buckets, self._band_keys(self._signatures[slot])):
+            bucket = table.get(key)
+            if bucket is not None:
+                bucket.discard(recipe_id)
+                if not bucket:
+                    del table[key]
+        self._id_of_slot[slot] = None
+        self._free_slots.append(slot)
+
+    def query(self, tokens, k: int = 10, exclude=None):
+        """Approximate top-``k`` ``(recipe_id, jaccard_estimate)`` pairs for a token set."""
+        if not tokens:
+            return []
+        signature = self.signature(tokens)
+        with self._lock:
+            candidates = set()
+            for table, key in zip(self._buckets, self._band_keys(signature)):
+                candidates |= table.get(key, set())
+            candidates.discard(exclude)
+            if not candidates:
+                return []
+            ids = list(candidates)
+            slots = np.fromiter((self._slot_of[i] for i in ids), dtype=np.int64, count=len(ids))
+            scores = (self._signatures[slots] == signature).mean(axis=1)
+        order = np.argsort(-scores, kind="stable")[:k]
+        return [(ids[i], float(scores[i])) for i in order]
+
+    def rebuild(self, items, source=None):
+        """Replace the contents with ``(recipe_id, tokens)`` pairs; queries keep using
+        the old contents until the new ones are complete."""
+        fresh = MinHashLSH(self.num_perm, self.bands, self.seed)
+        for recipe_id, tokens in items:
+            fresh.insert(recipe_id, tokens)
+        with self._lock:
+            self._signatures = fresh._signatures
+            self._slot_of = fresh._slot_of
+            self._id_of_slot = fresh._id_of_slot
+            self._free_slots = fresh._free_slots
+            self._buckets = fresh._buckets
+            self.loaded = True
+            self.built_from = source
+
+    def clear(self):
+        with self._lock:
+            self._signatures = np.empty((0, self.num_perm), dtype=np.uint32)
+            self._slot_of.clear()
+            self._id_of_slot.clear()
+            self._free_slots.clear()
+            self._buckets = [{} for _ in range(self.bands)]
+            self.loaded = False
+            self.built_from = None
+
+
+similarity_index = MinHashLSH()
+# Held while the index is built, so concurrent first requests build it once
+_build_lock = threading.Lock()
+
+
+def _is_current(source) -> bool:
+    return similarity_index.loaded and similarity_index.built_from == source
+
+
+def ensure_similarity_index(fetch_recipes, source=None) -> MinHashLSH:
+    """Build the index from ``fetch_recipes()`` on first use and again whenever ``source``,
+    the version of the recipes it is built from, changes; writes in between keep it current."""
+    if not _is_current(source):
+        with _build_lock:
+            if not _is_current(source):
+                similarity_index.rebuild(
+                    ((recipe["id"], recipe_tokens(recipe)) for recipe in fetch_recipes()), source
+                )
+    return similarity_index
@@ -1,7 +1,8 @@
 import os
 
+from data_access import SnapshotFile, create_client, supabase_errors
 from fastapi import HTTPException
-from supabase import create_client, Client
+from supabase import Client
 
 from dotenv import load_dotenv
 
@@ -10,35 +11,33 @@ load_dotenv()
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 GOOGLE_GENAI_MODEL = os.getenv("GOOGLE_GENAI_MODEL", "gemini-2.0-flash")
+# Snapshot file written by the catalog builder and mapped by every worker
+CATALOG_SNAPSHOT = os.getenv("CATALOG_SNAPSHOT")
+# Without a snapshot, recipes are fetched again once they are this many seconds old
+RECIPE_RELOAD_SECONDS = float(os.getenv("RECIPE_RELOAD_SECONDS", "60"))
+# Seconds the Supabase calls of one request may take in all; empty for no deadline
+REQUEST_DEADLINE_SECONDS = os.getenv("REQUEST_DEADLINE_SECONDS", "30")
+REQUEST_DEADLINE_SECONDS = float(REQUEST_DEADLINE_SECONDS) if REQUEST_DEADLINE_SECONDS else None
 
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+catalog_snapshot = SnapshotFile(CATALOG_SNAPSHOT) if CATALOG_SNAPSHOT else None
 
 def get_user_profile(user_id: str) -> dict:
-    try:
+    with supabase_errors("Failed to fetch user profile", status_code=502, not_found="User profile not found"):
         res = supabase.table("Profile").select("*").eq("user", user_id).single().execute()
         if not res.data:
             raise HTTPException(status_code=404, detail="User profile not found")
         return res.data
-    except Exception as e:
-        detail = getattr(e, 'message', str(e))
-        if hasattr(e, 'args') and e.args and isinstance(e.args[0], dict):
-            err = e.args[0]
-            detail = err.get('message', str(e))
-        raise HTTPException(status_code=502, detail=f"Failed to fetch user profile: {detail}")
+
+def get_user_profiles(user_ids) -> dict:
+    """Profiles of ``user_ids`` by user UUID, fetched in one query."""
+    with supabase_errors("Failed to fetch user profiles", status_code=502):
+        res = supabase.table("Profile").select("*").in_("user", list(user_ids)).execute()
+    profiles = {profile["user"]: profile for profile in res.data or []}
+    missing = [user_id for user_id in user_ids if user_id not in profiles]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"User profile not found: {', '.join(missing)}")
+    return profiles
 
 def extract_names(params):
     return {item["name"] for item in params if "name" in item}
-
-def filter_recipes(recipes, restrictions, available_tools, available_ingredients):
-    filtered = []
-    for r in recipes:
-        recipe_ingredients = extract_names(r["ingredients"])
-        recipe_tools = extract_names(r["tools"])
-        if restrictions & recipe_ingredients:
-            continue
-        if not recipe_tools <= available_tools:
-            continue
-        if not recipe_ingredients <= available_ingredients:
-            continue
-        filtered.append(r)
-    return filtered
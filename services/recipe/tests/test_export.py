@@ -0,0 +1,55 @@
+import io
+import os
+import sys
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from recipe import export_endpoints
+from recipe.export_endpoints import EXPORT_SCHEMAS, stream_columnar
+
+
+def make_rows(start, stop):
+    return [
+        {
+            "id": i,
+            "name": f"Recipe {i}",
+            "description": "A test recipe.",
+            "ingredients": [{"name": "egg", "description": "A large egg"}],
+            "tools": [{"name": "pan", "description": "Non-stick pan"}],
+            "instructions": ["Mix ingredients.", "Bake."],
+            "estimated_price": 10.5,
+            "estimated_time": "30 min",
+            "image_url": "http://example.com/cake.jpg",
+        }
+        for i in range(start, stop)
+    ]
+
+
+def test_arrow_export_streams_one_chunk_per_batch():
+    chunks = list(stream_columnar([make_rows(0, 3), make_rows(3, 5)], EXPORT_SCHEMAS["recipe"], "arrow"))
+    assert len(chunks) == 3
+    table = pa.ipc.open_file(pa.BufferReader(b"".join(chunks))).read_all()
+    assert table.num_rows == 5
+    assert table.column("id").to_pylist() == [0, 1, 2, 3, 4]
+    assert table.column("ingredients")[0].as_py() == [{"name": "egg", "description": "A large egg"}]
+
+
+def test_parquet_export_writes_a_row_group_per_batch():
+    data = b"".join(stream_columnar([make_rows(0, 3), make_rows(3, 5)], EXPORT_SCHEMAS["recipe"], "parquet"))
+    parquet_file = pq.ParquetFile(io.BytesIO(data))
+    assert parquet_file.num_row_groups == 2
+    assert parquet_file.read().column("tools")[4].as_py() == [{"name": "pan", "description": "Non-stick pan"}]
+
+
+def test_empty_export_is_a_valid_file():
+    data = b"".join(stream_columnar([], EXPORT_SCHEMAS["rating"], "arrow"))
+    table = pa.ipc.open_file(pa.BufferReader(data)).read_all()
+    assert table.num_rows == 0
+    assert table.schema == EXPORT_SCHEMAS["rating"]
+
+
+def test_rating_export_leaves_out_menu_ratings():
+    query = export_endpoints._FILTERS["rating"](export_endpoints.supabase.table("Rating").select("*"))
+    assert query.request.params["recipe"] == "not.is.null"
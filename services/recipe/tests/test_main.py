@@ -8,6 +8,7 @@ from unittest.mock import patch
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
 from recipe.main import app
 from recipe.utils import get_user_profile
+from recipe.matching import cookable_view
 from supabase import create_client, Client
 from dotenv import load_dotenv
 
@@ -59,6 +60,8 @@ def cleanup_test_recipes():
     SUPABASE_URL = os.getenv("SUPABASE_URL")
     SUPABASE_KEY = os.getenv("SUPABASE_KEY")
     supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    # Test data is deleted behind the service's back, so drop its materialized matches
+    cookable_view.clear()
     # Before: delete any leftover test data
     for name in [
         "Test Cake", "Updated Cake", "Test Cake For Rating", "Test Cake For Rating List",
@@ -254,9 +257,10 @@ def test_get_user_profile_supabase_error(monkeypatch):
     assert "Simulated supabase error" in str(exc.value)
 
 def test_recommend_recipes_no_match(monkeypatch):
-    # Patch filter_recipes to always return an empty list
+    # Patch the cookable filter to always return an empty list
     from recipe import recommendation_endpoints
-    monkeypatch.setattr(recommendation_endpoints, "filter_recipes", lambda *a, **k: [])
+    recommendation_endpoints.cookable_view.invalidate_user(os.getenv("SUPABASE_TEST_UUID"))
+    monkeypatch.setattr(recommendation_endpoints.cookable_view, "cookable", lambda *a, **k: [])
     response = client.get(
         "/recipe/matches",
         headers={"X-User-uuid": os.getenv("SUPABASE_TEST_UUID")}
@@ -0,0 +1,152 @@
+import os
+import time
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from recipe.matching import CookableView, Pantry, rank_for_group
+
+
+def make_recipe(recipe_id, ingredients, tools=("pan",)):
+    return {
+        "id": recipe_id,
+        "ingredients": [{"name": name, "description": ""} for name in ingredients],
+        "tools": [{"name": name, "description": ""} for name in tools],
+    }
+
+
+def make_view():
+    view = CookableView()
+    view.load_recipes([make_recipe(1, ["egg"]), make_recipe(2, ["egg", "peanut"])])
+    view.materialize("alice", Pantry({"peanut"}, {"pan"}, {"egg", "peanut", "rice"}), [make_recipe(1, ["egg"])])
+    view.materialize("bob", Pantry(set(), {"pan"}, {"egg", "peanut"}), [make_recipe(1, ["egg"]), make_recipe(2, ["egg", "peanut"])])
+    return view
+
+
+def ids(recipes):
+    return [recipe["id"] for recipe in recipes]
+
+
+def test_unknown_user_is_not_materialized():
+    assert make_view().matches("carol") is None
+
+
+def test_new_recipe_is_added_only_to_users_who_can_cook_it():
+    view = make_view()
+    view.upsert_recipe(make_recipe(3, ["egg", "rice"]))
+    view.upsert_recipe(make_recipe(4, ["egg", "peanut"]))
+    assert ids(view.matches("alice")) == [1, 3]
+    assert ids(view.matches("bob")) == [1, 2, 4]
+
+
+def test_updated_recipe_is_removed_when_no_longer_cookable():
+    view = make_view()
+    view.upsert_recipe(make_recipe(1, ["egg"], tools=["oven"]))
+    assert view.matches("alice") == []
+    assert ids(view.matches("bob")) == [2]
+
+
+def test_recipe_without_ingredients_checks_every_user():
+    view = make_view()
+    view.upsert_recipe(make_recipe(5, []))
+    assert ids(view.matches("alice")) == [1, 5]
+    assert ids(view.matches("bob")) == [1, 2, 5]
+
+
+def test_removed_recipe_disappears():
+    view = make_view()
+    view.remove_recipe(1)
+    assert view.matches("alice") == []
+    assert ids(view.matches("bob")) == [2]
+
+
+def test_rematerialized_user_drops_old_pantry():
+    view = make_view()
+    view.materialize("alice", Pantry(set(), {"pan"}, {"rice"}), [])
+    view.upsert_recipe(make_recipe(3, ["egg"]))
+    assert view.matches("alice") == []
+    view.invalidate_user("bob")
+    assert view.matches("bob") is None
+
+
+def test_matches_are_only_served_for_the_pantry_they_were_built_from():
+    view = make_view()
+    assert ids(view.matches("alice", Pantry({"peanut"}, {"pan"}, {"egg", "peanut", "rice"}))) == [1]
+    assert view.matches("alice", Pantry({"peanut"}, {"pan"}, {"rice"})) is None
+
+
+def test_reloaded_recipes_keep_only_later_writes():
+    view = make_view()
+    fetched_at = time.time()
+    view.upsert_recipe(make_recipe(3, ["egg"]))
+    view.remove_recipe(1)
+
+    view.load_recipes([make_recipe(1, ["egg"]), make_recipe(4, ["egg"])], fetched_at)
+    assert view.matches("alice") is None
+    assert sorted(ids(view.recipes())) == [3, 4]
+
+    view.load_recipes([make_recipe(4, ["egg"])], time.time())
+    assert ids(view.recipes()) == [4]
+
+
+def test_deleted_recipe_stays_hidden_when_a_snapshot_is_mapped():
+    view = make_view()
+    view.remove_recipe(2)
+    view.load_snapshot(make_snapshot([make_recipe(1, ["egg"]), make_recipe(2, ["egg"])], built_at=0.0))
+    assert ids(view.recipes()) == [1]
+
+
+def make_snapshot(recipes, built_at):
+    from data_access import Snapshot
+    from data_access.catalog_snapshot import CATALOG_SETS
+    return Snapshot.from_rows({"Recipe": recipes}, {"built_at": built_at}, CATALOG_SETS)
+
+
+def test_snapshot_recipes_are_filtered_on_their_id_sets():
+    view = CookableView()
+    view.load_snapshot(make_snapshot([
+        make_recipe(1, ["egg"]),
+        make_recipe(2, ["egg", "peanut"]),
+        make_recipe(3, ["egg"], tools=("oven",)),
+        make_recipe(4, []),
+    ], built_at=0.0))
+    pantry = Pantry({"peanut"}, {"pan"}, {"egg", "peanut"})
+    assert ids(view.cookable(pantry)) == [1, 4]
+    assert ids(view.cookable(Pantry(set(), {"pan", "oven"}, {"egg", "peanut"}))) == [1, 2, 3, 4]
+
+    view.materialize("alice", pantry, view.cookable(pantry))
+    view.upsert_recipe(make_recipe(1, ["egg", "rice"]))
+    view.upsert_recipe(make_recipe(5, ["egg"]))
+    view.remove_recipe(4)
+    assert ids(view.matches("alice")) == [5]
+    assert ids(view.cookable(pantry)) == [5]
+    assert sorted(ids(view.recipes())) == [1, 2, 3, 5]
+
+
+def test_newer_snapshot_keeps_only_later_writes():
+    view = CookableView()
+    view.load_snapshot(make_snapshot([make_recipe(1, ["egg"])], built_at=0.0))
+    view.upsert_recipe(make_recipe(2, ["egg"]))
+    view.materialize("alice", Pantry(set(), {"pan"}, {"egg"}), [])
+
+    view.load_snapshot(make_snapshot([make_recipe(1, ["egg"])], built_at=time.time()))
+    assert view.matches("alice") is None
+    assert ids(view.recipes()) == [1]
+
+
+def test_group_pantry_pools_tools_and_ingredients_and_every_restriction():
+    pooled = Pantry.pool([Pantry({"peanut"}, {"pan"}, {"egg"}), Pantry({"shrimp"}, {"oven"}, {"rice"})])
+    assert pooled == Pantry({"peanut", "shrimp"}, {"pan", "oven"}, {"egg", "rice"})
+    assert pooled.can_cook({"egg", "rice"}, {"pan", "oven"})
+    assert not pooled.can_cook({"egg", "shrimp"}, {"pan"})
+
+
+def test_group_ranking_uses_each_members_pantry():
+    pantries = {
+        "alice": Pantry(set(), {"pan"}, {"egg", "rice"}),
+        "bob": Pantry(set(), set(), {"kimchi", "rice", "tofu", "onion"}),
+    }
+    recipes = [make_recipe(1, ["egg"]), make_recipe(2, ["egg", "rice"]), make_recipe(3, ["rice", "kimchi"])]
+    ranked = rank_for_group(recipes, pantries)
+    assert ids(ranked) == [2, 3, 1]
+    assert ranked[0]["pantry_usage"] == {"alice": 1.0, "bob": 0.25}
+    assert ranked[0]["score"] == 0.625
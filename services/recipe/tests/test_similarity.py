@@ -0,0 +1,99 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from recipe.similarity import MinHashLSH, ensure_similarity_index, recipe_tokens, similarity_index
+
+
+def make_recipe(ingredients, tools=()):
+    return {
+        "ingredients": [{"name": name, "description": ""} for name in ingredients],
+        "tools": [{"name": name, "description": ""} for name in tools],
+    }
+
+
+def test_recipe_tokens_separates_ingredients_and_tools():
+    tokens = recipe_tokens(make_recipe(["Egg", "pan"], ["pan"]))
+    assert tokens == {"i:egg", "i:pan", "t:pan"}
+
+
+def test_signature_estimates_jaccard():
+    index = MinHashLSH(num_perm=256, bands=64)
+    a = {f"i:{n}" for n in range(100)}
+    b = {f"i:{n}" for n in range(50, 150)}
+    estimate = (index.signature(a) == index.signature(b)).mean()
+    assert abs(estimate - len(a & b) / len(a | b)) < 0.1
+
+
+def test_query_returns_most_similar_first():
+    index = MinHashLSH()
+    index.insert(1, recipe_tokens(make_recipe(["egg", "flour", "milk", "sugar"], ["oven"])))
+    index.insert(2, recipe_tokens(make_recipe(["egg", "flour", "milk"], ["oven"])))
+    index.insert(3, recipe_tokens(make_recipe(["rice", "kimchi", "pork"], ["pan"])))
+    results = index.query(recipe_tokens(make_recipe(["egg", "flour", "milk", "sugar"], ["oven"])), k=2)
+    assert [recipe_id for recipe_id, _ in results][0] == 1
+    assert 3 not in [recipe_id for recipe_id, _ in results]
+
+
+def test_query_excludes_recipe_itself():
+    index = MinHashLSH()
+    tokens = recipe_tokens(make_recipe(["egg", "flour"]))
+    index.insert(1, tokens)
+    index.insert(2, tokens)
+    assert index.query(tokens, exclude=1) == [(2, 1.0)]
+
+
+def test_insert_replaces_and_remove_deletes():
+    index = MinHashLSH()
+    index.insert(1, recipe_tokens(make_recipe(["egg", "flour"])))
+    index.insert(1, recipe_tokens(make_recipe(["rice", "kimchi"])))
+    assert len(index) == 1
+    assert index.query(recipe_tokens(make_recipe(["egg", "flour"]))) == []
+    index.remove(1)
+    assert 1 not in index
+    assert index.query(recipe_tokens(make_recipe(["rice", "kimchi"]))) == []
+
+
+def test_removed_slots_are_reused():
+    index = MinHashLSH()
+    for recipe_id in range(10):
+        index.insert(recipe_id, {f"i:{recipe_id}"})
+    index.remove(3)
+    index.insert(42, {"i:42"})
+    assert len(index) == 10
+    assert index.query({"i:42"}) == [(42, 1.0)]
+
+
+def test_concurrent_first_requests_build_the_index_once():
+    similarity_index.clear()
+    calls = []
+
+    def fetch_recipes():
+        calls.append(None)
+        time.sleep(0.05)
+        return [{"id": 1, **make_recipe(["egg"])}]
+
+    threads = [threading.Thread(target=ensure_similarity_index, args=(fetch_recipes,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert 1 in similarity_index
+    similarity_index.clear()
+
+
+def test_index_is_rebuilt_when_its_source_changes():
+    similarity_index.clear()
+    recipes = [{"id": 1, **make_recipe(["egg"])}, {"id": 2, **make_recipe(["egg"])}]
+    ensure_similarity_index(lambda: recipes, source=1)
+    similarity_index.insert(3, {"i:egg"})
+    ensure_similarity_index(lambda: recipes, source=1)
+    assert 3 in similarity_index
+
+    ensure_similarity_index(lambda: recipes[1:], source=2)
+    assert 1 not in similarity_index and 3 not in similarity_index
+    assert similarity_index.query({"i:egg"}) == [(2, 1.0)]
+    similarity_index.clear()
@@ -0,0 +1,30 @@
+-- Catalog tables record when each row last changed, so the services that
+-- cache them can poll for rows inserted or edited since their last refresh.
+
+create or replace function public.set_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at = now();
+    return new;
+end;
+$$;
+
+alter table public."Location" add column if not exists updated_at timestamptz not null default now();
+alter table public."Restaurant" add column if not exists updated_at timestamptz not null default now();
+alter table public."Menu" add column if not exists updated_at timestamptz not null default now();
+
+create or replace trigger "Location_set_updated_at"
+    before update on public."Location"
+    for each row execute function public.set_updated_at();
+create or replace trigger "Restaurant_set_updated_at"
+    before update on public."Restaurant"
+    for each row execute function public.set_updated_at();
+create or replace trigger "Menu_set_updated_at"
+    before update on public."Menu"
+    for each row execute function public.set_updated_at();
+
+create index if not exists "Location_updated_at_idx" on public."Location" (updated_at);
+create index if not exists "Restaurant_updated_at_idx" on public."Restaurant" (updated_at);
+create index if not exists "Menu_updated_at_idx" on public."Menu" (updated_at);